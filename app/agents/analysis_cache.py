@@ -0,0 +1,192 @@
+"""
+Caché de resultados del análisis de imágenes
+
+Los recolectores suelen reenviar la misma foto cuando la conexión falla.
+Para no pagar otra llamada a Gemini:
+
+1. Memoria: clave = SHA-256 de los bytes de la imagen (LRU + TTL, con
+   agrupación de análisis simultáneos de la misma foto).
+2. MongoDB (opcional): la misma clave en la colección `analisis_cache`,
+   compartida entre workers y reinicios (expira por el índice TTL declarado
+   en `app.services.index_manager`).
+3. Hash perceptual (opcional, desactivado por defecto): dHash de 64 bits
+   para reconocer la misma foto recomprimida o redimensionada (distancia de
+   Hamming <= umbral). Solo se compara con fotos recientes de la misma ruta
+   o usuario (`scope`): dos fotos del mismo contenedor desde el mismo ángulo
+   pueden tener hashes cercanos con distinto nivel de llenado, así que sin
+   scope no se usa.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from PIL import Image
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.cache import AsyncTTLCache
+
+
+logger = get_logger(__name__)
+
+COLLECTION_NAME = "analisis_cache"
+
+
+class AnalysisCache:
+    """Caché de porcentajes de llenado por contenido de imagen"""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        phash_enabled: bool,
+        phash_max_distance: int,
+        phash_per_scope: int,
+        persistent: bool
+    ):
+        self.memory = AsyncTTLCache("analysis", maxsize=maxsize, ttl=ttl)
+        self.phash_enabled = phash_enabled
+        self.phash_max_distance = phash_max_distance
+        self.phash_per_scope = phash_per_scope
+        self.persistent = persistent
+
+        # {scope: OrderedDict {phash: (expires_at, fill_percentage)}}, scopes
+        # y hashes del más viejo al más nuevo
+        self._phashes: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._collection = None
+
+        # Contadores por nivel
+        self.persistent_hits = 0
+        self.similar_hits = 0
+
+
+    def attach(self, db):
+        """Habilitar el nivel persistente en MongoDB"""
+        if self.persistent:
+            self._collection = db[COLLECTION_NAME]
+
+
+    @staticmethod
+    def content_key(image_data: bytes) -> str:
+        """Clave de caché: SHA-256 de los bytes de la imagen"""
+        return hashlib.sha256(image_data).hexdigest()
+
+
+    @staticmethod
+    def perceptual_hash(image: Image.Image) -> int:
+        """dHash de 64 bits: compara el brillo de píxeles vecinos en una miniatura 9x8"""
+        small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+        pixels = list(small.getdata())
+
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                right = pixels[row * 9 + col + 1]
+                value = (value << 1) | (left > right)
+        return value
+
+
+    def find_similar(self, phash: int, scope: Optional[str]) -> Optional[str]:
+        """Buscar un resultado de una imagen casi idéntica de la misma ruta/usuario"""
+        if not self.phash_enabled or scope is None:
+            return None
+
+        entries = self._phashes.get(scope)
+        if not entries:
+            return None
+
+        now = time.monotonic()
+        for known, (expires_at, fill_percentage) in reversed(entries.items()):
+            if expires_at < now:
+                continue
+            if (known ^ phash).bit_count() <= self.phash_max_distance:
+                self.similar_hits += 1
+                return fill_percentage
+        return None
+
+
+    def remember_similar(self, phash: int, fill_percentage: str, scope: Optional[str]):
+        """Guardar el hash perceptual de una imagen analizada"""
+        if not self.phash_enabled or scope is None:
+            return
+
+        entries = self._phashes.get(scope)
+        if entries is None:
+            entries = self._phashes[scope] = OrderedDict()
+        self._phashes.move_to_end(scope)
+
+        entries[phash] = (time.monotonic() + self.memory.ttl, fill_percentage)
+        entries.move_to_end(phash)
+        while len(entries) > self.phash_per_scope:
+            entries.popitem(last=False)
+        while len(self._phashes) > self.memory.maxsize:
+            self._phashes.popitem(last=False)
+
+
+    async def get_persistent(self, key: str) -> Optional[str]:
+        """Buscar el resultado en MongoDB"""
+        if self._collection is None:
+            return None
+
+        try:
+            document = await self._collection.find_one({"_id": key}, {"fill_percentage": 1})
+        except Exception as e:
+            logger.warning("Error leyendo caché de análisis", extra={"error": str(e)})
+            return None
+
+        if document is None:
+            return None
+
+        self.persistent_hits += 1
+        return document["fill_percentage"]
+
+
+    async def store_persistent(self, key: str, fill_percentage: str, phash: Optional[int] = None):
+        """Guardar el resultado en MongoDB"""
+        if self._collection is None:
+            return
+
+        try:
+            await self._collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "fill_percentage": fill_percentage,
+                    "phash": f"{phash:016x}" if phash is not None else None,
+                    "created_at": datetime.now()
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning("Error guardando caché de análisis", extra={"error": str(e)})
+
+
+    def get_stats(self) -> dict:
+        """Métricas de la caché de análisis"""
+        return {
+            "memory": self.memory.get_stats(),
+            "similar": {
+                "enabled": self.phash_enabled,
+                "scopes": len(self._phashes),
+                "size": sum(len(entries) for entries in self._phashes.values()),
+                "hits": self.similar_hits,
+            },
+            "persistent": {
+                "enabled": self._collection is not None,
+                "hits": self.persistent_hits,
+            },
+        }
+
+
+# Instancia global de la caché
+analysis_cache = AnalysisCache(
+    maxsize=settings.AGENT_CACHE_MAX_SIZE,
+    ttl=settings.AGENT_CACHE_TTL_SECONDS,
+    phash_enabled=settings.AGENT_CACHE_PHASH_ENABLED,
+    phash_max_distance=settings.AGENT_CACHE_PHASH_MAX_DISTANCE,
+    phash_per_scope=settings.AGENT_CACHE_PHASH_PER_SCOPE,
+    persistent=settings.AGENT_CACHE_PERSISTENT
+)
@@ -0,0 +1,108 @@
+"""
+Preprocesamiento de imágenes antes de enviarlas al modelo
+
+Las fotos de celular (4-12 MP) son mucho más grandes de lo que necesita la
+pregunta de nivel de llenado. Antes de subirlas:
+
+1. JPEG: `draft()` decodifica directamente a una escala reducida (1/2, 1/4,
+   1/8), mucho más rápido que decodificar la imagen completa.
+2. Se aplica la orientación EXIF (las fotos de celular suelen venir rotadas).
+3. Se reduce al lado máximo configurado.
+4. Se re-codifica a un JPEG/WebP compacto.
+"""
+
+import io
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Imagen lista para enviar al modelo"""
+    data: bytes
+    mime_type: str
+    size: Tuple[int, int]
+    original_bytes: int
+    original_size: Tuple[int, int]
+    decode_ms: float
+    encode_ms: float
+
+    def as_blob(self) -> dict:
+        """Formato de parte inline que acepta el SDK de Gemini"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def decode_image(image_data: bytes, max_edge: int) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decodificar una imagen reducida a `max_edge` y con la orientación EXIF aplicada
+
+    Returns:
+        (imagen RGB reducida, tamaño original)
+    """
+    image = Image.open(io.BytesIO(image_data))
+    original_size = image.size
+
+    # JPEG: decodificar a la escala más chica que siga siendo >= max_edge
+    if image.format == "JPEG":
+        image.draft("RGB", (max_edge, max_edge))
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return image, original_size
+
+
+def prepare_image(image_data: bytes, max_edge: int, image_format: str = "JPEG", quality: int = 80) -> Tuple[PreparedImage, Image.Image]:
+    """
+    Reducir y re-codificar una imagen para el modelo
+
+    Args:
+        image_data: Bytes de la imagen original
+        max_edge: Lado máximo en píxeles
+        image_format: "JPEG" o "WEBP"
+        quality: Calidad de compresión (1-95)
+
+    Returns:
+        (imagen preparada, imagen PIL reducida)
+    """
+    image_format = image_format.upper()
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Formato de imagen no soportado: {image_format}")
+
+    start = time.perf_counter()
+    image, original_size = decode_image(image_data, max_edge)
+    decoded = time.perf_counter()
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+    encoded = time.perf_counter()
+
+    prepared = PreparedImage(
+        data=buffer.getvalue(),
+        mime_type=MIME_TYPES[image_format],
+        size=image.size,
+        original_bytes=len(image_data),
+        original_size=original_size,
+        decode_ms=(decoded - start) * 1000,
+        encode_ms=(encoded - decoded) * 1000
+    )
+    return prepared, image
+
+
+def make_thumbnail(image_data: bytes, max_edge: int = 160, quality: int = 60) -> bytes:
+    """Miniatura JPEG para mostrar en listados"""
+    image, _ = decode_image(image_data, max_edge)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
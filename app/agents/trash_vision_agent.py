@@ -4,11 +4,49 @@ Utiliza Gemini Vision AI para clasificar imágenes
 """
 
 import google.generativeai as genai
-from PIL import Image
-import io
+from google.api_core import exceptions as google_exceptions
+import asyncio
 import base64
-from typing import Literal
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Optional, Tuple
+from app.config.logging_config import get_logger
 from app.config.settings import settings
+from app.agents.analysis_cache import analysis_cache
+from app.agents.image_preprocessing import PreparedImage, prepare_image
+from app.services.metrics import agent_analysis, agent_call, agent_errors
+
+logger = get_logger(__name__)
+
+# Porcentaje que se devuelve si la respuesta del modelo no trae uno (no se cachea)
+DEFAULT_FILL_PERCENTAGE = "50%"
+
+# Errores del modelo que vale la pena reintentar: timeouts, 5xx y 429. El
+# resto (request inválido, API key, contenido bloqueado) falla igual al reintentar
+TRANSIENT_ERRORS = (
+    google_exceptions.ServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+@dataclass(frozen=True)
+class AnalysisResult:
+    """Resultado de un análisis"""
+    fill_percentage: str
+    cached: bool = False
+    # Nivel de caché que respondió: "memory", "persistent" o "similar"
+    cache_tier: Optional[str] = None
+    # False si el porcentaje es el valor por defecto (respuesta sin porcentaje)
+    cacheable: bool = True
+    # Métricas del request: bytes/resolución subidos, tiempos de decodificación,
+    # modelo y total (en ms)
+    stats: dict = field(default_factory=dict)
 
 
 class TrashBinAgent:
@@ -33,16 +71,87 @@ ej: 50%
 No agregues explicaciones adicionales, solo la clasificación.
 """
     
-    def __init__(self):
-        """Inicializar el agente con la API de Gemini"""
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+    def __init__(self, model=None):
+        """
+        Inicializar el agente con la API de Gemini
+        
+        Args:
+            model: Modelo a usar (por defecto Gemini). Permite inyectar un
+                modelo stub con un método `generate_content`.
+        """
+        if model is None:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model = model
+        
+        # El SDK de Gemini es síncrono: las llamadas corren en un pool de
+        # hilos acotado para no congelar el event loop (WebSockets, API).
+        # El timeout se pasa al SDK, así una llamada colgada libera su hilo;
+        # el pool tiene un hilo por intento posible de cada análisis en curso
+        # para que un reintento no espere detrás de un intento abandonado.
+        self.max_concurrency = settings.AGENT_MAX_CONCURRENCY
+        self.timeout = settings.AGENT_TIMEOUT_SECONDS
+        self.max_retries = settings.AGENT_MAX_RETRIES
+        self.retry_backoff = settings.AGENT_RETRY_BACKOFF_SECONDS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency * (self.max_retries + 1),
+            thread_name_prefix="trash-agent"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # Contadores
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+    
+    
+    def _prepare(self, image_data: bytes) -> Tuple[PreparedImage, Optional[int]]:
+        """
+        Reducir y re-codificar la imagen para el modelo y calcular su hash
+        perceptual (si está habilitado) sobre la versión reducida
+        """
+        prepared, image = prepare_image(
+            image_data,
+            max_edge=settings.AGENT_IMAGE_MAX_EDGE,
+            image_format=settings.AGENT_IMAGE_FORMAT,
+            quality=settings.AGENT_IMAGE_QUALITY
+        )
+        phash = analysis_cache.perceptual_hash(image) if analysis_cache.phash_enabled else None
+        return prepared, phash
+    
+    
+    def _call_model(self, image: PreparedImage) -> str:
+        """Generar respuesta con Gemini Vision (bloqueante)"""
+        response = self.model.generate_content(
+            [self.SYSTEM_PROMPT, image.as_blob()],
+            request_options={"timeout": self.timeout}
+        )
+        return response.text
+    
+    
+    @staticmethod
+    def _parse_percentage(text: str) -> Optional[str]:
+        """Extraer solo el porcentaje (buscar patrón de número + %); None si no hay"""
+        match = re.search(r'(\d+)%', text.strip())
+        
+        if match:
+            percentage = int(match.group(1))
+            # Asegurar que esté entre 0-100
+            percentage = max(0, min(100, percentage))
+            return f"{percentage}%"
+        
+        return None
     
     
     def analyze_image(self, image_data: bytes) -> str:
         """
         Analizar imagen de carrito de basura y retornar porcentaje de llenado
         
+        Versión síncrona: bloquea el hilo que la llama. Desde código async
+        usar `analyze_image_async`.
+        
         Args:
             image_data: Bytes de la imagen (JPEG, PNG, etc.)
             
@@ -50,35 +159,172 @@ No agregues explicaciones adicionales, solo la clasificación.
             str: Porcentaje de llenado (ej: "50%")
         """
         try:
-            # Cargar imagen desde bytes
-            image = Image.open(io.BytesIO(image_data))
+            image, _ = self._prepare(image_data)
+            return self._parse_percentage(self._call_model(image)) or DEFAULT_FILL_PERCENTAGE
+        except Exception as e:
+            logger.error("Error al analizar imagen", extra={"error": str(e)})
+            raise Exception(f"Error en el análisis de imagen: {str(e)}")
+    
+    
+    async def analyze_image_async(self, image_data: bytes, scope: Optional[str] = None) -> AnalysisResult:
+        """
+        Analizar imagen sin bloquear el event loop
+        
+        Primero se busca el resultado en la caché de análisis (por hash del
+        contenido, en MongoDB y, si está habilitado, por hash perceptual entre
+        las fotos de la misma ruta/usuario); solo si no está se llama al modelo.
+        Si la respuesta del modelo no trae porcentaje se devuelve 50% sin
+        guardarlo en la caché.
+        
+        La decodificación y la llamada al modelo corren en el pool de hilos
+        del agente. Como máximo `AGENT_MAX_CONCURRENCY` análisis a la vez;
+        cada intento tiene un timeout de `AGENT_TIMEOUT_SECONDS` y los
+        errores transitorios del modelo (timeout, 5xx, 429) se reintentan
+        hasta `AGENT_MAX_RETRIES` veces con backoff exponencial.
+        
+        Args:
+            image_data: Bytes de la imagen (JPEG, PNG, etc.)
+            scope: Ruta o usuario de la foto (para el hash perceptual; None = no se usa)
             
-            # Generar respuesta con Gemini Vision
-            response = self.model.generate_content([
-                self.SYSTEM_PROMPT,
-                image
-            ])
+        Returns:
+            AnalysisResult: Porcentaje de llenado (ej: "50%") y origen del resultado
+        """
+        start = time.perf_counter()
+        
+        if not settings.AGENT_CACHE_ENABLED:
+            result = await self._analyze_uncached(image_data, key=None, scope=scope)
+        else:
+            key = await asyncio.to_thread(analysis_cache.content_key, image_data)
             
-            # Extraer y limpiar respuesta
-            result = response.text.strip()
+            loaded = False
             
-            # Extraer solo el porcentaje (buscar patrón de número + %)
-            import re
-            match = re.search(r'(\d+)%', result)
+            async def load():
+                nonlocal loaded
+                loaded = True
+                return await self._analyze_uncached(image_data, key, scope)
             
-            if match:
-                percentage = int(match.group(1))
-                # Asegurar que esté entre 0-100
-                percentage = max(0, min(100, percentage))
-                return f"{percentage}%"
-            else:
-                # Si no se encuentra porcentaje, devolver 50% por defecto
-                return "50%"
+            # Subidas simultáneas de la misma foto comparten un solo análisis
+            result = await analysis_cache.memory.get_or_load(key, load)
+            if not loaded:
+                result = replace(result, cached=True, cache_tier="memory")
+            elif not result.cacheable:
+                analysis_cache.memory.invalidate(key)
+        
+        # Las métricas de upload/modelo solo aplican al request que llamó al modelo
+        stats = {} if result.cached else dict(result.stats)
+        stats["original_bytes"] = len(image_data)
+        stats["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        result = replace(result, stats=stats)
+        agent_analysis.labels(result.cache_tier or "model").observe(stats["total_ms"] / 1000)
+        
+        logger.info("Análisis de imagen", extra={"source": result.cache_tier or "model", "stats": stats})
+        return result
+    
+    
+    async def _analyze_uncached(self, image_data: bytes, key: Optional[str], scope: Optional[str]) -> AnalysisResult:
+        """Analizar una imagen que no está en la caché en memoria"""
+        if key is not None:
+            stored = await analysis_cache.get_persistent(key)
+            if stored is not None:
+                return AnalysisResult(stored, cached=True, cache_tier="persistent")
+        
+        loop = asyncio.get_running_loop()
+        
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                try:
+                    image, phash = await loop.run_in_executor(self._executor, self._prepare, image_data)
+                except Exception as e:
+                    raise Exception(f"Imagen inválida: {str(e)}")
                 
-        except Exception as e:
-            print(f"Error al analizar imagen: {str(e)}")
-            raise Exception(f"Error en el análisis de imagen: {str(e)}")
-            raise Exception(f"Error en el análisis de imagen: {str(e)}")
+                if phash is not None:
+                    similar = analysis_cache.find_similar(phash, scope)
+                    if similar is not None:
+                        return AnalysisResult(similar, cached=True, cache_tier="similar")
+                
+                model_start = time.perf_counter()
+                text = await self._call_model_with_retries(image)
+                model_ms = (time.perf_counter() - model_start) * 1000
+            finally:
+                self.in_flight -= 1
+        
+        fill_percentage = self._parse_percentage(text)
+        cacheable = fill_percentage is not None
+        if not cacheable:
+            fill_percentage = DEFAULT_FILL_PERCENTAGE
+            logger.warning("Respuesta del modelo sin porcentaje; se usa el valor por defecto", extra={
+                "response": text[:200],
+                "fill_percentage": fill_percentage
+            })
+        else:
+            if phash is not None:
+                analysis_cache.remember_similar(phash, fill_percentage, scope)
+            if key is not None:
+                await analysis_cache.store_persistent(key, fill_percentage, phash)
+        
+        return AnalysisResult(fill_percentage, cacheable=cacheable, stats={
+            "upload_bytes": len(image.data),
+            "original_resolution": f"{image.original_size[0]}x{image.original_size[1]}",
+            "upload_resolution": f"{image.size[0]}x{image.size[1]}",
+            "decode_ms": round(image.decode_ms, 2),
+            "encode_ms": round(image.encode_ms, 2),
+            "model_ms": round(model_ms, 2)
+        })
+    
+    
+    async def _call_model_with_retries(self, image: PreparedImage) -> str:
+        """Llamar al modelo en el pool de hilos con timeout y reintentos de errores transitorios"""
+        loop = asyncio.get_running_loop()
+        
+        attempt = 0
+        while True:
+            self.calls += 1
+            start = time.perf_counter()
+            try:
+                text = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._call_model, image),
+                    timeout=self.timeout
+                )
+                agent_call.labels("success").observe(time.perf_counter() - start)
+                return text
+            except (asyncio.TimeoutError, google_exceptions.DeadlineExceeded):
+                self.timeouts += 1
+                outcome = "timeout"
+                error = f"Timeout de {self.timeout}s esperando al modelo"
+                retryable = True
+            except Exception as e:
+                outcome = "error"
+                error = str(e)
+                retryable = isinstance(e, TRANSIENT_ERRORS)
+            
+            agent_call.labels(outcome).observe(time.perf_counter() - start)
+            agent_errors.labels(outcome).inc()
+            
+            if not retryable or attempt >= self.max_retries:
+                self.failures += 1
+                agent_errors.labels("failed").inc()
+                logger.error("Error al analizar imagen", extra={"error": error, "attempts": attempt + 1})
+                raise Exception(f"Error en el análisis de imagen: {error}")
+            
+            # Backoff exponencial con jitter antes de reintentar
+            delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+    
+    
+    def get_stats(self) -> dict:
+        """Obtener contadores del agente"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "cache": analysis_cache.get_stats(),
+        }
     
     
     def analyze_image_base64(self, base64_image: str) -> str:
@@ -97,6 +343,25 @@ No agregues explicaciones adicionales, solo la clasificación.
             return self.analyze_image(image_data)
         except Exception as e:
             raise Exception(f"Error al decodificar imagen base64: {str(e)}")
+    
+    
+    async def analyze_image_base64_async(self, base64_image: str) -> AnalysisResult:
+        """
+        Analizar imagen desde base64 sin bloquear el event loop
+        
+        Args:
+            base64_image: Imagen codificada en base64
+            
+        Returns:
+            AnalysisResult: Porcentaje de llenado (ej: "50%") y origen del resultado
+        """
+        try:
+            # Decodificar base64 a bytes
+            image_data = base64.b64decode(base64_image)
+        except Exception as e:
+            raise Exception(f"Error al decodificar imagen base64: {str(e)}")
+        
+        return await self.analyze_image_async(image_data)
 
 
 # Instancia global del agente
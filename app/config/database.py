@@ -1,5 +1,13 @@
+import asyncio
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.config.logging_config import get_logger
 from app.config.settings import settings
+from app.services.metrics import db_command_monitor
+from app.services.mongo_monitoring import pool_monitor
+
+
+logger = get_logger(__name__)
 
 
 class Database:
@@ -13,13 +21,53 @@ async def get_database():
     return db.client[settings.DATABASE_NAME]
 
 
+def _client_options() -> dict:
+    """Opciones del pool de conexiones desde Settings"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS or None,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS or None,
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_monitor, db_command_monitor],
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+
+async def warm_up_pool(connections: int):
+    """
+    Abrir conexiones antes de recibir tráfico
+
+    Los pings simultáneos obligan al driver a abrir hasta `connections`
+    conexiones, así las primeras peticiones no pagan el handshake (TCP + TLS + auth).
+    """
+    if connections <= 0:
+        return
+
+    admin = db.client.admin
+    try:
+        await asyncio.gather(*(admin.command("ping") for _ in range(connections)))
+    except Exception as e:
+        # No impedir el inicio: el driver reintenta en la primera consulta
+        logger.warning("No se pudo precalentar el pool de MongoDB", extra={"error": str(e)})
+        return
+    logger.info("Pool de MongoDB precalentado", extra={"connections": connections})
+
+
 async def connect_to_mongo():
     """Conectar a MongoDB al iniciar la aplicación"""
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
-    print("✅ Conectado a MongoDB")
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL, **_client_options())
+    await warm_up_pool(settings.MONGO_MIN_POOL_SIZE)
+    logger.info("Conectado a MongoDB")
 
 
 async def close_mongo_connection():
     """Cerrar conexión a MongoDB al apagar la aplicación"""
     db.client.close()
-    print("❌ Conexión a MongoDB cerrada")
+    logger.info("Conexión a MongoDB cerrada")
@@ -0,0 +1,144 @@
+"""
+Logging estructurado sin bloquear el event loop
+
+- Los loggers de la app escriben en un `QueueHandler`: encolar un registro
+  no toca stdout. Un `QueueListener` (hilo aparte) formatea y escribe.
+- Salida JSON por línea (LOG_FORMAT=json) o texto (LOG_FORMAT=text). Los
+  campos pasados en `extra` se agregan al JSON:
+
+      logger.info("Tracker conectado", extra={"user_id": user_id})
+
+- Eventos por mensaje (una línea por fix, por alerta enviada, ...): pasar
+  `extra={"sample_every": N}` y solo se escribe 1 de cada N por mensaje;
+  el registro lleva `sampled: N`. Con LOG_SAMPLE_EVERY se usa el valor
+  configurado:
+
+      logger.debug("Ubicación recibida", extra={"sample_every": LOG_SAMPLE_EVERY})
+"""
+
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.config.settings import settings
+
+
+APP_LOGGER = "innova"
+LOG_SAMPLE_EVERY = settings.LOG_SAMPLE_EVERY
+
+# Atributos propios de LogRecord (el resto viene de `extra`)
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos de `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sample_every":
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo, con los campos de `extra` al final"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {
+            key: value for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and key != "sample_every"
+        }
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Encolar una copia con el mensaje armado y la traza como texto (campo `exc`)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Dejar pasar 1 de cada `sample_every` registros del mismo mensaje"""
+
+    def __init__(self):
+        super().__init__()
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample_every", 1)
+        if every <= 1:
+            return True
+
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled = every
+        return True
+
+
+def setup_logging(level: Optional[str] = None, log_format: Optional[str] = None):
+    """
+    Configurar el logger de la app (`innova`) con cola + hilo escritor
+
+    Es idempotente: llamarlo de nuevo reemplaza la configuración anterior.
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if (log_format or settings.LOG_FORMAT) == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.handlers = [handler]
+    logger.setLevel((level or settings.LOG_LEVEL).upper())
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Escribir lo pendiente y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger hijo de `innova` (ej: get_logger(__name__) -> innova.app.services.x)"""
+    return logging.getLogger(f"{APP_LOGGER}.{name}")
@@ -6,6 +6,129 @@ class Settings(BaseSettings):
     DATABASE_NAME: str
     GEMINI_API_KEY: str
 
+    # Pool de conexiones de MongoDB. Timeouts en milisegundos (0 = sin límite).
+    # MONGO_MIN_POOL_SIZE conexiones se abren al iniciar (warm-up).
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10
+    MONGO_MAX_CONNECTING: int = 2
+    MONGO_MAX_IDLE_TIME_MS: int = 300000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 0
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_TIMEOUT_MS: int = 10000
+    MONGO_SOCKET_TIMEOUT_MS: int = 0
+    # Compresión de red separada por comas, ej: "zstd,snappy,zlib" (vacío = sin compresión)
+    MONGO_COMPRESSORS: str = ""
+    # primary, primaryPreferred, secondary, secondaryPreferred o nearest
+    MONGO_READ_PREFERENCE: str = "primary"
+
+    # Fan-out a admins: tamaño de la cola de salida por admin y cantidad de
+    # descartes seguidos antes de desconectar a un admin lento
+    ADMIN_QUEUE_MAX_SIZE: int = 256
+    ADMIN_MAX_CONSECUTIVE_DROPS: int = 256
+
+    # Backplane entre workers/instancias: "memory" (un solo proceso) o "redis"
+    BACKPLANE_BACKEND: str = "memory"
+    BACKPLANE_REDIS_URL: str = "redis://localhost:6379/0"
+    BACKPLANE_PREFIX: str = "innova"
+    BACKPLANE_LOCATION_TTL_SECONDS: float = 300.0
+    BACKPLANE_OUTBOX_MAX_SIZE: int = 10000
+    # Cada cuántos segundos se revisa si hay otros procesos (Redis PUBSUB NUMSUB)
+    BACKPLANE_PEER_CHECK_SECONDS: float = 5.0
+
+    # Tick de broadcast: cada cuántos segundos se envía a los admins un solo
+    # `location_batch` con los usuarios que se movieron más de
+    # BROADCAST_MIN_DISTANCE_METERS (0 = desactivado, cada ubicación se envía al llegar)
+    BROADCAST_TICK_SECONDS: float = 0.0
+    BROADCAST_MIN_DISTANCE_METERS: float = 5.0
+
+    # Suscripciones de admins por zona: tamaño de celda de la grilla en grados (~1 km)
+    SUBSCRIPTION_CELL_DEGREES: float = 0.01
+
+    # Límite de ubicaciones por tracker (token bucket por conexión): fixes por
+    # segundo y ráfaga máxima. Los mensajes que exceden el límite se descartan
+    # (0 = sin límite). Las apps envían una ubicación cada pocos segundos (la
+    # de prueba cada 5 s, el GPS del teléfono como mucho ~1 por segundo), así
+    # que 2/s con ráfagas de 10 solo corta a un cliente con un bug
+    TRACKER_MAX_FIXES_PER_SECOND: float = 2.0
+    TRACKER_BURST: int = 10
+
+    # Filtro GPS por recolector: descarta fixes que se movieron menos de
+    # GPS_FILTER_MIN_MOVE_METERS (salvo uno cada GPS_FILTER_KEEPALIVE_SECONDS)
+    # o que implican más de GPS_FILTER_MAX_SPEED_MPS (0 = sin límite); tras
+    # GPS_FILTER_MAX_REJECTS saltos seguidos se acepta el último. Desactivado
+    # por defecto: con el filtro los admins dejan de recibir algunos fixes
+    GPS_FILTER_ENABLED: bool = False
+    GPS_FILTER_MIN_MOVE_METERS: float = 3.0
+    GPS_FILTER_MAX_SPEED_MPS: float = 40.0
+    GPS_FILTER_KEEPALIVE_SECONDS: float = 30.0
+    GPS_FILTER_MAX_REJECTS: int = 3
+
+    # Logging: nivel, formato ("json" o "text") y 1 de cada cuántos eventos
+    # por mensaje se escriben (ej: ubicaciones recibidas en DEBUG)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_EVERY: int = 100
+
+    # Compresión permessage-deflate de los WebSockets (se negocia con cada cliente)
+    WS_PER_MESSAGE_DEFLATE: bool = True
+
+    # Encoder JSON para los broadcasts: "auto" (orjson si está instalado), "orjson" o "json"
+    JSON_ENCODER: str = "auto"
+
+    # Persistencia de last_location: intervalo de flush y tamaño máximo del lote
+    LOCATION_FLUSH_INTERVAL_SECONDS: float = 2.0
+    LOCATION_FLUSH_MAX_BATCH: int = 500
+
+    # Historial de ubicaciones (colección time-series). TTL en días, 0 = sin expiración
+    LOCATION_HISTORY_FLUSH_INTERVAL_SECONDS: float = 5.0
+    LOCATION_HISTORY_FLUSH_MAX_BATCH: int = 1000
+    LOCATION_HISTORY_MAX_BUFFER: int = 50000
+    LOCATION_HISTORY_TTL_DAYS: int = 90
+
+    # Detección de desvíos: umbrales de histéresis (metros), fixes seguidos
+    # fuera de la ruta para confirmar y cooldown de alertas por usuario
+    DEVIATION_ENABLED: bool = True
+    DEVIATION_ENTER_METERS: float = 50.0
+    DEVIATION_EXIT_METERS: float = 30.0
+    DEVIATION_CONFIRM_FIXES: int = 3
+    DEVIATION_ALERT_COOLDOWN_SECONDS: float = 300.0
+
+    # Caché en proceso de usuarios, rutas y asignaciones
+    CACHE_MAX_SIZE: int = 5000
+    CACHE_TTL_SECONDS: float = 60.0
+
+    # Agente de IA: análisis simultáneos, timeout por intento y reintentos con backoff
+    AGENT_MAX_CONCURRENCY: int = 4
+    AGENT_TIMEOUT_SECONDS: float = 30.0
+    AGENT_MAX_RETRIES: int = 2
+    AGENT_RETRY_BACKOFF_SECONDS: float = 0.5
+
+    # Caché de análisis por contenido de imagen: memoria (LRU + TTL), nivel
+    # persistente en MongoDB y, opcional, hash perceptual para casi-duplicados
+    # de la misma ruta/usuario (hasta AGENT_CACHE_PHASH_PER_SCOPE por ruta/usuario)
+    AGENT_CACHE_ENABLED: bool = True
+    AGENT_CACHE_MAX_SIZE: int = 2048
+    AGENT_CACHE_TTL_SECONDS: float = 86400.0
+    AGENT_CACHE_PHASH_ENABLED: bool = False
+    AGENT_CACHE_PHASH_MAX_DISTANCE: int = 4
+    AGENT_CACHE_PHASH_PER_SCOPE: int = 64
+    AGENT_CACHE_PERSISTENT: bool = True
+    AGENT_CACHE_PERSISTENT_TTL_DAYS: int = 30
+
+    # Preprocesamiento antes de subir al modelo: lado máximo (px), formato y calidad
+    AGENT_IMAGE_MAX_EDGE: int = 1024
+    AGENT_IMAGE_FORMAT: str = "JPEG"
+    AGENT_IMAGE_QUALITY: int = 80
+
+    # Almacenamiento de fotos: "gridfs" o "local" (directorio BLOB_LOCAL_DIR)
+    BLOB_BACKEND: str = "gridfs"
+    BLOB_LOCAL_DIR: str = "data/fotos"
+    PHOTO_THUMBNAIL_MAX_EDGE: int = 160
+
+    # Paginación por cursor de los endpoints de listado
+    PAGE_DEFAULT_LIMIT: int = 100
+    PAGE_MAX_LIMIT: int = 1000
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,71 @@
+"""
+Migración: agregar `user_id` y `route_id` a las alertas antiguas
+
+Las alertas creadas antes solo guardaban `name_user` y `route_name`. Esta
+migración busca el usuario y la ruta por nombre, completa los ids y luego
+recalcula los contadores de `alertas_conteo`. Se puede ejecutar varias veces.
+
+Uso:
+    python -m app.migrations.backfill_alert_ids
+"""
+
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany
+
+from app.config.settings import settings
+from app.services.alert_counts import rebuild_alert_counts
+
+
+async def _ids_by_name(collection) -> dict:
+    """{nombre: id} de una colección (si hay nombres repetidos gana el primero)"""
+    ids = {}
+    async for document in collection.find({}, {"name": 1}).sort("_id", 1):
+        ids.setdefault(document.get("name"), str(document["_id"]))
+    return ids
+
+
+async def migrate(db) -> dict:
+    user_ids = await _ids_by_name(db["users"])
+    route_ids = await _ids_by_name(db["routes"])
+    alerts = db["alertas"]
+
+    operations = []
+    missing_users = await alerts.distinct("name_user", {"user_id": None})
+    for name in missing_users:
+        if name in user_ids:
+            operations.append(UpdateMany({"name_user": name, "user_id": None}, {"$set": {"user_id": user_ids[name]}}))
+
+    missing_routes = await alerts.distinct("route_name", {"route_id": None})
+    for name in missing_routes:
+        if name in route_ids:
+            operations.append(UpdateMany({"route_name": name, "route_id": None}, {"$set": {"route_id": route_ids[name]}}))
+
+    updated = 0
+    if operations:
+        result = await alerts.bulk_write(operations, ordered=False)
+        updated = result.modified_count
+
+    unresolved_users = [name for name in missing_users if name not in user_ids]
+    unresolved_routes = [name for name in missing_routes if name not in route_ids]
+    for name in unresolved_users:
+        print(f"⚠️ Usuario sin coincidencia: {name}")
+    for name in unresolved_routes:
+        print(f"⚠️ Ruta sin coincidencia: {name}")
+
+    counters = await rebuild_alert_counts(db)
+    return {"updated": updated, "counters": counters}
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        result = await migrate(client[settings.DATABASE_NAME])
+        print(f"✅ {result['updated']} campos de id completados, {result['counters']} contadores recalculados")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
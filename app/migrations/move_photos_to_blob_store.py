@@ -0,0 +1,55 @@
+"""
+Migración: mover `foto_base64` de rutas_completadas al blob store
+
+Para cada documento que todavía tiene la foto embebida en base64, guarda la
+imagen en el backend configurado (BLOB_BACKEND), agrega `foto_ref` y la
+miniatura, y elimina `foto_base64`. Se puede ejecutar varias veces.
+
+Uso:
+    python -m app.migrations.move_photos_to_blob_store
+"""
+
+import asyncio
+import base64
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config.settings import settings
+from app.services.blob_store import init_blob_store
+from app.services.photos import store_photo
+
+
+async def migrate(db) -> int:
+    blob_store = init_blob_store(db)
+    collection = db["rutas_completadas"]
+    migrated = 0
+
+    cursor = collection.find({"foto_base64": {"$exists": True}}, {"foto_base64": 1})
+    async for document in cursor:
+        try:
+            image_bytes = base64.b64decode(document["foto_base64"])
+            photo_fields = await store_photo(blob_store, image_bytes)
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar {document['_id']}: {e}")
+            continue
+
+        await collection.update_one(
+            {"_id": document["_id"]},
+            {"$set": photo_fields, "$unset": {"foto_base64": ""}}
+        )
+        migrated += 1
+
+    return migrated
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        migrated = await migrate(client[settings.DATABASE_NAME])
+        print(f"✅ {migrated} fotos movidas al blob store")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
-from app.schemas.agent import ImageAnalysisRequest, ImageAnalysisResponse, UpdateRutaCompletadaRequest
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Depends, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from app.schemas.agent import ImageAnalysisRequest, ImageAnalysisResponse, RutaCompletadaResponse, UpdateRutaCompletadaRequest
 from app.agents.trash_vision_agent import trash_agent
 from app.config.database import get_database
+from app.config.logging_config import get_logger
+from app.services.blob_store import BlobStore, get_blob_store, is_valid_key
+from app.services.photos import PHOTO_FIELDS_EXCLUDED, RUTA_COMPLETADA_FIELDS, store_photo
+from app.services.pagination import Page, PageParams, paginate, page_response
+from app.services.streaming import export_response
+from app.services.time_range import BOLIVIA_TZ, to_naive
+from typing import Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
+import asyncio
 import base64
+import re
+
+logger = get_logger(__name__)
 
 router = APIRouter(
     prefix="/agent",
@@ -14,12 +25,17 @@ router = APIRouter(
 
 
 @router.post("/analyze-trash-bin", response_model=ImageAnalysisResponse)
-async def analyze_trash_bin_image(request: ImageAnalysisRequest, db=Depends(get_database)):
+async def analyze_trash_bin_image(
+    request: ImageAnalysisRequest,
+    db=Depends(get_database),
+    blob_store: BlobStore = Depends(get_blob_store)
+):
     """
     Analizar imagen de carrito de basura con IA (Gemini Vision)
     
     Recibe una imagen en base64 y retorna el porcentaje de llenado.
-    Guarda el resultado en la colección "rutas_completadas".
+    Guarda el resultado en la colección "rutas_completadas"; la foto se guarda
+    en el blob store y el documento solo lleva la referencia y una miniatura.
     
     **Ejemplo de uso:**
     ```python
@@ -40,10 +56,19 @@ async def analyze_trash_bin_image(request: ImageAnalysisRequest, db=Depends(get_
     ```
     """
     try:
+        try:
+            image_bytes = await asyncio.to_thread(base64.b64decode, request.image_base64)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Imagen base64 inválida: {str(e)}"
+            )
+        
         # Analizar imagen con el agente
-        fill_percentage = trash_agent.analyze_image_base64(request.image_base64)
+        result = await trash_agent.analyze_image_async(image_bytes, scope=request.route_id or request.user_id)
+        fill_percentage = result.fill_percentage
         
-        print(f"📊 Porcentaje analizado: {fill_percentage}")
+        logger.info("Porcentaje analizado", extra={"fill_percentage": fill_percentage})
         
         # Guardar en la colección "rutas_completadas"
         rutas_completadas_collection = db["rutas_completadas"]
@@ -52,20 +77,23 @@ async def analyze_trash_bin_image(request: ImageAnalysisRequest, db=Depends(get_
         nuevo_documento = {
             "nombre": "Juan Agustin",
             "ruta": "Ruta 5 - UPSA",
-            "foto_base64": request.image_base64,
+            **await store_photo(blob_store, image_bytes),
             "volumen_porcentual": fill_percentage,
             "timestamp": bolivia_time
         }
         
-        print(f"💾 Intentando guardar en rutas_completadas...")
-        result = await rutas_completadas_collection.insert_one(nuevo_documento)
-        print(f"✅ Documento guardado con ID: {result.inserted_id}")
+        inserted = await rutas_completadas_collection.insert_one(nuevo_documento)
+        logger.info("Documento guardado en rutas_completadas", extra={"document_id": str(inserted.inserted_id)})
         
         return ImageAnalysisResponse(
             fill_percentage=fill_percentage,
+            cached=result.cached,
+            stats=result.stats,
             timestamp=datetime.now()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -74,7 +102,13 @@ async def analyze_trash_bin_image(request: ImageAnalysisRequest, db=Depends(get_
 
 
 @router.post("/analyze-trash-bin-file")
-async def analyze_trash_bin_file(file: UploadFile = File(...), db=Depends(get_database)):
+async def analyze_trash_bin_file(
+    file: UploadFile = File(...),
+    route_id: Optional[str] = Form(None, description="Ruta de la foto (acota la búsqueda de fotos casi idénticas)"),
+    user_id: Optional[str] = Form(None, description="Recolector que tomó la foto (si no se indica la ruta)"),
+    db=Depends(get_database),
+    blob_store: BlobStore = Depends(get_blob_store)
+):
     """
     Analizar imagen de carrito de basura subiendo archivo directamente
     
@@ -100,30 +134,29 @@ async def analyze_trash_bin_file(file: UploadFile = File(...), db=Depends(get_da
         # Leer bytes de la imagen
         image_bytes = await file.read()
         
-        # Convertir a base64 para guardar en BD
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
         # Analizar con el agente
-        fill_percentage = trash_agent.analyze_image(image_bytes)
+        result = await trash_agent.analyze_image_async(image_bytes, scope=route_id or user_id)
+        fill_percentage = result.fill_percentage
         
-        print(f"📊 Porcentaje analizado: {fill_percentage}")
+        logger.info("Porcentaje analizado", extra={"fill_percentage": fill_percentage})
         
         # Guardar en la colección "rutas_completadas"
         rutas_completadas_collection = db["rutas_completadas"]
         nuevo_documento = {
             "nombre": "Juan Agustin",
             "ruta": "Ruta 5 - UPSA",
-            "foto_base64": image_base64,
+            **await store_photo(blob_store, image_bytes),
             "volumen_porcentual": fill_percentage,
             "timestamp": datetime.now()
         }
         
-        print(f"💾 Intentando guardar en rutas_completadas...")
-        result = await rutas_completadas_collection.insert_one(nuevo_documento)
-        print(f"✅ Documento guardado con ID: {result.inserted_id}")
+        inserted = await rutas_completadas_collection.insert_one(nuevo_documento)
+        logger.info("Documento guardado en rutas_completadas", extra={"document_id": str(inserted.inserted_id)})
         
         return ImageAnalysisResponse(
             fill_percentage=fill_percentage,
+            cached=result.cached,
+            stats=result.stats,
             timestamp=datetime.now()
         )
         
@@ -136,28 +169,32 @@ async def analyze_trash_bin_file(file: UploadFile = File(...), db=Depends(get_da
         )
 
 
-@router.get("/rutas-completadas")
-async def get_rutas_completadas(db=Depends(get_database)):
+@router.get("/rutas-completadas", response_model=Page[RutaCompletadaResponse])
+async def get_rutas_completadas(page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todos los registros de rutas completadas
+    Obtener los registros de rutas completadas, del más reciente al más antiguo (paginado)
     
-    Retorna la lista de análisis guardados con nombre, foto en base64 y volumen porcentual.
+    Retorna la lista de análisis guardados con nombre, referencia a la foto
+    (`foto_ref`), miniatura en base64 y volumen porcentual. La foto completa
+    se obtiene con `GET /api/agent/fotos/{foto_ref}`.
     """
     try:
         rutas_completadas_collection = db["rutas_completadas"]
         
-        # Obtener todos los documentos
-        rutas = await rutas_completadas_collection.find().to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for ruta in rutas:
-            ruta["_id"] = str(ruta["_id"])
+        # Nunca se proyecta `foto_base64` de registros antiguos
+        rutas_page = await paginate(
+            rutas_completadas_collection,
+            page,
+            allowed_fields=RUTA_COMPLETADA_FIELDS,
+            sort_field="timestamp",
+            direction=-1,
+            since_field="timestamp"
+        )
         
-        return {
-            "total": len(rutas),
-            "rutas_completadas": rutas
-        }
+        return page_response(rutas_page, RutaCompletadaResponse, page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -165,6 +202,60 @@ async def get_rutas_completadas(db=Depends(get_database)):
         )
 
 
+# La miniatura no se exporta: los reportes solo necesitan la referencia a la foto
+RUTA_COMPLETADA_EXPORT_COLUMNS = ("_id",) + tuple(
+    field for field in RUTA_COMPLETADA_FIELDS if field != "foto_thumbnail_base64"
+)
+
+
+@router.get("/rutas-completadas/export")
+async def export_rutas_completadas(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Formato: ndjson o csv"),
+    start: Optional[datetime] = Query(None, description="Desde esta fecha"),
+    end: Optional[datetime] = Query(None, description="Hasta esta fecha"),
+    nombre: Optional[str] = Query(None, description="Solo registros de este recolector"),
+    ruta: Optional[str] = Query(None, description="Solo registros de esta ruta"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Documentos por lote"),
+    db=Depends(get_database)
+):
+    """
+    Exportar rutas completadas en NDJSON o CSV (streaming, ordenadas por fecha)
+    
+    El cursor se recorre por lotes de `batch_size` y cada lote se escribe a la
+    respuesta antes de leer el siguiente. No incluye fotos ni miniaturas.
+    """
+    query = {}
+    
+    # Se guardan en hora de Bolivia sin zona: las fechas con zona se convierten
+    start = to_naive(start, BOLIVIA_TZ)
+    end = to_naive(end, BOLIVIA_TZ)
+    
+    if start or end:
+        if start and end and start > end:
+            raise HTTPException(status_code=400, detail="`start` debe ser anterior a `end`")
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lte"] = end
+    
+    if nombre:
+        query["nombre"] = nombre
+    if ruta:
+        query["ruta"] = ruta
+    
+    projection = {field: 1 for field in RUTA_COMPLETADA_EXPORT_COLUMNS}
+    cursor = db["rutas_completadas"].find(query, projection).sort("timestamp", 1)
+    
+    return export_response(
+        cursor,
+        format,
+        RUTA_COMPLETADA_EXPORT_COLUMNS,
+        filename="rutas_completadas",
+        batch_size=batch_size
+    )
+
+
 @router.patch("/rutas-completadas/{ruta_id}")
 async def update_ruta_completada(
     ruta_id: str,
@@ -213,7 +304,7 @@ async def update_ruta_completada(
             )
         
         # Obtener documento actualizado
-        updated_ruta = await rutas_completadas_collection.find_one({"_id": ObjectId(ruta_id)})
+        updated_ruta = await rutas_completadas_collection.find_one({"_id": ObjectId(ruta_id)}, PHOTO_FIELDS_EXCLUDED)
         updated_ruta["_id"] = str(updated_ruta["_id"])
         
         return {
@@ -230,6 +321,87 @@ async def update_ruta_completada(
         )
 
 
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(range_header: str, size: int):
+    """
+    Interpretar un header Range de un solo rango
+    
+    Returns:
+        (start, end) inclusive, o None si el rango no es satisfacible
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    
+    if not match.group(1):
+        # bytes=-N: últimos N bytes
+        suffix = int(match.group(2))
+        if suffix == 0:
+            return None
+        return max(0, size - suffix), size - 1
+    
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.get("/fotos/{foto_ref}")
+async def get_foto(foto_ref: str, request: Request, blob_store: BlobStore = Depends(get_blob_store)):
+    """
+    Obtener la imagen de una ruta completada
+    
+    Transmite los bytes en streaming. Soporta:
+    - **ETag / If-None-Match**: la clave es el hash del contenido, así que la
+      imagen nunca cambia (responde 304 si el cliente ya la tiene)
+    - **Range**: descargas parciales (206 Partial Content)
+    """
+    if not is_valid_key(foto_ref):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Referencia de foto inválida")
+    
+    info = await blob_store.stat(foto_ref)
+    if info is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Foto no encontrada")
+    
+    etag = f'"{info.key}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    start, end = 0, info.size - 1
+    status_code = status.HTTP_200_OK
+    
+    range_header = request.headers.get("range")
+    if range_header and info.size > 0:
+        byte_range = _parse_range(range_header, info.size)
+        if byte_range is None:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{info.size}"}
+            )
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    
+    headers["Content-Length"] = str(end - start + 1 if info.size > 0 else 0)
+    
+    return StreamingResponse(
+        blob_store.iter_range(foto_ref, start, end),
+        status_code=status_code,
+        media_type=info.content_type,
+        headers=headers
+    )
+
+
 @router.get("/health")
 async def agent_health_check():
     """Verificar que el agente de IA está funcionando"""
@@ -243,6 +415,7 @@ async def agent_health_check():
             "agent": "Trash Vision AI",
             "model": "gemini-2.5-flash",
             "api_key_configured": api_key_configured,
+            "stats": trash_agent.get_stats(),
             "message": "Agente listo para analizar imágenes" if api_key_configured else "⚠️ Configura GEMINI_API_KEY en .env"
         }
     except Exception as e:
@@ -1,16 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from typing import List
-from datetime import datetime, timezone, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
+from typing import Optional
+from datetime import date, datetime
 from bson import ObjectId
 from app.config.database import get_database
 from app.schemas.alert import AlertCreate, AlertResponse
 from app.services.connection_manager import manager
+from app.services.alert_service import record_deviation_alert, delete_alert_by_id
+from app.services.alert_counts import get_alert_counts
+from app.services.cache import get_cached_user, get_cached_route
+from app.services.pagination import Page, PageParams, paginate, page_response
+from app.services.streaming import export_response
+from app.services.time_range import BOLIVIA_TZ, to_naive
 
 router = APIRouter(
     prefix="/alerts",
     tags=["Alerts"]
 )
 
+ALERT_FIELDS = ("user_id", "route_id", "name_user", "route_name", "message", "date")
+
+
+async def _alerts_page(db, page: PageParams, query: dict = None):
+    """Página de alertas de la más reciente a la más antigua"""
+    return await paginate(
+        db["alertas"],
+        page,
+        allowed_fields=ALERT_FIELDS,
+        query=query,
+        sort_field="date",
+        direction=-1,
+        since_field="date"
+    )
+
+
 @router.post("/", response_model=AlertResponse, status_code=status.HTTP_201_CREATED)
 async def create_alert(alert: AlertCreate, db=Depends(get_database)):
     """
@@ -24,8 +46,7 @@ async def create_alert(alert: AlertCreate, db=Depends(get_database)):
     """
     try:
         # Consultar nombre del usuario
-        users_collection = db["users"]
-        user = await users_collection.find_one({"_id": ObjectId(alert.user_id)})
+        user = await get_cached_user(db, alert.user_id)
         
         if not user:
             raise HTTPException(
@@ -36,8 +57,7 @@ async def create_alert(alert: AlertCreate, db=Depends(get_database)):
         name_user = user.get("name", "Usuario Desconocido")
         
         # Consultar nombre de la ruta
-        routes_collection = db["routes"]
-        route = await routes_collection.find_one({"_id": ObjectId(alert.route_id)})
+        route = await get_cached_route(db, alert.route_id)
         
         if not route:
             raise HTTPException(
@@ -47,32 +67,15 @@ async def create_alert(alert: AlertCreate, db=Depends(get_database)):
         
         route_name = route.get("name", "Ruta Desconocida")
         
-        # Crear documento de alerta con hora de Bolivia (UTC-4)
-        # Bolivia está 4 horas ATRÁS de UTC
-        bolivia_time = datetime.utcnow() - timedelta(hours=4)
-        alerts_collection = db["alertas"]
-        new_alert = {
-            "name_user": name_user,
-            "route_name": route_name,
-            "message": "Se desvió de su ruta",
-            "date": bolivia_time
-        }
-        
-        result = await alerts_collection.insert_one(new_alert)
-        
-        # Retornar alerta creada
-        created_alert = await alerts_collection.find_one({"_id": result.inserted_id})
-        created_alert["_id"] = str(created_alert["_id"])
-        
-        # 🔔 Enviar notificación por WebSocket a todos los clientes conectados
+        # Registrar la alerta y notificar por WebSocket
+        created_alert = await record_deviation_alert(
+            db,
+            name_user,
+            route_name,
+            user_id=alert.user_id,
+            route_id=alert.route_id
+        )
         alert_response = AlertResponse(**created_alert)
-        await manager.broadcast_alert({
-            "_id": created_alert["_id"],
-            "name_user": name_user,
-            "route_name": route_name,
-            "message": "Se desvió de su ruta",
-            "date": bolivia_time.isoformat()
-        })
         
         return alert_response
         
@@ -85,21 +88,19 @@ async def create_alert(alert: AlertCreate, db=Depends(get_database)):
         )
 
 
-@router.get("/", response_model=List[AlertResponse])
-async def get_all_alerts(db=Depends(get_database)):
+@router.get("/", response_model=Page[AlertResponse])
+async def get_all_alerts(page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todas las alertas registradas
+    Obtener las alertas registradas, de la más reciente a la más antigua (paginado)
+    
+    La página siguiente se pide con `next_cursor` (también en el header `X-Next-Cursor`).
     """
     try:
-        alerts_collection = db["alertas"]
-        alerts = await alerts_collection.find().sort("date", -1).to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for alert in alerts:
-            alert["_id"] = str(alert["_id"])
-        
-        return alerts
+        alerts_page = await _alerts_page(db, page)
+        return page_response(alerts_page, AlertResponse, page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -107,30 +108,95 @@ async def get_all_alerts(db=Depends(get_database)):
         )
 
 
-@router.get("/user/{user_id}", response_model=List[AlertResponse])
-async def get_alerts_by_user(user_id: str, db=Depends(get_database)):
+@router.get("/export")
+async def export_alerts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Formato: ndjson o csv"),
+    start: Optional[datetime] = Query(None, description="Desde esta fecha"),
+    end: Optional[datetime] = Query(None, description="Hasta esta fecha"),
+    user_id: Optional[str] = Query(None, description="Solo alertas de este usuario"),
+    route_id: Optional[str] = Query(None, description="Solo alertas de esta ruta"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Documentos por lote"),
+    db=Depends(get_database)
+):
+    """
+    Exportar alertas en NDJSON o CSV (streaming, ordenadas por fecha)
+    
+    Pensado para reportes: el cursor se recorre por lotes de `batch_size` y
+    cada lote se escribe a la respuesta antes de leer el siguiente.
+    """
+    query = {}
+    
+    # Se guardan en hora de Bolivia sin zona: las fechas con zona se convierten
+    start = to_naive(start, BOLIVIA_TZ)
+    end = to_naive(end, BOLIVIA_TZ)
+    
+    if start or end:
+        if start and end and start > end:
+            raise HTTPException(status_code=400, detail="`start` debe ser anterior a `end`")
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lte"] = end
+    
+    if user_id:
+        query["user_id"] = user_id
+    if route_id:
+        query["route_id"] = route_id
+    
+    columns = ("_id",) + ALERT_FIELDS
+    cursor = db["alertas"].find(query, {field: 1 for field in columns}).sort("date", 1)
+    
+    return export_response(cursor, format, columns, filename="alertas", batch_size=batch_size)
+
+
+@router.get("/counts")
+async def get_alerts_counts(
+    by: str = Query("route", pattern="^(route|user|day)$", description="Agrupar por ruta, usuario o día"),
+    key: Optional[str] = Query(None, description="ID de la ruta o del usuario"),
+    start: Optional[date] = Query(None, description="Desde este día"),
+    end: Optional[date] = Query(None, description="Hasta este día"),
+    db=Depends(get_database)
+):
+    """
+    Cantidad de alertas por ruta, usuario o día
+    
+    Lee los contadores que se actualizan al crear y eliminar alertas, sin
+    recorrer la colección de alertas. Sin `start`/`end`, by=route y by=user
+    devuelven solo el total acumulado (sin `days`).
+    
+    **Ejemplo de respuesta (by=route con rango):**
+    ```json
+    {
+        "by": "route",
+        "counts": [
+            {"key": "6918c12092cd6492dbd79510", "name": "Ruta 1", "total": 3, "days": {"2025-11-15": 2, "2025-11-16": 1}}
+        ]
+    }
+    ```
+    """
+    try:
+        counts = await get_alert_counts(db, by, key=key, start=start, end=end)
+        return {"by": by, "counts": counts}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener conteo de alertas: {str(e)}"
+        )
+
+
+@router.get("/user/{user_id}", response_model=Page[AlertResponse])
+async def get_alerts_by_user(user_id: str, page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todas las alertas de un usuario específico
+    Obtener las alertas de un usuario específico (paginado)
     """
     try:
-        # Obtener nombre del usuario
-        users_collection = db["users"]
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
-        
-        if not user:
+        # 404 si el usuario no existe (distinto de un usuario sin alertas)
+        if not await get_cached_user(db, user_id):
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
-        name_user = user.get("name")
-        
-        # Buscar alertas por nombre de usuario
-        alerts_collection = db["alertas"]
-        alerts = await alerts_collection.find({"name_user": name_user}).sort("date", -1).to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for alert in alerts:
-            alert["_id"] = str(alert["_id"])
-        
-        return alerts
+        alerts_page = await _alerts_page(db, page, {"user_id": user_id})
+        return page_response(alerts_page, AlertResponse, page)
         
     except HTTPException:
         raise
@@ -141,30 +207,18 @@ async def get_alerts_by_user(user_id: str, db=Depends(get_database)):
         )
 
 
-@router.get("/route/{route_id}", response_model=List[AlertResponse])
-async def get_alerts_by_route(route_id: str, db=Depends(get_database)):
+@router.get("/route/{route_id}", response_model=Page[AlertResponse])
+async def get_alerts_by_route(route_id: str, page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todas las alertas de una ruta específica
+    Obtener las alertas de una ruta específica (paginado)
     """
     try:
-        # Obtener nombre de la ruta
-        routes_collection = db["routes"]
-        route = await routes_collection.find_one({"_id": ObjectId(route_id)})
-        
-        if not route:
+        # 404 si la ruta no existe (distinto de una ruta sin alertas)
+        if not await get_cached_route(db, route_id):
             raise HTTPException(status_code=404, detail="Ruta no encontrada")
         
-        route_name = route.get("name")
-        
-        # Buscar alertas por nombre de ruta
-        alerts_collection = db["alertas"]
-        alerts = await alerts_collection.find({"route_name": route_name}).sort("date", -1).to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for alert in alerts:
-            alert["_id"] = str(alert["_id"])
-        
-        return alerts
+        alerts_page = await _alerts_page(db, page, {"route_id": route_id})
+        return page_response(alerts_page, AlertResponse, page)
         
     except HTTPException:
         raise
@@ -181,10 +235,9 @@ async def delete_alert(alert_id: str, db=Depends(get_database)):
     Eliminar una alerta por ID
     """
     try:
-        alerts_collection = db["alertas"]
-        result = await alerts_collection.delete_one({"_id": ObjectId(alert_id)})
+        deleted = await delete_alert_by_id(db, ObjectId(alert_id))
         
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Alerta no encontrada")
         
         return None
@@ -4,12 +4,17 @@ from datetime import datetime
 from bson import ObjectId
 from app.config.database import get_database
 from app.schemas.assignment import AssignmentCreate, AssignmentResponse
+from app.services.deviation_engine import deviation_engine
+from app.services.cache import get_cached_user, get_cached_route, invalidate_assignment
+from app.services.pagination import Page, PageParams, paginate, page_response
 
 router = APIRouter(
     prefix="/assignments",
     tags=["Assignments"]
 )
 
+ASSIGNMENT_FIELDS = ("user_id", "route_id", "assigned_at", "status")
+
 
 @router.post("/", response_model=AssignmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_assignment(assignment: AssignmentCreate, db=Depends(get_database)):
@@ -21,17 +26,24 @@ async def create_assignment(assignment: AssignmentCreate, db=Depends(get_databas
     """
     try:
         # Verificar que el usuario existe
-        users_collection = db["users"]
-        user = await users_collection.find_one({"_id": ObjectId(assignment.user_id)})
+        user = await get_cached_user(db, assignment.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
         # Verificar que la ruta existe
         routes_collection = db["routes"]
-        route = await routes_collection.find_one({"_id": ObjectId(assignment.route_id)})
+        route = await get_cached_route(db, assignment.route_id)
         if not route:
             raise HTTPException(status_code=404, detail="Ruta no encontrada")
         
+        # Precalcular el índice de segmentos de la ruta para detectar desvíos
+        deviation_engine.index_route(
+            assignment.route_id,
+            route.get("name", "Ruta Desconocida"),
+            route.get("coordinates", [])
+        )
+        deviation_engine.reset_user(assignment.user_id)
+        
         # Actualizar el atributo assigned de la ruta a 1
         await routes_collection.update_one(
             {"_id": ObjectId(assignment.route_id)},
@@ -47,6 +59,7 @@ async def create_assignment(assignment: AssignmentCreate, db=Depends(get_databas
         }
         
         result = await assignments_collection.insert_one(new_assignment)
+        invalidate_assignment(assignment.user_id, assignment.route_id)
         
         # Obtener el documento creado
         created_assignment = await assignments_collection.find_one({"_id": result.inserted_id})
@@ -58,20 +71,25 @@ async def create_assignment(assignment: AssignmentCreate, db=Depends(get_databas
         raise HTTPException(status_code=500, detail=f"Error al crear asignación: {str(e)}")
 
 
-@router.get("/", response_model=List[AssignmentResponse])
-async def get_assignments(db=Depends(get_database)):
+@router.get("/", response_model=Page[AssignmentResponse])
+async def get_assignments(page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todas las asignaciones
+    Obtener las asignaciones (paginado)
+    
+    La página siguiente se pide con `next_cursor` (también en el header `X-Next-Cursor`).
+    `since` filtra por `assigned_at`.
     """
     try:
         assignments_collection = db["assignment"]
-        assignments = await assignments_collection.find().to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for assignment in assignments:
-            assignment["_id"] = str(assignment["_id"])
-        
-        return assignments
+        assignments_page = await paginate(
+            assignments_collection,
+            page,
+            allowed_fields=ASSIGNMENT_FIELDS,
+            since_field="assigned_at"
+        )
+        return page_response(assignments_page, AssignmentResponse, page)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener asignaciones: {str(e)}")
 
@@ -119,11 +137,14 @@ async def delete_assignment(assignment_id: str, db=Depends(get_database)):
     """
     try:
         assignments_collection = db["assignment"]
-        result = await assignments_collection.delete_one({"_id": ObjectId(assignment_id)})
+        deleted = await assignments_collection.find_one_and_delete({"_id": ObjectId(assignment_id)})
         
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Asignación no encontrada")
         
+        invalidate_assignment(deleted.get("user_id"), deleted.get("route_id"))
+        deviation_engine.reset_user(deleted.get("user_id"))
+        
         return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar asignación: {str(e)}")
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime, timedelta
+from app.config.database import get_database
+from app.services.location_history import COLLECTION_NAME
+from app.services.streaming import NDJSON_MEDIA_TYPE, stream_ndjson
+from app.services.time_range import to_naive
+
+router = APIRouter(
+    prefix="/history",
+    tags=["History"]
+)
+
+
+def _to_track_point(document: dict) -> dict:
+    """Formato de cada punto del recorrido"""
+    return {
+        "lat": document["lat"],
+        "lng": document["lng"],
+        "route_id": document.get("meta", {}).get("route_id"),
+        "timestamp": document["ts"]
+    }
+
+
+@router.get("/{user_id}")
+async def get_user_track(
+    user_id: str,
+    start: Optional[datetime] = Query(None, description="Inicio del rango (por defecto: 24 h antes de `end`)"),
+    end: Optional[datetime] = Query(None, description="Fin del rango (por defecto: ahora)"),
+    db=Depends(get_database)
+):
+    """
+    Obtener el recorrido de un usuario en un rango de tiempo
+
+    Responde en NDJSON (un punto JSON por línea, ordenados por fecha) y en
+    streaming, así rangos grandes no se cargan completos en memoria.
+
+    **Ejemplo de línea:**
+    ```
+    {"lat":-17.779723,"lng":-63.192147,"route_id":"6918c12092cd6492dbd79510","timestamp":"2025-11-15T10:30:00"}
+    ```
+    """
+    # `ts` se guarda en hora local sin zona: las fechas con zona se convierten
+    end = to_naive(end) or datetime.now()
+    start = to_naive(start) or end - timedelta(hours=24)
+
+    if start > end:
+        raise HTTPException(status_code=400, detail="`start` debe ser anterior a `end`")
+
+    history_collection = db[COLLECTION_NAME]
+    cursor = history_collection.find(
+        {"meta.user_id": user_id, "ts": {"$gte": start, "$lte": end}},
+        {"_id": 0}
+    ).sort("ts", 1)
+
+    return StreamingResponse(
+        stream_ndjson(cursor, transform=_to_track_point),
+        media_type=NDJSON_MEDIA_TYPE
+    )
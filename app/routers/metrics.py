@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+from app.agents.trash_vision_agent import trash_agent
+from app.config.database import get_database
+from app.config.settings import settings
+from app.services.cache import get_cache_stats
+from app.services.connection_manager import manager
+from app.services.index_manager import explain_hot_queries
+from app.services.location_history import location_history
+from app.services.location_persistence import location_persistence
+from app.services.metrics import CONTENT_TYPE, MetricFamily, registry
+from app.services.mongo_monitoring import pool_monitor
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+
+def _collect_tracking():
+    """Conexiones, colas y contadores del fan-out (se leen en cada scrape)"""
+    depths = [channel.queue_depth() for channel in manager.active_admins.values()]
+    yield (
+        MetricFamily("innova_ws_connections", "gauge", "Conexiones WebSocket abiertas por endpoint")
+        .add(manager.get_active_trackers_count(), endpoint="tracker")
+        .add(manager.get_active_admins_count(), endpoint="admin")
+        .add(len(manager.alert_listeners), endpoint="alerts")
+    )
+    yield (
+        MetricFamily("innova_admin_queue_depth", "gauge", "Mensajes pendientes en las colas de los admins")
+        .add(sum(depths), stat="total")
+        .add(max(depths, default=0), stat="max")
+    )
+    yield MetricFamily(
+        "innova_broadcast_frames_total", "counter", "Frames para admins según el resultado de encolarlos",
+        (({"result": result}, value) for result, value in manager.broadcast_stats.items())
+    )
+    yield MetricFamily(
+        "innova_broadcast_batch_total", "counter", "Lotes del tick, ubicaciones enviadas y omitidas",
+        (({"stat": stat}, value) for stat, value in manager.batch_stats.items())
+    )
+    yield MetricFamily("innova_live_users", "gauge", "Recolectores con ubicación en vivo en este proceso").add(
+        len(manager.live_locations)
+    )
+    if manager.gps_filter is not None:
+        yield MetricFamily(
+            "innova_gps_filter_fixes_total", "counter", "Fixes GPS aceptados o descartados por el filtro (jitter, speed)",
+            (({"result": result}, value) for result, value in manager.gps_filter.stats.items())
+        )
+
+    backplane = manager.backplane.get_stats()
+    yield MetricFamily(
+        "innova_backplane_events_total", "counter", "Eventos del backplane",
+        (({"stat": stat}, backplane[stat]) for stat in ("published", "received", "dropped", "errors") if stat in backplane)
+    )
+
+
+def _collect_services():
+    """Escrituras en segundo plano, agente, cachés y pool de MongoDB"""
+    pending = MetricFamily("innova_batcher_pending", "gauge", "Elementos esperando flush a MongoDB")
+    written = MetricFamily("innova_batcher_written_total", "counter", "Elementos escritos en lote")
+    errors = MetricFamily("innova_batcher_errors_total", "counter", "Flushes fallidos")
+    for name, service in (("last_location", location_persistence), ("location_history", location_history)):
+        stats = service.get_stats()
+        pending.add(stats["pending"], service=name)
+        written.add(stats["written"], service=name)
+        errors.add(stats["errors"], service=name)
+    yield from (pending, written, errors)
+
+    yield MetricFamily("innova_agent_in_flight", "gauge", "Análisis en curso en el modelo").add(trash_agent.in_flight)
+
+    cache = MetricFamily("innova_cache_lookups_total", "counter", "Consultas a las cachés en proceso")
+    for name, stats in get_cache_stats().items():
+        for result in ("hits", "misses", "coalesced"):
+            cache.add(stats[result], cache=name, result=result)
+    yield cache
+
+    pools = pool_monitor.get_stats(settings.MONGO_MAX_POOL_SIZE)["pools"]
+    connections = MetricFamily("innova_mongo_pool_connections", "gauge", "Conexiones del pool de MongoDB")
+    for address, stats in pools.items():
+        for state in ("open", "in_use", "waiting"):
+            connections.add(stats[state], address=address, state=state)
+    yield connections
+
+
+registry.register_collector(_collect_tracking)
+registry.register_collector(_collect_services)
+
+
+@router.get("")
+async def get_prometheus_metrics():
+    """
+    Métricas en formato de texto de Prometheus
+    
+    Incluye mensajes WebSocket por endpoint, duración del fan-out a admins,
+    profundidad de colas, latencia de MongoDB por colección y latencia y
+    errores del agente.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """
+    Métricas de las cachés en proceso (usuarios, rutas, asignaciones)
+    
+    Incluye hits, misses, consultas agrupadas (coalesced), desalojos LRU
+    e invalidaciones por caché.
+    """
+    return get_cache_stats()
+
+
+@router.get("/query-plans")
+async def get_query_plans(db=Depends(get_database)):
+    """
+    Diagnóstico de índices: `explain()` de las consultas frecuentes
+    
+    Para cada consulta devuelve las etapas del plan ganador y los índices
+    usados. `collscans` lista las que recorren la colección completa.
+    """
+    return await explain_hot_queries(db)
+
+
+@router.get("/mongo")
+async def get_mongo_metrics():
+    """
+    Métricas del pool de conexiones de MongoDB por servidor
+    
+    - `open` / `in_use`: conexiones abiertas y prestadas en este momento
+    - `waiting`: operaciones esperando una conexión libre
+    - `checkout_wait_ms`: tiempo de espera para obtener una conexión
+    - `utilization`: `in_use` / `max_pool_size`
+    """
+    return pool_monitor.get_stats(settings.MONGO_MAX_POOL_SIZE)
@@ -1,28 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
 from app.config.database import get_database
 from app.schemas.route import RouteResponse
+from app.services.pagination import Page, PageParams, paginate, page_response
 
 router = APIRouter(
     prefix="/routes",
     tags=["Routes"]
 )
 
+ROUTE_FIELDS = ("name", "coordinates", "assigned")
 
-@router.get("/", response_model=List[RouteResponse])
-async def get_routes(db=Depends(get_database)):
+
+@router.get("/", response_model=Page[RouteResponse])
+async def get_routes(page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todas las rutas
+    Obtener las rutas (paginado)
+    
+    La página siguiente se pide con `next_cursor` (también en el header `X-Next-Cursor`).
+    Con `fields=name,assigned` se omiten las coordenadas.
     """
     try:
         routes_collection = db["routes"]
-        routes = await routes_collection.find().to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for route in routes:
-            route["_id"] = str(route["_id"])
-        
-        return routes
+        routes_page = await paginate(routes_collection, page, allowed_fields=ROUTE_FIELDS)
+        return page_response(routes_page, RouteResponse, page)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener rutas: {str(e)}")
 
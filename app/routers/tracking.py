@@ -4,8 +4,25 @@ import json
 from datetime import datetime
 
 from app.config.database import get_database
+from app.config.logging_config import LOG_SAMPLE_EVERY, get_logger
+from app.services.binary_protocol import ENCODINGS, LOCATION_RECEIVED_FRAME
 from app.services.connection_manager import manager
-from app.schemas.tracking import LocationUpdate
+from app.services.location_persistence import location_persistence
+from app.services.location_history import location_history
+from app.services.metrics import (
+    TRACKER_REJECTED_INVALID,
+    TRACKER_REJECTED_RATE_LIMITED,
+    WS_ADMIN_IN,
+    WS_TRACKER_IN,
+    WS_TRACKER_OUT,
+)
+from app.services.rate_limit import tracker_rate_limiter
+from app.services.tracker_ingest import InvalidTrackerMessage, parse_binary_frame, parse_text_frame
+from app.services.deviation_engine import deviation_engine
+from app.services.cache import get_cached_user, get_cached_assignment_for_user
+from app.config.settings import settings
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
@@ -23,13 +40,22 @@ async def websocket_tracker_endpoint(websocket: WebSocket, user_id: str):
         "lat": -17.779723,
         "lng": -63.192147
     }
+    
+    O el mismo mensaje como frame binario de 9 bytes (ver binary_protocol);
+    en ese caso la confirmación también es binaria.
+    
+    Las ubicaciones se validan con `LocationUpdate` (lat/lng dentro de rango).
+    Cada conexión admite TRACKER_MAX_FIXES_PER_SECOND mensajes por segundo
+    (ráfagas de hasta TRACKER_BURST); los que exceden el límite se descartan
+    y el cliente recibe un solo `rate_limited` por ráfaga. Los fixes que
+    descarta el filtro GPS (jitter o saltos imposibles) se confirman igual.
     """
     # Obtener información del usuario desde la BD
     db = websocket.app.state.db
     users_collection = db["users"]
     
     try:
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await get_cached_user(db, user_id)
         if not user:
             await websocket.close(code=1008, reason="Usuario no encontrado")
             return
@@ -37,18 +63,21 @@ async def websocket_tracker_endpoint(websocket: WebSocket, user_id: str):
         user_name = user.get("name", "Usuario Desconocido")
         
         # Obtener ruta asignada (si existe)
-        assignments_collection = db["assignment"]
-        assignment = await assignments_collection.find_one({
-            "user_id": user_id
-        })
+        assignment = await get_cached_assignment_for_user(db, user_id)
         route_id = assignment.get("route_id") if assignment else None
         
+        # Precalcular el índice de la ruta para detectar desvíos
+        if route_id and settings.DEVIATION_ENABLED:
+            await deviation_engine.ensure_route(db, route_id)
+        
     except Exception as e:
         await websocket.close(code=1011, reason=f"Error al verificar usuario: {str(e)}")
         return
     
     # Conectar el tracker
     await manager.connect_tracker(websocket, user_id, user_name)
+    rate_limiter = tracker_rate_limiter()
+    rejected = 0
     
     # Actualizar estado en BD: is_online = true
     try:
@@ -70,58 +99,91 @@ async def websocket_tracker_endpoint(websocket: WebSocket, user_id: str):
         
         # Escuchar mensajes del cliente
         while True:
-            data = await websocket.receive_text()
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            
+            WS_TRACKER_IN.inc()
+            
+            # Límite por conexión: el exceso se descarta sin parsear
+            if rate_limiter is not None and not rate_limiter.allow():
+                TRACKER_REJECTED_RATE_LIMITED.inc()
+                if rate_limiter.streak == 1:
+                    await websocket.send_json({
+                        "type": "rate_limited",
+                        "message": f"Demasiadas ubicaciones (máximo {settings.TRACKER_MAX_FIXES_PER_SECOND:g} por segundo)"
+                    })
+                    WS_TRACKER_OUT.inc()
+                continue
+            
+            binary = received.get("bytes") is not None
             
             try:
-                message = json.loads(data)
+                if binary:
+                    location = parse_binary_frame(received["bytes"])
+                else:
+                    location = parse_text_frame(received["text"])
                 
                 # Procesar actualización de ubicación
-                if message.get("type") == "location_update":
-                    lat = message.get("lat")
-                    lng = message.get("lng")
+                if location is not None:
+                    lat = location.lat
+                    lng = location.lng
                     
-                    if lat is not None and lng is not None:
-                        # Actualizar ubicación en memoria y broadcast a admins
-                        await manager.update_tracker_location(
-                            user_id=user_id,
-                            user_name=user_name,
-                            lat=lat,
-                            lng=lng,
-                            route_id=route_id
-                        )
-                        
-                        # Actualizar last_location en BD
-                        try:
-                            await users_collection.update_one(
-                                {"_id": ObjectId(user_id)},
-                                {
-                                    "$set": {
-                                        "last_location": {
-                                            "lat": lat,
-                                            "lng": lng,
-                                            "updated_at": datetime.now()
-                                        }
-                                    }
-                                }
-                            )
-                        except:
-                            pass
+                    # Actualizar ubicación en memoria y broadcast a admins
+                    # (False si el filtro GPS descartó el fix)
+                    accepted = await manager.update_tracker_location(
+                        user_id=user_id,
+                        user_name=user_name,
+                        lat=lat,
+                        lng=lng,
+                        route_id=route_id
+                    )
+                    
+                    logger.debug("Ubicación recibida", extra={
+                        "user_id": user_id,
+                        "accepted": accepted,
+                        "sample_every": LOG_SAMPLE_EVERY
+                    })
+                    
+                    if accepted:
+                        # Actualizar last_location en BD (en lote, en segundo plano)
+                        location_persistence.record(user_id, lat, lng)
                         
-                        # Confirmar recepción al tracker
+                        # Detectar desvío de la ruta asignada
+                        if route_id and settings.DEVIATION_ENABLED:
+                            distance = deviation_engine.check(user_id, route_id, lat, lng)
+                            if distance is not None:
+                                deviation_engine.trigger_alert(db, user_id, user_name, route_id, distance)
+                    
+                    # Confirmar recepción al tracker
+                    if binary:
+                        await websocket.send_bytes(LOCATION_RECEIVED_FRAME)
+                    else:
                         await websocket.send_json({
                             "type": "location_received",
                             "timestamp": datetime.now().isoformat()
                         })
+                    WS_TRACKER_OUT.inc()
                 
-            except json.JSONDecodeError:
+            except InvalidTrackerMessage as e:
+                TRACKER_REJECTED_INVALID.inc()
+                rejected += 1
                 await websocket.send_json({
                     "type": "error",
-                    "message": "Formato JSON inválido"
+                    "message": str(e)
                 })
     
     except WebSocketDisconnect:
         # Desconectar tracker
         await manager.disconnect_tracker(user_id, user_name)
+        dropped = rate_limiter.dropped if rate_limiter is not None else 0
+        if rejected or dropped:
+            logger.info("Mensajes del tracker descartados", extra={
+                "user_id": user_id,
+                "invalid": rejected,
+                "rate_limited": dropped
+            })
+        deviation_engine.reset_user(user_id)
         
         # Actualizar estado en BD: is_online = false
         try:
@@ -134,7 +196,7 @@ async def websocket_tracker_endpoint(websocket: WebSocket, user_id: str):
 
 
 @router.websocket("/ws/admin/{admin_id}")
-async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
+async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str, encoding: str = "json"):
     """
     WebSocket para ADMINS (Web React)
     
@@ -143,15 +205,28 @@ async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
     
     Mensajes que recibe:
     - Lista inicial de usuarios activos
-    - Actualizaciones de ubicación en tiempo real
+    - Actualizaciones de ubicación en tiempo real: `location_update` por cada
+      ubicación o, con BROADCAST_TICK_SECONDS > 0, un `location_batch` por tick
     - Notificaciones de conexión/desconexión
+    
+    Mensajes que puede enviar:
+    - {"type": "get_active_users"}
+    - {"type": "subscribe", "bbox": [min_lng, min_lat, max_lng, max_lat], "route_ids": [...], "user_ids": [...]}
+      Solo recibe las ubicaciones que cumplen alguno de los filtros (todos opcionales)
+    - {"type": "unsubscribe"} - Volver a recibir todo
+    
+    Con `?encoding=binary` las ubicaciones llegan como frames binarios
+    (ver binary_protocol); el resto de los mensajes sigue en JSON.
     """
+    if encoding not in ENCODINGS:
+        await websocket.close(code=1008, reason=f"encoding inválido (usar: {', '.join(ENCODINGS)})")
+        return
+    
     # Verificar que es admin
     db = websocket.app.state.db
-    users_collection = db["users"]
     
     try:
-        admin = await users_collection.find_one({"_id": ObjectId(admin_id)})
+        admin = await get_cached_user(db, admin_id)
         if not admin or admin.get("rol") != "Admin":
             await websocket.close(code=1008, reason="No autorizado. Solo admins pueden conectarse")
             return
@@ -160,7 +235,7 @@ async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
         return
     
     # Conectar admin
-    await manager.connect_admin(websocket)
+    await manager.connect_admin(websocket, encoding)
     
     try:
         # El admin solo escucha, no envía datos
@@ -168,6 +243,7 @@ async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
         while True:
             # Recibir mensajes (aunque no se espera que el admin envíe nada)
             data = await websocket.receive_text()
+            WS_ADMIN_IN.inc()
             
             # Opcionalmente, puedes manejar comandos del admin aquí
             try:
@@ -175,19 +251,14 @@ async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
                 
                 # Ejemplo: admin pide lista actualizada de usuarios
                 if message.get("type") == "get_active_users":
-                    active_users = [
-                        {
-                            "user_id": user_id,
-                            **data
-                        }
-                        for user_id, data in manager.tracker_locations.items()
-                    ]
-                    
-                    await websocket.send_json({
-                        "type": "active_users",
-                        "users": active_users,
-                        "count": len(active_users)
-                    })
+                    await manager.send_active_users(websocket)
+                
+                # Limitar las ubicaciones recibidas a una zona, rutas o usuarios
+                elif message.get("type") == "subscribe":
+                    await manager.subscribe_admin(websocket, message)
+                
+                elif message.get("type") == "unsubscribe":
+                    await manager.unsubscribe_admin(websocket)
             
             except json.JSONDecodeError:
                 pass
@@ -197,13 +268,19 @@ async def websocket_admin_endpoint(websocket: WebSocket, admin_id: str):
 
 
 @router.get("/tracking/status")
-async def get_tracking_status():
+async def get_tracking_status(include_locations: bool = True):
     """
     Endpoint REST para obtener el estado del sistema de tracking
+    
+    Con `include_locations=false` se omiten las ubicaciones (para monitoreo frecuente).
     """
     return {
         "active_trackers": manager.get_active_trackers_count(),
         "active_admins": manager.get_active_admins_count(),
-        "tracked_users": len(manager.tracker_locations),
-        "locations": manager.tracker_locations
+        "tracked_users": len(manager.live_locations),
+        "broadcast": manager.get_broadcast_stats(),
+        "location_persistence": location_persistence.get_stats(),
+        "location_history": location_history.get_stats(),
+        "deviation": deviation_engine.get_stats(),
+        "locations": manager.live_locations.as_mapping() if include_locations else None
     }
@@ -1,28 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
 from app.config.database import get_database
 from app.schemas.user import UserResponse
+from app.services.pagination import Page, PageParams, paginate, page_response
 
 router = APIRouter(
     prefix="/users",
     tags=["Users"]
 )
 
+USER_FIELDS = ("name", "phone", "rol")
 
-@router.get("/", response_model=List[UserResponse])
-async def get_users(db=Depends(get_database)):
+
+@router.get("/", response_model=Page[UserResponse])
+async def get_users(page: PageParams = Depends(), db=Depends(get_database)):
     """
-    Obtener todos los usuarios
+    Obtener los usuarios (paginado)
+    
+    La página siguiente se pide con `next_cursor` (también en el header `X-Next-Cursor`).
     """
     try:
         users_collection = db["users"]
-        users = await users_collection.find().to_list(length=None)
-        
-        # Convertir ObjectId a string
-        for user in users:
-            user["_id"] = str(user["_id"])
-        
-        return users
+        users_page = await paginate(users_collection, page, allowed_fields=USER_FIELDS)
+        return page_response(users_page, UserResponse, page)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")
 
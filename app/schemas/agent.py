@@ -1,11 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Optional
 from datetime import datetime
 
 
 class ImageAnalysisRequest(BaseModel):
     """Schema para request de análisis de imagen"""
     image_base64: str = Field(..., description="Imagen del carrito de basura en formato base64")
+    route_id: Optional[str] = Field(None, description="Ruta de la foto (acota la búsqueda de fotos casi idénticas)")
+    user_id: Optional[str] = Field(None, description="Recolector que tomó la foto (si no se indica la ruta)")
     
     class Config:
         json_schema_extra = {
@@ -15,15 +17,62 @@ class ImageAnalysisRequest(BaseModel):
         }
 
 
+class ImageAnalysisStats(BaseModel):
+    """Métricas de un análisis"""
+    original_bytes: int = Field(..., description="Tamaño de la imagen recibida")
+    upload_bytes: Optional[int] = Field(None, description="Tamaño enviado al modelo tras reducir y re-codificar")
+    original_resolution: Optional[str] = Field(None, description="Resolución original (ej: 4032x3024)")
+    upload_resolution: Optional[str] = Field(None, description="Resolución enviada al modelo (ej: 1024x768)")
+    decode_ms: Optional[float] = Field(None, description="Tiempo de decodificación y reducción")
+    encode_ms: Optional[float] = Field(None, description="Tiempo de re-codificación")
+    model_ms: Optional[float] = Field(None, description="Tiempo de respuesta del modelo (con reintentos)")
+    total_ms: float = Field(..., description="Tiempo total del análisis")
+    
+    class Config:
+        protected_namespaces = ()
+
+
 class ImageAnalysisResponse(BaseModel):
     """Schema para respuesta de análisis"""
     fill_percentage: str = Field(..., description="Porcentaje de llenado del carrito (ej: 50%)")
+    cached: bool = Field(False, description="True si el resultado salió de la caché (sin llamar al modelo)")
+    stats: Optional[ImageAnalysisStats] = Field(None, description="Métricas del análisis")
     timestamp: datetime = Field(default_factory=datetime.now)
     
     class Config:
         json_schema_extra = {
             "example": {
                 "fill_percentage": "50%",
+                "cached": False,
+                "timestamp": "2025-11-15T10:30:00"
+            }
+        }
+
+
+class RutaCompletadaResponse(BaseModel):
+    """Schema de respuesta de una ruta completada (sin la foto en base64)"""
+    id: str = Field(..., alias="_id")
+    nombre: str = Field(..., description="Nombre del recolector")
+    ruta: str = Field(..., description="Nombre de la ruta")
+    foto_ref: Optional[str] = Field(None, description="Clave de la foto (GET /api/agent/fotos/{foto_ref})")
+    foto_content_type: Optional[str] = Field(None, description="Tipo de contenido de la foto")
+    foto_bytes: Optional[int] = Field(None, description="Tamaño de la foto")
+    foto_thumbnail_base64: Optional[str] = Field(None, description="Miniatura en base64")
+    volumen_porcentual: str = Field(..., description="Porcentaje de llenado (ej: 75%)")
+    timestamp: datetime = Field(..., description="Fecha y hora del análisis")
+    updated_at: Optional[datetime] = Field(None, description="Última modificación del volumen")
+    
+    class Config:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "_id": "507f1f77bcf86cd799439011",
+                "nombre": "Juan Agustin",
+                "ruta": "Ruta 5 - UPSA",
+                "foto_ref": "b221d9dbb083a7f33428d7c2a3c3198ae925614d70210e28716ccaa7cd4ddb79",
+                "foto_content_type": "image/jpeg",
+                "foto_bytes": 182345,
+                "volumen_porcentual": "75%",
                 "timestamp": "2025-11-15T10:30:00"
             }
         }
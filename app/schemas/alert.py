@@ -20,6 +20,8 @@ class AlertCreate(BaseModel):
 class AlertResponse(BaseModel):
     """Schema de respuesta de alerta"""
     id: str = Field(..., alias="_id")
+    user_id: Optional[str] = Field(None, description="ID del usuario")
+    route_id: Optional[str] = Field(None, description="ID de la ruta")
     name_user: str = Field(..., description="Nombre del usuario")
     route_name: str = Field(..., description="Nombre de la ruta")
     message: str = Field(..., description="Mensaje de la alerta")
@@ -30,6 +32,8 @@ class AlertResponse(BaseModel):
         json_schema_extra = {
             "example": {
                 "_id": "507f1f77bcf86cd799439011",
+                "user_id": "6918c21792cd6492dbd79515",
+                "route_id": "6918c12092cd6492dbd79510",
                 "name_user": "Agustin Apaza",
                 "route_name": "Ruta 1",
                 "message": "Se desvió de su ruta",
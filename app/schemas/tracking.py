@@ -5,9 +5,9 @@ from datetime import datetime
 
 class LocationUpdate(BaseModel):
     """Schema para actualización de ubicación desde app móvil"""
-    type: Literal["location_update"] = "location_update"
-    lat: float = Field(..., description="Latitud GPS")
-    lng: float = Field(..., description="Longitud GPS")
+    type: Literal["location_update"]
+    lat: float = Field(..., ge=-90, le=90, allow_inf_nan=False, description="Latitud GPS")
+    lng: float = Field(..., ge=-180, le=180, allow_inf_nan=False, description="Longitud GPS")
     
     class Config:
         json_schema_extra = {
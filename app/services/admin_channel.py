@@ -0,0 +1,152 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Union
+
+from fastapi import WebSocket
+
+from app.config.logging_config import get_logger
+from app.services.metrics import WS_ADMIN_OUT
+
+
+logger = get_logger(__name__)
+
+
+class AdminChannel:
+    """
+    Canal de salida de un admin: cola acotada + tarea escritora propia
+
+    Cada admin recibe sus mensajes desde su propia tarea, así un dashboard
+    lento no frena el loop de recepción de los trackers ni a los demás admins.
+
+    - Los mensajes con `coalesce_key` (ej: ubicación de un usuario) que todavía
+      no se enviaron se reemplazan por el más reciente en vez de encolarse.
+    - Si la cola está llena, el mensaje se descarta. Tras `max_consecutive_drops`
+      descartes seguidos el admin se considera lento y se desconecta.
+    - `encoding` indica si el admin pidió la codificación binaria de las
+      ubicaciones; los frames `bytes` se envían como mensajes binarios.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue_size: int,
+        max_consecutive_drops: int,
+        on_closed: Callable[["AdminChannel"], None],
+        encoding: str = "json",
+    ):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.max_queue_size = max_queue_size
+        self.max_consecutive_drops = max_consecutive_drops
+        self._on_closed = on_closed
+
+        # Cola de slots [coalesce_key, frame] en orden de llegada
+        self._queue: Deque[list] = deque()
+        # Slots pendientes indexados por coalesce_key: {key: slot}
+        self._pending: Dict[str, list] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._consecutive_drops = 0
+        self.closed = False
+
+        # Contadores
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+
+    def start(self):
+        """Lanzar la tarea escritora"""
+        self._task = asyncio.create_task(self._writer())
+
+
+    def enqueue(self, frame: Union[str, bytes], coalesce_key: Optional[str] = None) -> str:
+        """
+        Encolar un frame ya serializado sin bloquear
+
+        El mismo frame (texto JSON o binario) se comparte entre todos los
+        canales, así cada broadcast se codifica una sola vez por codificación.
+
+        Returns:
+            str: "queued", "coalesced" o "dropped"
+        """
+        if self.closed:
+            return "dropped"
+
+        if coalesce_key is not None:
+            slot = self._pending.get(coalesce_key)
+            if slot is not None:
+                # Reemplazar la ubicación vieja que aún no se envió
+                slot[1] = frame
+                self.coalesced += 1
+                return "coalesced"
+
+        if len(self._queue) >= self.max_queue_size:
+            self.dropped += 1
+            self._consecutive_drops += 1
+            if self._consecutive_drops >= self.max_consecutive_drops:
+                logger.warning("Admin lento desconectado", extra={"dropped": self.dropped})
+                self.close()
+                asyncio.create_task(self._close_socket())
+            return "dropped"
+
+        slot = [coalesce_key, frame]
+        self._queue.append(slot)
+        if coalesce_key is not None:
+            self._pending[coalesce_key] = slot
+        self._consecutive_drops = 0
+        self._wakeup.set()
+        return "queued"
+
+
+    def queue_depth(self) -> int:
+        """Cantidad de mensajes pendientes de envío"""
+        return len(self._queue)
+
+
+    def close(self):
+        """Cerrar el canal y cancelar la tarea escritora"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._pending.clear()
+
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+        self._on_closed(self)
+
+
+    async def _close_socket(self):
+        """Cerrar el WebSocket de un admin lento (1013: intentar más tarde)"""
+        try:
+            await self.websocket.close(code=1013, reason="Consumidor lento")
+        except Exception:
+            pass
+
+
+    async def _writer(self):
+        """Enviar los frames de la cola uno por uno al socket del admin"""
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                coalesce_key, frame = self._queue.popleft()
+                if coalesce_key is not None:
+                    self._pending.pop(coalesce_key, None)
+
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+                self.sent += 1
+                WS_ADMIN_OUT.inc()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning("Error enviando a admin", extra={"error": str(e)})
+            self.close()
@@ -0,0 +1,170 @@
+"""
+Conteo de alertas por ruta, usuario y día
+
+Cada alerta insertada suma 1 (y cada alerta eliminada resta 1) a los
+contadores de la colección `alertas_conteo`:
+
+- scope "route": alertas de una ruta en un día, y total acumulado de la ruta
+- scope "user":  alertas de un usuario en un día, y total acumulado del usuario
+- scope "day":   alertas de todas las rutas en un día (key "all")
+
+Los totales acumulados son documentos con `day: null`. Una consulta sin rango
+de fechas lee solo esos (uno por ruta o usuario) en vez de sumar todos los
+contadores diarios. Así el dashboard lee unos pocos documentos ya sumados en
+vez de recorrer toda la colección `alertas`.
+"""
+
+from datetime import date, datetime
+from typing import List, Optional
+
+from pymongo import IndexModel, UpdateOne
+
+
+COLLECTION_NAME = "alertas_conteo"
+REBUILD_COLLECTION_NAME = "alertas_conteo_rebuild"
+SCOPES = ("route", "user", "day")
+# Scopes con total acumulado (el scope "day" ya es un solo contador por día)
+TOTAL_SCOPES = ("route", "user")
+
+# Índices de la colección (los usa también index_manager)
+INDEX_KEYS = (
+    [("scope", 1), ("key", 1), ("day", 1)],
+    [("scope", 1), ("day", 1)],
+)
+
+
+def _day(value) -> str:
+    """Día de una alerta (YYYY-MM-DD, hora de Bolivia como se guarda la alerta)"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def _counters(alert: dict) -> List[dict]:
+    """Contadores que afecta una alerta"""
+    day = _day(alert["date"])
+    # Alertas antiguas sin id: se cuentan por nombre hasta correr la migración
+    route_key = alert.get("route_id") or alert.get("route_name")
+    user_key = alert.get("user_id") or alert.get("name_user")
+
+    counters = [
+        {"scope": "route", "key": route_key, "name": alert.get("route_name"), "day": day},
+        {"scope": "user", "key": user_key, "name": alert.get("name_user"), "day": day},
+        {"scope": "day", "key": "all", "name": None, "day": day},
+    ]
+    counters += [{**counter, "day": None} for counter in counters if counter["scope"] in TOTAL_SCOPES]
+    return counters
+
+
+def _counter_id(counter: dict) -> str:
+    return f"{counter['scope']}:{counter['key']}:{counter['day'] or 'total'}"
+
+
+async def apply_alert(db, alert: dict, delta: int):
+    """
+    Sumar `delta` a los contadores de una alerta (1 al insertar, -1 al eliminar)
+
+    Los contadores que llegan a 0 se eliminan.
+    """
+    collection = db[COLLECTION_NAME]
+    counters = _counters(alert)
+
+    operations = [
+        UpdateOne(
+            {"_id": _counter_id(counter)},
+            {
+                "$inc": {"count": delta},
+                "$set": {"scope": counter["scope"], "key": counter["key"], "name": counter["name"], "day": counter["day"]}
+            },
+            upsert=True
+        )
+        for counter in counters
+    ]
+    await collection.bulk_write(operations, ordered=False)
+
+    if delta < 0:
+        await collection.delete_many({
+            "_id": {"$in": [_counter_id(counter) for counter in counters]},
+            "count": {"$lte": 0}
+        })
+
+
+async def get_alert_counts(
+    db,
+    scope: str,
+    key: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> List[dict]:
+    """
+    Leer los contadores de un scope, agrupados por clave
+
+    Sin rango de fechas, los scopes "route" y "user" leen solo los totales
+    acumulados y la respuesta no trae el detalle por día.
+
+    Returns:
+        [{"key", "name", "total", "days": {"YYYY-MM-DD": n}}] de mayor a menor total
+    """
+    query = {"scope": scope}
+    if key is not None:
+        query["key"] = key
+    totals_only = scope in TOTAL_SCOPES and not (start or end)
+    if totals_only:
+        query["day"] = None
+    elif start or end:
+        # Un rango de strings deja afuera los totales acumulados (day: null)
+        query["day"] = {}
+        if start:
+            query["day"]["$gte"] = start.isoformat()
+        if end:
+            query["day"]["$lte"] = end.isoformat()
+
+    grouped = {}
+    async for counter in db[COLLECTION_NAME].find(query).sort("day", 1):
+        entry = grouped.setdefault(counter["key"], {
+            "key": counter["key"],
+            "name": counter.get("name"),
+            "total": 0,
+        })
+        entry["total"] += counter["count"]
+        if not totals_only:
+            entry.setdefault("days", {})[counter["day"]] = counter["count"]
+
+    return sorted(grouped.values(), key=lambda entry: entry["total"], reverse=True)
+
+
+async def rebuild_alert_counts(db) -> int:
+    """
+    Recalcular todos los contadores desde `alertas`
+
+    Los contadores se escriben en una colección temporal que después reemplaza
+    a `alertas_conteo` con un rename, así el dashboard nunca lee la colección
+    vacía o a medio llenar.
+
+    Returns:
+        Cantidad de contadores escritos
+    """
+    totals = {}
+    async for alert in db["alertas"].find({}, {"_id": 0, "user_id": 1, "route_id": 1, "name_user": 1, "route_name": 1, "date": 1}):
+        if "date" not in alert:
+            continue
+        for counter in _counters(alert):
+            counter_id = _counter_id(counter)
+            if counter_id in totals:
+                totals[counter_id]["count"] += 1
+            else:
+                totals[counter_id] = {**counter, "count": 1}
+
+    rebuild = db[REBUILD_COLLECTION_NAME]
+    await rebuild.drop()
+    # Crear los índices también crea la colección aunque no haya alertas
+    await rebuild.create_indexes([IndexModel(keys) for keys in INDEX_KEYS])
+    if totals:
+        await rebuild.insert_many(
+            [{"_id": counter_id, **counter} for counter_id, counter in totals.items()],
+            ordered=False
+        )
+    await rebuild.rename(COLLECTION_NAME, dropTarget=True)
+    return len(totals)
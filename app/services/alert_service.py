@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.config.logging_config import get_logger
+from app.services.alert_counts import apply_alert
+from app.services.connection_manager import manager
+
+
+logger = get_logger(__name__)
+
+DEVIATION_MESSAGE = "Se desvió de su ruta"
+
+
+async def record_deviation_alert(
+    db,
+    name_user: str,
+    route_name: str,
+    user_id: Optional[str] = None,
+    route_id: Optional[str] = None
+) -> dict:
+    """
+    Registrar una alerta de desviación, actualizar los contadores y notificarla por WebSocket
+
+    Args:
+        db: Base de datos
+        name_user: Nombre del usuario que se desvió
+        route_name: Nombre de la ruta asignada
+        user_id: ID del usuario
+        route_id: ID de la ruta
+
+    Returns:
+        dict: Alerta creada (con `_id` como string)
+    """
+    # Crear documento de alerta con hora de Bolivia (UTC-4)
+    # Bolivia está 4 horas ATRÁS de UTC
+    bolivia_time = datetime.utcnow() - timedelta(hours=4)
+    alerts_collection = db["alertas"]
+    new_alert = {
+        "user_id": user_id,
+        "route_id": route_id,
+        "name_user": name_user,
+        "route_name": route_name,
+        "message": DEVIATION_MESSAGE,
+        "date": bolivia_time
+    }
+
+    result = await alerts_collection.insert_one(new_alert)
+    new_alert["_id"] = str(result.inserted_id)
+
+    try:
+        await apply_alert(db, new_alert, 1)
+    except Exception as e:
+        logger.error("Error actualizando conteo de alertas", extra={"error": str(e)})
+
+    # 🔔 Enviar notificación por WebSocket a todos los clientes conectados
+    await manager.broadcast_alert({
+        **new_alert,
+        "date": bolivia_time.isoformat()
+    })
+
+    return new_alert
+
+
+async def delete_alert_by_id(db, alert_id) -> Optional[dict]:
+    """
+    Eliminar una alerta y descontarla de los contadores
+
+    Returns:
+        La alerta eliminada, o None si no existía
+    """
+    deleted = await db["alertas"].find_one_and_delete({"_id": alert_id})
+    if deleted is None:
+        return None
+
+    if "date" in deleted:
+        try:
+            await apply_alert(db, deleted, -1)
+        except Exception as e:
+            logger.error("Error actualizando conteo de alertas", extra={"error": str(e)})
+
+    return deleted
@@ -0,0 +1,371 @@
+"""
+Backplane de broadcast entre workers/instancias
+
+`ConnectionManager` vive en la memoria de cada proceso: con varios workers de
+uvicorn (o varias instancias) un admin solo vería a los recolectores
+conectados a su mismo proceso. El backplane reparte los eventos entre todos
+los procesos y mantiene una foto compartida de las ubicaciones en vivo.
+
+Cada evento viaja como un frame ya codificado (se codifica una sola vez en el
+proceso de origen) más metadatos de ruteo (user_id, route_id, lat, lng) para
+que cada proceso filtre sin volver a decodificar el JSON.
+
+Backends:
+- "memory": dentro del proceso (un worker, o varios managers en tests)
+- "redis":  Redis pub/sub + un hash con las ubicaciones (requiere `redis`)
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.serialization import encode_message
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis es opcional
+    aioredis = None
+
+
+logger = get_logger(__name__)
+
+# Canales de eventos
+ADMINS_CHANNEL = "admins"
+ALERTS_CHANNEL = "alerts"
+# Aviso interno de un proceso que se acaba de suscribir (no llega al manager)
+PRESENCE_CHANNEL = "presence"
+
+
+@dataclass(frozen=True)
+class BackplaneMessage:
+    """Evento a difundir en todos los procesos"""
+    channel: str
+    frame: str
+    origin: str
+    coalesce_key: Optional[str] = None
+    meta: Dict = field(default_factory=dict)
+
+
+MessageHandler = Callable[[BackplaneMessage], None]
+
+
+class Backplane(ABC):
+    """Interfaz de los backends del backplane"""
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex[:12]
+        self.published = 0
+        self.received = 0
+
+    @abstractmethod
+    async def start(self, on_message: MessageHandler):
+        """Empezar a recibir eventos de otros procesos"""
+
+    @abstractmethod
+    async def stop(self):
+        """Dejar de recibir eventos y liberar recursos"""
+
+    def has_peers(self) -> bool:
+        """Si puede haber otros procesos escuchando los eventos"""
+        return True
+
+    @abstractmethod
+    def publish(self, channel: str, frame: str, coalesce_key: Optional[str] = None, meta: Optional[dict] = None):
+        """Difundir un evento a los demás procesos (no bloquea)"""
+
+    @abstractmethod
+    def set_location(self, user_id: str, data: dict):
+        """Guardar la última ubicación de un recolector en la foto compartida"""
+
+    @abstractmethod
+    def remove_location(self, user_id: str):
+        """Quitar a un recolector de la foto compartida"""
+
+    @abstractmethod
+    async def get_locations(self) -> Dict[str, dict]:
+        """Foto de las ubicaciones en vivo de todos los procesos"""
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "node_id": self.node_id,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+class InMemoryBus:
+    """Bus compartido por los backplanes en memoria de un mismo proceso"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, "InMemoryBackplane"] = {}
+        self.locations: Dict[str, dict] = {}
+
+
+class InMemoryBackplane(Backplane):
+    """Backplane dentro del proceso"""
+
+    backend = "memory"
+
+    def __init__(self, bus: Optional[InMemoryBus] = None):
+        super().__init__()
+        self.bus = bus or InMemoryBus()
+        self._on_message: Optional[MessageHandler] = None
+
+    async def start(self, on_message: MessageHandler):
+        self._on_message = on_message
+        self.bus.subscribers[self.node_id] = self
+
+    async def stop(self):
+        self.bus.subscribers.pop(self.node_id, None)
+
+    def has_peers(self) -> bool:
+        return any(node_id != self.node_id for node_id in self.bus.subscribers)
+
+    def _deliver(self, message: BackplaneMessage):
+        self.received += 1
+        self._on_message(message)
+
+    def publish(self, channel: str, frame: str, coalesce_key: Optional[str] = None, meta: Optional[dict] = None):
+        message = BackplaneMessage(channel, frame, self.node_id, coalesce_key, meta or {})
+        self.published += 1
+        for node_id, backplane in list(self.bus.subscribers.items()):
+            if node_id != self.node_id:
+                backplane._deliver(message)
+
+    def set_location(self, user_id: str, data: dict):
+        self.bus.locations[user_id] = data
+
+    def remove_location(self, user_id: str):
+        self.bus.locations.pop(user_id, None)
+
+    async def get_locations(self) -> Dict[str, dict]:
+        return dict(self.bus.locations)
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane sobre Redis
+
+    - Eventos: PUBLISH en `<prefix>:events`; cada proceso ignora los propios.
+    - Ubicaciones: hash `<prefix>:locations` {user_id: json}. Las entradas de
+      procesos que murieron sin desconectar a sus trackers se descartan al
+      leer la foto (más viejas que BACKPLANE_LOCATION_TTL_SECONDS).
+    - Otros procesos: cada `peer_check_interval` segundos se consulta
+      PUBSUB NUMSUB del canal de eventos, y un proceso que se suscribe
+      publica un aviso de presencia para que los demás lo vean enseguida.
+      Con una sola instancia `has_peers()` es False y el manager usa la foto
+      local en caché. Un proceso que muere se deja de contar en la próxima
+      consulta; mientras tanto `has_peers()` sigue en True (solo cuesta
+      publicar eventos que nadie recibe).
+
+    Las escrituras pasan por una cola acotada que una tarea vacía en
+    pipelines, así el loop del tracker nunca espera un round-trip a Redis.
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "innova",
+        location_ttl: float = 300.0,
+        outbox_max_size: int = 10000,
+        peer_check_interval: float = 5.0,
+        client=None
+    ):
+        super().__init__()
+        if client is None and aioredis is None:
+            raise RuntimeError("BACKPLANE_BACKEND=redis requiere el paquete `redis`")
+
+        self.url = url
+        self.events_channel = f"{prefix}:events"
+        self.locations_key = f"{prefix}:locations"
+        self.location_ttl = location_ttl
+        self.peer_check_interval = peer_check_interval
+
+        self._redis = client
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_max_size)
+        self._on_message: Optional[MessageHandler] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._sender_task: Optional[asyncio.Task] = None
+        self._peers_task: Optional[asyncio.Task] = None
+        # Hasta la primera consulta se asume que hay otros procesos
+        self._peers = True
+        # Último mensaje recibido de otro proceso (time.monotonic)
+        self._peer_seen_at = 0.0
+
+        self.dropped = 0
+        self.errors = 0
+
+    async def start(self, on_message: MessageHandler):
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._on_message = on_message
+        self._listener_task = asyncio.create_task(self._listen())
+        self._sender_task = asyncio.create_task(self._send())
+        self._peers_task = asyncio.create_task(self._watch_peers())
+        logger.info("Backplane Redis iniciado", extra={"channel": self.events_channel, "node_id": self.node_id})
+
+    async def stop(self):
+        for task in (self._listener_task, self._sender_task, self._peers_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        # Enviar lo que quedó en la cola antes de cerrar
+        await self._flush_outbox([])
+        await self._redis.aclose()
+
+    def has_peers(self) -> bool:
+        return self._peers
+
+    def _enqueue(self, operation: tuple):
+        try:
+            self._outbox.put_nowait(operation)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def publish(self, channel: str, frame: str, coalesce_key: Optional[str] = None, meta: Optional[dict] = None):
+        message = BackplaneMessage(channel, frame, self.node_id, coalesce_key, meta or {})
+        self._enqueue(("publish", encode_message(asdict(message))))
+
+    def set_location(self, user_id: str, data: dict):
+        self._enqueue(("hset", user_id, encode_message({**data, "_ts": time.time()})))
+
+    def remove_location(self, user_id: str):
+        self._enqueue(("hdel", user_id))
+
+    async def get_locations(self) -> Dict[str, dict]:
+        raw = await self._redis.hgetall(self.locations_key)
+        cutoff = time.time() - self.location_ttl
+
+        locations = {}
+        stale = []
+        for user_id, payload in raw.items():
+            data = json.loads(payload)
+            if data.pop("_ts", 0) < cutoff:
+                stale.append(user_id)
+                continue
+            locations[user_id] = data
+
+        if stale:
+            await self._redis.hdel(self.locations_key, *stale)
+        return locations
+
+    async def _flush_outbox(self, operations: List[tuple]) -> int:
+        """Enviar `operations` y todo lo pendiente en la cola en un solo pipeline"""
+        while not self._outbox.empty():
+            operations.append(self._outbox.get_nowait())
+        if not operations:
+            return 0
+
+        pipeline = self._redis.pipeline(transaction=False)
+        for operation in operations:
+            if operation[0] == "publish":
+                pipeline.publish(self.events_channel, operation[1])
+            elif operation[0] == "hset":
+                pipeline.hset(self.locations_key, operation[1], operation[2])
+            else:
+                pipeline.hdel(self.locations_key, operation[1])
+
+        try:
+            await pipeline.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error enviando al backplane Redis", extra={"error": str(e)})
+            return 0
+
+        self.published += sum(1 for operation in operations if operation[0] == "publish")
+        return len(operations)
+
+    async def _send(self):
+        """Tarea que vacía la cola de salida"""
+        while True:
+            operation = await self._outbox.get()
+            await self._flush_outbox([operation])
+
+    async def _watch_peers(self):
+        """Tarea que revisa si hay otros procesos suscritos al canal de eventos"""
+        while True:
+            try:
+                started = time.monotonic()
+                [(_, subscribers)] = await self._redis.pubsub_numsub(self.events_channel)
+                # Un aviso que llegó durante la consulta gana sobre su resultado
+                self._peers = subscribers > 1 or self._peer_seen_at >= started
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Ante la duda se siguen publicando los eventos
+                self._peers = True
+                logger.warning("No se pudo consultar los procesos del backplane", extra={"error": str(e)})
+            await asyncio.sleep(self.peer_check_interval)
+
+    async def _listen(self):
+        """Tarea que recibe eventos de otros procesos (reconecta si se corta)"""
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.events_channel)
+                presence = BackplaneMessage(PRESENCE_CHANNEL, "", self.node_id)
+                await self._redis.publish(self.events_channel, encode_message(asdict(presence)))
+
+                async for raw in pubsub.listen():
+                    if raw.get("type") != "message":
+                        continue
+
+                    message = BackplaneMessage(**json.loads(raw["data"]))
+                    if message.origin == self.node_id:
+                        continue
+
+                    self._peers = True
+                    self._peer_seen_at = time.monotonic()
+                    if message.channel == PRESENCE_CHANNEL:
+                        continue
+
+                    self.received += 1
+                    self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Error en el backplane Redis, reconectando", extra={"error": str(e)})
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def get_stats(self) -> dict:
+        return {
+            **super().get_stats(),
+            "peers": self._peers,
+            "outbox": self._outbox.qsize(),
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def create_backplane() -> Backplane:
+    """Crear el backend configurado en BACKPLANE_BACKEND"""
+    if settings.BACKPLANE_BACKEND == "memory":
+        return InMemoryBackplane()
+    if settings.BACKPLANE_BACKEND == "redis":
+        return RedisBackplane(
+            settings.BACKPLANE_REDIS_URL,
+            prefix=settings.BACKPLANE_PREFIX,
+            location_ttl=settings.BACKPLANE_LOCATION_TTL_SECONDS,
+            outbox_max_size=settings.BACKPLANE_OUTBOX_MAX_SIZE,
+            peer_check_interval=settings.BACKPLANE_PEER_CHECK_SECONDS
+        )
+    raise ValueError(f"BACKPLANE_BACKEND inválido: {settings.BACKPLANE_BACKEND}")
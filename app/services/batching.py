@@ -0,0 +1,139 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from app.config.logging_config import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class BackgroundBatcher(ABC):
+    """
+    Base para servicios que acumulan escrituras en memoria y las vacían a
+    MongoDB en lote desde una tarea de fondo
+
+    El flush ocurre cada `flush_interval` segundos o antes, cuando el buffer
+    alcanza `max_batch` elementos. `stop()` hace un último flush.
+
+    Las subclases implementan:
+    - `_attach(db)`: obtener la(s) colección(es)
+    - `_take_batch()`: sacar el contenido del buffer (o None si está vacío)
+    - `_write(batch)`: escribir el lote y devolver cuántos elementos se guardaron
+      (si falla solo una parte, puede devolver esa parte al buffer con `_restore`)
+    - `_restore(batch)`: devolver al buffer un lote que falló
+    - `pending_count()`: elementos esperando flush
+    """
+
+    name = "batcher"
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._attached = False
+
+        # Contadores
+        self.flushes = 0
+        self.written = 0
+        self.errors = 0
+
+
+    def start(self, db):
+        """Iniciar la tarea de flush periódico"""
+        self._attach(db)
+        self._attached = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Flush en segundo plano iniciado", extra={"service": self.name, "interval_seconds": self.flush_interval})
+
+
+    async def stop(self):
+        """Detener la tarea y hacer el flush final"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+
+    async def flush(self) -> int:
+        """Escribir en un solo lote todo lo pendiente"""
+        if not self._attached:
+            return 0
+
+        async with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return 0
+
+            try:
+                count = await self._write(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.error("Error en flush", extra={"service": self.name, "error": str(e)})
+                # Reintentar en el próximo flush
+                self._restore(batch)
+                return 0
+
+            self.flushes += 1
+            self.written += count
+            return count
+
+
+    def get_stats(self) -> dict:
+        """Obtener contadores del servicio"""
+        return {
+            "pending": self.pending_count(),
+            "flushes": self.flushes,
+            "written": self.written,
+            "errors": self.errors,
+        }
+
+
+    def _notify_size(self, size: int):
+        """Adelantar el flush si el buffer llegó al tamaño máximo del lote"""
+        if size >= self.max_batch:
+            self._wakeup.set()
+
+
+    async def _run(self):
+        """Flush periódico o al alcanzar el tamaño máximo del lote"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+    @abstractmethod
+    def _attach(self, db):
+        ...
+
+
+    @abstractmethod
+    def _take_batch(self) -> Any:
+        ...
+
+
+    @abstractmethod
+    async def _write(self, batch: Any) -> int:
+        ...
+
+
+    @abstractmethod
+    def _restore(self, batch: Any):
+        ...
+
+
+    @abstractmethod
+    def pending_count(self) -> int:
+        ...
@@ -0,0 +1,165 @@
+"""
+Codificación binaria compacta para los WebSockets de tracking (opt-in)
+
+Los recolectores usan datos móviles medidos, así que además de la compresión
+permessage-deflate (negociada por uvicorn) los sockets pueden pedir
+`?encoding=binary` y usar frames binarios de tamaño fijo, little-endian.
+Coordenadas en enteros de 1e-7 grados (~1 cm).
+
+Tracker -> servidor (9 bytes):
+    B  tipo = 1 (location_update)
+    i  lat * 1e7
+    i  lng * 1e7
+
+Servidor -> tracker (1 byte):
+    B  tipo = 2 (location_received)
+
+Servidor -> admin, una ubicación (25 bytes):
+    B    tipo = 1 (location_update)
+    12s  user_id (ObjectId en bytes)
+    i    lat * 1e7
+    i    lng * 1e7
+    I    timestamp (segundos epoch)
+
+Servidor -> admin, lote del tick (9 + 20 por usuario):
+    B    tipo = 3 (location_batch)
+    I    timestamp (segundos epoch)
+    I    cantidad de usuarios
+    n x (12s user_id, i lat * 1e7, i lng * 1e7)
+
+Los frames binarios solo llevan posiciones: nombre y ruta de cada usuario
+llegan en `active_users` y `user_connected`. Los demás mensajes (conexión,
+lista de usuarios activos, errores) siguen siendo JSON de texto. Si un
+user_id no es un ObjectId el mensaje se envía en JSON.
+"""
+
+import struct
+from typing import Dict, Iterable, Optional, Sequence
+
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = (ENCODING_JSON, ENCODING_BINARY)
+
+MSG_LOCATION_UPDATE = 1
+MSG_LOCATION_RECEIVED = 2
+MSG_LOCATION_BATCH = 3
+
+COORD_SCALE = 10_000_000
+
+_INGEST = struct.Struct("<Bii")
+_LOCATION = struct.Struct("<B12siiI")
+_BATCH_HEADER = struct.Struct("<BII")
+_BATCH_ROW = struct.Struct("<12sii")
+
+LOCATION_RECEIVED_FRAME = bytes([MSG_LOCATION_RECEIVED])
+
+# {user_id: 12 bytes} para no convertir el mismo hex en cada broadcast
+_MAX_CACHED_USERS = 50000
+_user_bytes_cache: Dict[str, bytes] = {}
+
+
+def _scale(value: float) -> int:
+    return round(value * COORD_SCALE)
+
+
+def _user_bytes(user_id: str) -> Optional[bytes]:
+    """user_id (ObjectId en hex) a 12 bytes; None si no tiene ese formato"""
+    user_bytes = _user_bytes_cache.get(user_id)
+    if user_bytes is not None:
+        return user_bytes
+
+    if len(user_id) != 24:
+        return None
+    try:
+        user_bytes = bytes.fromhex(user_id)
+    except ValueError:
+        return None
+
+    if len(_user_bytes_cache) >= _MAX_CACHED_USERS:
+        _user_bytes_cache.clear()
+    _user_bytes_cache[user_id] = user_bytes
+    return user_bytes
+
+
+def encode_tracker_location(lat: float, lng: float) -> bytes:
+    """Frame de ubicación que envía el tracker"""
+    return _INGEST.pack(MSG_LOCATION_UPDATE, _scale(lat), _scale(lng))
+
+
+def decode_tracker_frame(data: bytes) -> dict:
+    """
+    Decodificar un frame binario del tracker al mismo dict que el JSON
+
+    Raises:
+        ValueError: Frame con tamaño o tipo desconocido
+    """
+    if len(data) != _INGEST.size:
+        raise ValueError(f"Frame binario de {len(data)} bytes (se esperaban {_INGEST.size})")
+
+    message_type, lat, lng = _INGEST.unpack(data)
+    if message_type != MSG_LOCATION_UPDATE:
+        raise ValueError(f"Tipo de frame binario desconocido: {message_type}")
+
+    return {
+        "type": "location_update",
+        "lat": lat / COORD_SCALE,
+        "lng": lng / COORD_SCALE,
+    }
+
+
+def encode_location(user_id: str, lat: float, lng: float, timestamp: float) -> Optional[bytes]:
+    """Frame binario de una ubicación para admins (None si el user_id no es un ObjectId)"""
+    user_bytes = _user_bytes(user_id)
+    if user_bytes is None:
+        return None
+    return _LOCATION.pack(MSG_LOCATION_UPDATE, user_bytes, _scale(lat), _scale(lng), int(timestamp))
+
+
+def encode_batch(rows: Iterable[Sequence], timestamp: float) -> Optional[bytes]:
+    """
+    Frame binario de un `location_batch` para admins
+
+    Args:
+        rows: Filas [user_id, lat, lng]
+        timestamp: Segundos epoch del tick
+    """
+    rows = list(rows)
+    frame = bytearray(_BATCH_HEADER.size + _BATCH_ROW.size * len(rows))
+    _BATCH_HEADER.pack_into(frame, 0, MSG_LOCATION_BATCH, int(timestamp), len(rows))
+
+    pack_row = _BATCH_ROW.pack_into
+    offset = _BATCH_HEADER.size
+    for user_id, lat, lng in rows:
+        user_bytes = _user_bytes(user_id)
+        if user_bytes is None:
+            return None
+        pack_row(frame, offset, user_bytes, round(lat * COORD_SCALE), round(lng * COORD_SCALE))
+        offset += _BATCH_ROW.size
+
+    return bytes(frame)
+
+
+def decode_admin_frame(data: bytes) -> dict:
+    """Decodificar un frame binario para admins (referencia para clientes y pruebas)"""
+    message_type = data[0]
+
+    if message_type == MSG_LOCATION_UPDATE:
+        _, user_bytes, lat, lng, timestamp = _LOCATION.unpack(data)
+        return {
+            "type": "location_update",
+            "user_id": user_bytes.hex(),
+            "lat": lat / COORD_SCALE,
+            "lng": lng / COORD_SCALE,
+            "timestamp": timestamp,
+        }
+
+    if message_type == MSG_LOCATION_BATCH:
+        _, timestamp, count = _BATCH_HEADER.unpack_from(data)
+        users = []
+        for index in range(count):
+            user_bytes, lat, lng = _BATCH_ROW.unpack_from(data, _BATCH_HEADER.size + index * _BATCH_ROW.size)
+            users.append([user_bytes.hex(), lat / COORD_SCALE, lng / COORD_SCALE])
+        return {"type": "location_batch", "timestamp": timestamp, "users": users}
+
+    raise ValueError(f"Tipo de frame binario desconocido: {message_type}")
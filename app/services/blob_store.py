@@ -0,0 +1,208 @@
+"""
+Almacenamiento de fotos fuera de los documentos de MongoDB
+
+Las imágenes se guardan en un backend intercambiable con claves por
+contenido (SHA-256 de los bytes): subir dos veces la misma foto no ocupa
+espacio extra y la clave sirve directamente como ETag.
+
+Backends:
+- "gridfs": GridFS en la misma base de datos (bucket `fotos`)
+- "local":  directorio del filesystem (BLOB_LOCAL_DIR)
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+
+
+logger = get_logger(__name__)
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """Metadatos de un blob"""
+    key: str
+    size: int
+    content_type: str
+
+
+def content_key(data: bytes) -> str:
+    """Clave por contenido: SHA-256 de los bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_valid_key(key: str) -> bool:
+    """Validar que una clave tiene el formato esperado (evita path traversal)"""
+    return bool(KEY_PATTERN.match(key))
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Detectar el tipo de imagen por sus primeros bytes"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+class BlobStore(ABC):
+    """Interfaz de los backends de blobs"""
+
+    @abstractmethod
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> BlobInfo:
+        """Guardar bytes (idempotente por contenido)"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        """Obtener metadatos de un blob (None si no existe)"""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Leer los bytes [start, end] (inclusive) en bloques"""
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs en un directorio local: <root>/<ab>/<clave>"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Escritura atómica: archivo temporal + rename
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _stat(self, key: str) -> Optional[BlobInfo]:
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                header = f.read(16)
+        except FileNotFoundError:
+            return None
+        return BlobInfo(key=key, size=size, content_type=sniff_content_type(header))
+
+    def _read(self, key: str, offset: int, length: int) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> BlobInfo:
+        key = content_key(data)
+        await asyncio.to_thread(self._write, key, data)
+        return BlobInfo(key=key, size=len(data), content_type=content_type or sniff_content_type(data))
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        return await asyncio.to_thread(self._stat, key)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        offset = start
+        while offset <= end:
+            chunk = await asyncio.to_thread(self._read, key, offset, min(CHUNK_SIZE, end - offset + 1))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+
+class GridFSBlobStore(BlobStore):
+    """Blobs en GridFS (el nombre del archivo es la clave)"""
+
+    def __init__(self, db, bucket_name: str = "fotos"):
+        self._bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self._files = db[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> BlobInfo:
+        key = content_key(data)
+        content_type = content_type or sniff_content_type(data)
+
+        existing = await self._files.find_one({"filename": key}, {"_id": 1})
+        if existing is None:
+            await self._bucket.upload_from_stream(key, data, metadata={"content_type": content_type})
+
+        return BlobInfo(key=key, size=len(data), content_type=content_type)
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        document = await self._files.find_one({"filename": key}, {"length": 1, "metadata": 1})
+        if document is None:
+            return None
+
+        metadata = document.get("metadata") or {}
+        return BlobInfo(
+            key=key,
+            size=document["length"],
+            content_type=metadata.get("content_type", "application/octet-stream")
+        )
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        grid_out = await self._bucket.open_download_stream_by_name(key)
+        try:
+            grid_out.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            grid_out.close()
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def init_blob_store(db) -> BlobStore:
+    """Crear el backend configurado en BLOB_BACKEND"""
+    global _blob_store
+
+    if settings.BLOB_BACKEND == "local":
+        _blob_store = LocalBlobStore(settings.BLOB_LOCAL_DIR)
+    elif settings.BLOB_BACKEND == "gridfs":
+        _blob_store = GridFSBlobStore(db)
+    else:
+        raise ValueError(f"BLOB_BACKEND inválido: {settings.BLOB_BACKEND}")
+
+    logger.info("Almacenamiento de fotos iniciado", extra={"backend": settings.BLOB_BACKEND})
+    return _blob_store
+
+
+def get_blob_store() -> BlobStore:
+    """Obtener el backend de blobs (dependencia de FastAPI)"""
+    if _blob_store is None:
+        raise RuntimeError("El almacenamiento de fotos no está inicializado")
+    return _blob_store
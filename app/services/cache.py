@@ -0,0 +1,195 @@
+"""
+Caché en proceso para lecturas que cambian poco (usuarios, rutas, asignaciones)
+
+`AsyncTTLCache` combina expiración por tiempo (TTL) con un límite de
+elementos (LRU). Si varias corrutinas piden la misma clave que no está en
+caché, solo la primera consulta a la BD y el resto espera ese mismo
+resultado (request coalescing).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from bson import ObjectId
+
+from app.config.settings import settings
+
+
+# Resultado de una carga cuya request se canceló (las que esperaban reintentan)
+_LOADER_CANCELLED = object()
+
+
+class AsyncTTLCache:
+    """Caché async con TTL, LRU y agrupación de consultas concurrentes"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # OrderedDict: {key: (expires_at, value)} del menos al más usado
+        self._data: OrderedDict = OrderedDict()
+        # Consultas en curso: {key: Future}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Obtener un valor vigente sin consultar la BD (None si no está)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+
+    def set(self, key: Hashable, value: Any):
+        """Guardar un valor en la caché"""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Obtener un valor de la caché o cargarlo con `loader`
+
+        Los resultados None no se guardan (ej: documento no encontrado). Si se
+        cancela la request que estaba cargando la clave, las que esperaban su
+        resultado no se cancelan: una de ellas vuelve a llamar a `loader`.
+        """
+        retry = False
+        while True:
+            value = self.get(key)
+            if value is not None:
+                if not retry:
+                    self.hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+
+            if not retry:
+                self.coalesced += 1
+            retry = True
+            value = await asyncio.shield(inflight)
+            if value is not _LOADER_CANCELLED:
+                return value
+
+        if not retry:
+            self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.set_result(_LOADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar "exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            # Si la clave se invalidó mientras se cargaba, no guardar el valor viejo
+            if value is not None and self._inflight.get(key) is future:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+    def invalidate(self, key: Hashable):
+        """Eliminar una clave de la caché (y descartar una carga en curso)"""
+        self._inflight.pop(key, None)
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+
+    def clear(self):
+        """Vaciar la caché"""
+        self.invalidations += len(self._data)
+        self._inflight.clear()
+        self._data.clear()
+
+
+    def get_stats(self) -> dict:
+        """Métricas de la caché"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Instancias globales
+user_cache = AsyncTTLCache("users", maxsize=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+route_cache = AsyncTTLCache("routes", maxsize=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+assignment_cache = AsyncTTLCache("assignment", maxsize=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+
+CACHES = [user_cache, route_cache, assignment_cache]
+
+
+async def get_cached_user(db, user_id: str) -> Optional[dict]:
+    """Obtener un usuario por ID (cacheado). No modificar el dict devuelto."""
+    return await user_cache.get_or_load(
+        user_id,
+        lambda: db["users"].find_one({"_id": ObjectId(user_id)})
+    )
+
+
+async def get_cached_route(db, route_id: str) -> Optional[dict]:
+    """Obtener una ruta por ID (cacheada). No modificar el dict devuelto."""
+    return await route_cache.get_or_load(
+        route_id,
+        lambda: db["routes"].find_one({"_id": ObjectId(route_id)})
+    )
+
+
+async def get_cached_assignment_for_user(db, user_id: str) -> Optional[dict]:
+    """Obtener la asignación de un usuario (cacheada). No modificar el dict devuelto."""
+    return await assignment_cache.get_or_load(
+        user_id,
+        lambda: db["assignment"].find_one({"user_id": user_id})
+    )
+
+
+def invalidate_assignment(user_id: str, route_id: Optional[str] = None):
+    """Hook de invalidación al crear/eliminar asignaciones"""
+    assignment_cache.invalidate(user_id)
+    if route_id is not None:
+        # La ruta cambia su atributo `assigned`
+        route_cache.invalidate(route_id)
+
+
+def get_cache_stats() -> dict:
+    """Métricas de todas las cachés"""
+    return {cache.name: cache.get_stats() for cache in CACHES}
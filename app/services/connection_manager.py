@@ -1,27 +1,133 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
-import json
+import asyncio
+import math
+import time
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.admin_channel import AdminChannel
+from app.services.backplane import (
+    ADMINS_CHANNEL,
+    ALERTS_CHANNEL,
+    Backplane,
+    BackplaneMessage,
+    InMemoryBackplane,
+)
+from app.services.binary_protocol import ENCODING_BINARY, ENCODING_JSON, encode_batch, encode_location
+from app.services.gps_filter import GpsFilter
+from app.services.live_locations import LiveLocationTable
+from app.services.location_history import location_history
+from app.services.metrics import FANOUT_BATCH, FANOUT_EVENT, FANOUT_LOCATION, WS_ALERTS_OUT
+from app.services.serialization import encode_message
+from app.services.subscriptions import AdminSubscription, SubscriptionError, SubscriptionIndex
+
+
+logger = get_logger(__name__)
+
+EARTH_RADIUS_METERS = 6371000.0
+BATCH_FIELDS = ["user_id", "lat", "lng"]
+
+
+def _distance_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia aproximada (equirectangular), suficiente para umbrales de metros"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * EARTH_RADIUS_METERS
 
 
 class ConnectionManager:
     """
     Gestor de conexiones WebSocket para tracking en tiempo real
     Maneja conexiones de recolectores y admins por separado
+    
+    Los eventos para admins y las alertas se publican también en el backplane,
+    así los admins conectados a otros workers/instancias los reciben.
     """
     
-    def __init__(self):
+    def __init__(self, backplane: Optional[Backplane] = None):
         # Diccionario: {user_id: WebSocket}
         self.active_trackers: Dict[str, WebSocket] = {}
         
-        # Lista de WebSockets de admins
-        self.active_admins: List[WebSocket] = []
+        # Diccionario: {WebSocket: AdminChannel} (cola de salida por admin)
+        self.active_admins: Dict[WebSocket, AdminChannel] = {}
         
         # Lista de WebSockets escuchando alertas
         self.alert_listeners: List[WebSocket] = []
         
-        # Diccionario: {user_id: {name, lat, lng, route_id, last_update}}
-        self.tracker_locations: Dict[str, dict] = {}
+        # Última ubicación de cada recolector de este proceso (arreglos
+        # paralelos + foto `active_users` serializada en caché)
+        self.live_locations = LiveLocationTable()
+        
+        # Filtro de jitter y saltos imposibles por recolector (None = desactivado)
+        self.gps_filter: Optional[GpsFilter] = None
+        if settings.GPS_FILTER_ENABLED:
+            self.gps_filter = GpsFilter(
+                min_move_meters=settings.GPS_FILTER_MIN_MOVE_METERS,
+                max_speed_mps=settings.GPS_FILTER_MAX_SPEED_MPS,
+                keepalive_seconds=settings.GPS_FILTER_KEEPALIVE_SECONDS,
+                max_rejects=settings.GPS_FILTER_MAX_REJECTS
+            )
+        
+        # Contadores del fan-out a admins
+        self.broadcast_stats = {
+            "queued": 0,
+            "dropped": 0,
+            "coalesced": 0,
+        }
+        
+        # Suscripciones de admins por zona/ruta/usuario (sin suscripción = todo)
+        self.subscriptions = SubscriptionIndex(cell_degrees=settings.SUBSCRIPTION_CELL_DEGREES)
+        
+        # Backplane entre procesos (en memoria hasta que se llame a start_backplane)
+        self.backplane: Backplane = backplane or InMemoryBackplane()
+        # Envíos de alertas de otros procesos en curso (para que no las recolecte el GC)
+        self._alert_tasks: Set[asyncio.Task] = set()
+        
+        # Tick de broadcast (BROADCAST_TICK_SECONDS > 0): última ubicación
+        # pendiente por usuario y última ubicación enviada a los admins
+        self.tick_seconds = settings.BROADCAST_TICK_SECONDS
+        self.min_distance_meters = settings.BROADCAST_MIN_DISTANCE_METERS
+        self._pending_locations: Dict[str, Tuple[float, float, Optional[str], str]] = {}
+        self._sent_locations: Dict[str, Tuple[float, float, Optional[str], str]] = {}
+        self._tick_task: Optional[asyncio.Task] = None
+        self.batch_stats = {
+            "batches": 0,
+            "points": 0,
+            "skipped": 0,
+        }
+    
+    
+    async def start_backplane(self, backplane: Optional[Backplane] = None):
+        """Empezar a recibir eventos de otros procesos"""
+        if backplane is not None:
+            self.backplane = backplane
+        await self.backplane.start(self._on_backplane_message)
+    
+    
+    async def stop_backplane(self):
+        """Dejar de recibir eventos de otros procesos"""
+        await self.backplane.stop()
+    
+    
+    def _on_backplane_message(self, message: BackplaneMessage):
+        """Entregar a las conexiones locales un evento publicado por otro proceso"""
+        if message.channel == ADMINS_CHANNEL:
+            if message.meta.get("kind") == "batch":
+                self._enqueue_batch(message.frame, message.meta)
+            else:
+                self._enqueue_to_admins(message.frame, message.coalesce_key, message.meta)
+        elif message.channel == ALERTS_CHANNEL:
+            task = asyncio.create_task(self._send_alert_frame(message.frame))
+            self._alert_tasks.add(task)
+            task.add_done_callback(self._on_alert_task_done)
+    
+    
+    def _on_alert_task_done(self, task: asyncio.Task):
+        self._alert_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error enviando alerta del backplane", extra={"error": str(task.exception())})
     
     
     async def connect_tracker(self, websocket: WebSocket, user_id: str, user_name: str):
@@ -35,9 +141,9 @@ class ConnectionManager:
             "user_id": user_id,
             "name": user_name,
             "timestamp": datetime.now().isoformat()
-        })
+        }, meta={"kind": "connect", "user_id": user_id})
         
-        print(f"✅ Tracker conectado: {user_name} ({user_id})")
+        logger.info("Tracker conectado", extra={"user_id": user_id, "user_name": user_name, "trackers": len(self.active_trackers)})
     
     
     async def disconnect_tracker(self, user_id: str, user_name: str):
@@ -45,8 +151,12 @@ class ConnectionManager:
         if user_id in self.active_trackers:
             del self.active_trackers[user_id]
         
-        if user_id in self.tracker_locations:
-            del self.tracker_locations[user_id]
+        self.live_locations.remove(user_id)
+        if self.gps_filter is not None:
+            self.gps_filter.reset_user(user_id)
+        self.backplane.remove_location(user_id)
+        self._pending_locations.pop(user_id, None)
+        self._sent_locations.pop(user_id, None)
         
         # Notificar a todos los admins que un recolector se desconectó
         await self.broadcast_to_admins({
@@ -54,56 +164,190 @@ class ConnectionManager:
             "user_id": user_id,
             "name": user_name,
             "timestamp": datetime.now().isoformat()
-        })
+        }, meta={"kind": "disconnect", "user_id": user_id})
         
-        print(f"❌ Tracker desconectado: {user_name} ({user_id})")
+        logger.info("Tracker desconectado", extra={"user_id": user_id, "user_name": user_name, "trackers": len(self.active_trackers)})
     
     
-    async def connect_admin(self, websocket: WebSocket):
-        """Conectar un admin"""
+    async def connect_admin(self, websocket: WebSocket, encoding: str = ENCODING_JSON):
+        """
+        Conectar un admin
+        
+        Args:
+            encoding: "json" o "binary" (ubicaciones en frames binarios, ver binary_protocol)
+        """
         await websocket.accept()
-        self.active_admins.append(websocket)
+        channel = AdminChannel(
+            websocket,
+            max_queue_size=settings.ADMIN_QUEUE_MAX_SIZE,
+            max_consecutive_drops=settings.ADMIN_MAX_CONSECUTIVE_DROPS,
+            on_closed=self._on_admin_channel_closed,
+            encoding=encoding
+        )
+        self.active_admins[websocket] = channel
         
         # Enviar lista de usuarios activos al admin recién conectado
+        # (va primero en su cola, antes de cualquier broadcast)
+        channel.enqueue(await self.active_users_frame())
+        channel.start()
+        
+        logger.info("Admin conectado", extra={"admins": len(self.active_admins), "encoding": encoding})
+    
+    
+    def disconnect_admin(self, websocket: WebSocket):
+        """Desconectar un admin"""
+        channel = self.active_admins.get(websocket)
+        if channel is not None:
+            # close() llama a _on_admin_channel_closed, que lo quita del diccionario
+            channel.close()
+        
+        logger.info("Admin desconectado", extra={"admins": len(self.active_admins)})
+    
+    
+    async def get_active_users_message(self, subscription: Optional[AdminSubscription] = None) -> dict:
+        """
+        Mensaje `active_users` con las ubicaciones en vivo de todos los procesos
+        
+        Args:
+            subscription: Si se indica, solo los usuarios que cumplen sus filtros
+        """
+        try:
+            locations = await self.backplane.get_locations()
+        except Exception as e:
+            logger.warning("Error leyendo ubicaciones del backplane", extra={"error": str(e)})
+            locations = {}
+        
+        # Las ubicaciones de este proceso siempre están al día
+        locations.update(self.live_locations.as_mapping())
         active_users = [
             {
                 "user_id": user_id,
                 **data
             }
-            for user_id, data in self.tracker_locations.items()
+            for user_id, data in locations.items()
+            if subscription is None
+            or subscription.matches(user_id, data.get("route_id"), data.get("lat"), data.get("lng"))
         ]
         
-        await websocket.send_json({
+        return {
             "type": "active_users",
             "users": active_users,
             "count": len(active_users)
-        })
+        }
+    
+    
+    async def active_users_frame(self) -> str:
+        """
+        Mensaje `active_users` serializado para un admin sin filtros
         
-        print(f"✅ Admin conectado. Total admins: {len(self.active_admins)}")
+        Con un solo proceso se reutiliza la foto en caché de la tabla de
+        ubicaciones; con otros procesos se arma combinando el backplane.
+        """
+        if not self.backplane.has_peers():
+            return self.live_locations.snapshot_frame()
+        return encode_message(await self.get_active_users_message())
     
     
-    def disconnect_admin(self, websocket: WebSocket):
-        """Desconectar un admin"""
-        if websocket in self.active_admins:
-            self.active_admins.remove(websocket)
+    async def send_active_users(self, websocket: WebSocket):
+        """Enviar a un admin los usuarios activos que cumplen su suscripción"""
+        channel = self.active_admins.get(websocket)
+        if channel is None:
+            return
         
-        print(f"❌ Admin desconectado. Total admins: {len(self.active_admins)}")
+        subscription = self.subscriptions.get(channel)
+        if subscription is None:
+            channel.enqueue(await self.active_users_frame())
+            return
+        
+        message = await self.get_active_users_message(subscription)
+        self.subscriptions.mark_seen(channel, (user["user_id"] for user in message["users"]))
+        channel.enqueue(encode_message(message))
+    
+    
+    async def subscribe_admin(self, websocket: WebSocket, message: dict):
+        """
+        Limitar lo que recibe un admin a una zona, rutas o usuarios
+        
+        Mensaje del admin:
+        {"type": "subscribe", "bbox": [min_lng, min_lat, max_lng, max_lat], "route_ids": [...], "user_ids": [...]}
+        
+        Responde `subscribed` seguido de los usuarios activos que cumplen los filtros.
+        """
+        channel = self.active_admins.get(websocket)
+        if channel is None:
+            return
+        
+        try:
+            subscription = AdminSubscription.from_message(message)
+            self.subscriptions.subscribe(channel, subscription)
+        except SubscriptionError as e:
+            channel.enqueue(encode_message({"type": "subscription_error", "message": str(e)}))
+            return
+        
+        channel.enqueue(encode_message({"type": "subscribed", "filters": subscription.as_dict()}))
+        await self.send_active_users(websocket)
+    
+    
+    async def unsubscribe_admin(self, websocket: WebSocket):
+        """Quitar los filtros de un admin (vuelve a recibir todo)"""
+        channel = self.active_admins.get(websocket)
+        if channel is None:
+            return
+        
+        self.subscriptions.remove(channel)
+        channel.enqueue(encode_message({"type": "subscribed", "filters": None}))
+        await self.send_active_users(websocket)
+    
+    
+    def send_to_admin(self, websocket: WebSocket, message: dict):
+        """Encolar un mensaje para un admin específico (respuesta a un comando)"""
+        channel = self.active_admins.get(websocket)
+        if channel is not None:
+            channel.enqueue(encode_message(message))
+    
+    
+    def _on_admin_channel_closed(self, channel: AdminChannel):
+        """Quitar el canal de un admin cuando se cierra (error de envío o admin lento)"""
+        if self.active_admins.get(channel.websocket) is channel:
+            del self.active_admins[channel.websocket]
+        self.subscriptions.remove(channel)
     
     
-    async def update_tracker_location(self, user_id: str, user_name: str, lat: float, lng: float, route_id: str = None):
+    async def update_tracker_location(self, user_id: str, user_name: str, lat: float, lng: float, route_id: str = None) -> bool:
         """
         Actualizar ubicación de un recolector y hacer broadcast a admins
+        
+        Returns:
+            bool: False si el filtro GPS descartó el fix (jitter o salto
+            imposible); en ese caso no se guarda ni se envía
         """
-        # Guardar en memoria
-        self.tracker_locations[user_id] = {
+        if self.gps_filter is not None and not self.gps_filter.accept(user_id, lat, lng):
+            return False
+        
+        now = datetime.now()
+        timestamp = now.isoformat()
+        
+        # Registrar en el historial (se inserta en lote en segundo plano)
+        location_history.record(user_id, lat, lng, route_id, ts=now)
+        
+        # Guardar en memoria y en la foto compartida del backplane
+        self.live_locations.set(user_id, user_name, lat, lng, route_id, timestamp)
+        self.backplane.set_location(user_id, {
             "name": user_name,
             "lat": lat,
             "lng": lng,
             "route_id": route_id,
-            "last_update": datetime.now().isoformat()
-        }
+            "last_update": timestamp
+        })
         
-        # Broadcast a todos los admins
+        # Con tick: solo se guarda la última ubicación; el tick la envía en lote
+        if self.tick_seconds > 0:
+            self._pending_locations[user_id] = (lat, lng, route_id, user_name)
+            self._ensure_tick_task()
+            return True
+        
+        # Broadcast a todos los admins. Si un admin todavía no recibió la
+        # ubicación anterior de este usuario, se reemplaza por esta.
         await self.broadcast_to_admins({
             "type": "location_update",
             "user_id": user_id,
@@ -111,24 +355,230 @@ class ConnectionManager:
             "lat": lat,
             "lng": lng,
             "route_id": route_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
+        }, coalesce_key=f"location:{user_id}", meta={
+            "kind": "location",
+            "user_id": user_id,
+            "route_id": route_id,
+            "lat": lat,
+            "lng": lng,
+            "ts": now.timestamp(),
         })
+        return True
+    
+    
+    async def broadcast_to_admins(self, message: dict, coalesce_key: Optional[str] = None, meta: Optional[dict] = None):
+        """
+        Encolar un mensaje para todos los admins conectados (de todos los procesos)
+        
+        No espera a que se envíe: cada admin tiene su propia cola y tarea
+        escritora, así que los envíos ocurren en paralelo y un admin lento
+        no frena al tracker que originó el mensaje. El mensaje se codifica
+        una sola vez y el mismo frame se comparte entre todos los admins y
+        se publica en el backplane.
+        
+        Args:
+            message: Mensaje a enviar
+            coalesce_key: Clave para reemplazar mensajes pendientes del mismo tipo
+            meta: Metadatos de ruteo (user_id, route_id, lat, lng, ts)
+        """
+        if not self.active_admins and not self.backplane.has_peers():
+            return
+        
+        frame = encode_message(message)
+        self.backplane.publish(ADMINS_CHANNEL, frame, coalesce_key, meta)
+        self._enqueue_to_admins(frame, coalesce_key, meta)
+    
+    
+    def _admin_recipients(self, meta: Optional[dict]) -> List[AdminChannel]:
+        """Admins de este proceso que deben recibir un evento según sus suscripciones"""
+        channels = list(self.active_admins.values())
+        if not len(self.subscriptions) or not meta:
+            return channels
+        
+        kind = meta.get("kind")
+        if kind == "location":
+            matched = self.subscriptions.match_location(
+                meta.get("user_id"), meta.get("route_id"), meta.get("lat"), meta.get("lng")
+            )
+        elif kind in ("connect", "disconnect"):
+            matched = self.subscriptions.match_user_event(meta.get("user_id"), forget=kind == "disconnect")
+        else:
+            return channels
+        
+        return [
+            channel for channel in channels
+            if channel in matched or self.subscriptions.get(channel) is None
+        ]
     
     
-    async def broadcast_to_admins(self, message: dict):
-        """Enviar mensaje a todos los admins conectados"""
-        disconnected_admins = []
+    def _enqueue_to_admins(self, frame: str, coalesce_key: Optional[str] = None, meta: Optional[dict] = None):
+        """
+        Encolar un frame ya codificado para los admins de este proceso
+        
+        Las ubicaciones para admins binarios se codifican desde `meta`, una
+        sola vez y solo si hay alguno entre los destinatarios.
+        """
+        start = time.perf_counter()
+        binary_frame = None
+        for channel in self._admin_recipients(meta):
+            channel_frame = frame
+            if channel.encoding == ENCODING_BINARY and meta and meta.get("kind") == "location":
+                if binary_frame is None:
+                    binary_frame = encode_location(
+                        meta["user_id"], meta["lat"], meta["lng"], meta.get("ts") or time.time()
+                    ) or frame
+                channel_frame = binary_frame
+            result = channel.enqueue(channel_frame, coalesce_key)
+            self.broadcast_stats[result] += 1
         
-        for admin_ws in self.active_admins:
+        histogram = FANOUT_LOCATION if meta and meta.get("kind") == "location" else FANOUT_EVENT
+        histogram.observe(time.perf_counter() - start)
+    
+    
+    def _ensure_tick_task(self):
+        if self._tick_task is None or self._tick_task.done():
+            self._tick_task = asyncio.create_task(self._run_broadcast_tick())
+    
+    
+    async def stop_broadcast_tick(self):
+        """Detener el tick y enviar las ubicaciones pendientes"""
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            try:
+                await self._tick_task
+            except asyncio.CancelledError:
+                pass
+            self._tick_task = None
+        self.flush_location_batch()
+    
+    
+    async def _run_broadcast_tick(self):
+        """Enviar un `location_batch` cada `tick_seconds`"""
+        while True:
+            await asyncio.sleep(self.tick_seconds)
             try:
-                await admin_ws.send_json(message)
-            except Exception as e:
-                print(f"Error enviando a admin: {e}")
-                disconnected_admins.append(admin_ws)
+                self.flush_location_batch()
+            except Exception:
+                logger.exception("Error enviando lote de ubicaciones")
+    
+    
+    def flush_location_batch(self) -> int:
+        """
+        Enviar a los admins un solo frame con los usuarios que se movieron
+        
+        Frame compacto:
+        {"type": "location_batch", "timestamp": "...", "fields": ["user_id", "lat", "lng"],
+         "users": [["u1", -17.7797, -63.1921], ...],
+         "info": {"u1": {"name": "...", "route_id": "..."}}}
+        
+        `info` solo trae los usuarios nuevos o con nombre/ruta distintos al
+        último lote. Los usuarios que se movieron menos de
+        `min_distance_meters` desde la última ubicación enviada se omiten.
+        
+        Returns:
+            Cantidad de usuarios enviados
+        """
+        pending, self._pending_locations = self._pending_locations, {}
+        if not pending:
+            return 0
+        
+        rows = []
+        info = {}
+        routes = {}
+        for user_id, (lat, lng, route_id, name) in pending.items():
+            sent = self._sent_locations.get(user_id)
+            changed_info = sent is None or sent[2] != route_id or sent[3] != name
+            if (
+                not changed_info
+                and _distance_meters(sent[0], sent[1], lat, lng) < self.min_distance_meters
+            ):
+                self.batch_stats["skipped"] += 1
+                continue
+            
+            self._sent_locations[user_id] = (lat, lng, route_id, name)
+            rows.append([user_id, round(lat, 6), round(lng, 6)])
+            routes[user_id] = route_id
+            if changed_info:
+                info[user_id] = {"name": name, "route_id": route_id}
+        
+        if not rows:
+            return 0
+        
+        now = datetime.now()
+        timestamp = now.isoformat()
+        message = {"type": "location_batch", "timestamp": timestamp, "fields": BATCH_FIELDS, "users": rows}
+        if info:
+            message["info"] = info
+        frame = encode_message(message)
+        
+        # Los metadatos permiten armar el subconjunto de cada admin filtrado
+        # (en este proceso y en los demás) sin decodificar el frame
+        meta = {
+            "kind": "batch",
+            "timestamp": timestamp,
+            "ts": now.timestamp(),
+            "rows": rows,
+            "routes": routes,
+            "info": {user_id: {"name": pending[user_id][3], "route_id": routes[user_id]} for user_id in routes},
+        }
+        if self.backplane.has_peers():
+            self.backplane.publish(ADMINS_CHANNEL, frame, None, meta)
+        self._enqueue_batch(frame, meta)
+        
+        self.batch_stats["batches"] += 1
+        self.batch_stats["points"] += len(rows)
+        return len(rows)
+    
+    
+    def _enqueue_batch(self, frame: str, meta: dict):
+        """Encolar un lote: el frame completo a los admins sin filtros y un subconjunto a los filtrados"""
+        if not self.active_admins:
+            return
+        
+        start = time.perf_counter()
+        self._fan_out_batch(frame, meta)
+        FANOUT_BATCH.observe(time.perf_counter() - start)
+    
+    
+    def _fan_out_batch(self, frame: str, meta: dict):
+        ts = meta.get("ts") or time.time()
+        full_frames = {ENCODING_JSON: frame}
         
-        # Limpiar admins desconectados
-        for admin_ws in disconnected_admins:
-            self.disconnect_admin(admin_ws)
+        def full_frame(channel: AdminChannel):
+            # El lote binario se codifica una sola vez, si hay admins binarios
+            if channel.encoding not in full_frames:
+                full_frames[channel.encoding] = encode_batch(meta["rows"], ts) or frame
+            return full_frames[channel.encoding]
+        
+        if not len(self.subscriptions):
+            for channel in list(self.active_admins.values()):
+                self.broadcast_stats[channel.enqueue(full_frame(channel))] += 1
+            return
+        
+        # Usuarios del lote que corresponden a cada admin filtrado
+        rows_by_channel: Dict[AdminChannel, list] = {}
+        for row in meta["rows"]:
+            user_id, lat, lng = row
+            for channel in self.subscriptions.match_location(user_id, meta["routes"].get(user_id), lat, lng):
+                rows_by_channel.setdefault(channel, []).append(row)
+        
+        for channel in list(self.active_admins.values()):
+            if self.subscriptions.get(channel) is None:
+                result = channel.enqueue(full_frame(channel))
+            elif channel in rows_by_channel:
+                channel_rows = rows_by_channel[channel]
+                binary_frame = encode_batch(channel_rows, ts) if channel.encoding == ENCODING_BINARY else None
+                result = channel.enqueue(binary_frame or encode_message({
+                    "type": "location_batch",
+                    "timestamp": meta["timestamp"],
+                    "fields": BATCH_FIELDS,
+                    "users": channel_rows,
+                    "info": {row[0]: meta["info"][row[0]] for row in channel_rows},
+                }))
+            else:
+                continue
+            self.broadcast_stats[result] += 1
     
     
     def get_active_trackers_count(self) -> int:
@@ -141,6 +591,22 @@ class ConnectionManager:
         return len(self.active_admins)
     
     
+    def get_broadcast_stats(self) -> dict:
+        """Obtener contadores del fan-out, profundidad de las colas de admins, suscripciones y backplane"""
+        depths = [channel.queue_depth() for channel in self.active_admins.values()]
+        return {
+            **self.broadcast_stats,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "subscriptions": self.subscriptions.get_stats(),
+            "tick_seconds": self.tick_seconds,
+            "batch": self.batch_stats,
+            "live_locations": self.live_locations.get_stats(),
+            "gps_filter": self.gps_filter.get_stats() if self.gps_filter is not None else None,
+            "backplane": self.backplane.get_stats(),
+        }
+    
+    
     async def connect_alert_listener(self, websocket: WebSocket):
         """Conectar un cliente que escucha alertas"""
         await websocket.accept()
@@ -152,7 +618,7 @@ class ConnectionManager:
             "timestamp": datetime.now().isoformat()
         })
         
-        print(f"✅ Alert listener conectado. Total: {len(self.alert_listeners)}")
+        logger.info("Alert listener conectado", extra={"listeners": len(self.alert_listeners)})
     
     
     def disconnect_alert_listener(self, websocket: WebSocket):
@@ -160,31 +626,39 @@ class ConnectionManager:
         if websocket in self.alert_listeners:
             self.alert_listeners.remove(websocket)
         
-        print(f"❌ Alert listener desconectado. Total: {len(self.alert_listeners)}")
+        logger.info("Alert listener desconectado", extra={"listeners": len(self.alert_listeners)})
     
     
     async def broadcast_alert(self, alert_data: dict):
         """Enviar alerta a todos los clientes conectados"""
-        disconnected_listeners = []
-        
-        message = {
+        # Codificar una sola vez y enviar el mismo frame a todos en paralelo
+        frame = encode_message({
             "type": "new_alert",
             "alert": alert_data,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
-        for listener_ws in self.alert_listeners:
-            try:
-                await listener_ws.send_json(message)
-            except Exception as e:
-                print(f"Error enviando alerta a listener: {e}")
-                disconnected_listeners.append(listener_ws)
+        self.backplane.publish(ALERTS_CHANNEL, frame)
+        await self._send_alert_frame(frame)
+    
+    
+    async def _send_alert_frame(self, frame: str):
+        """Enviar un frame de alerta a los listeners de este proceso"""
+        listeners = list(self.alert_listeners)
+        results = await asyncio.gather(
+            *(listener_ws.send_text(frame) for listener_ws in listeners),
+            return_exceptions=True
+        )
         
         # Limpiar listeners desconectados
-        for listener_ws in disconnected_listeners:
-            self.disconnect_alert_listener(listener_ws)
+        for listener_ws, result in zip(listeners, results):
+            if isinstance(result, Exception):
+                logger.warning("Error enviando alerta a listener", extra={"error": str(result)})
+                self.disconnect_alert_listener(listener_ws)
+            else:
+                WS_ALERTS_OUT.inc()
         
-        print(f"📢 Alerta enviada a {len(self.alert_listeners)} clientes")
+        logger.info("Alerta enviada", extra={"listeners": len(self.alert_listeners)})
 
 
 # Instancia global del gestor
@@ -0,0 +1,291 @@
+"""
+Detección de desvíos de ruta en el servidor
+
+Cada ruta asignada se precalcula en un índice de grilla: la polilínea se
+proyecta a metros (equirectangular local) y cada segmento se registra en las
+celdas que atraviesa y sus vecinas (el radio de búsqueda). Para un
+fix GPS solo se revisan los segmentos de su celda, así la distancia
+punto-polilínea cuesta prácticamente lo mismo sin importar el largo de la ruta.
+
+Para no generar una avalancha de alertas con un GPS ruidoso:
+- Histéresis: se entra en "desviado" tras `confirm_fixes` fixes seguidos a más
+  de `enter_meters`, y se sale recién al volver a menos de `exit_meters`.
+- Cooldown: como máximo una alerta por usuario cada `cooldown_seconds`.
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.alert_service import record_deviation_alert
+
+
+logger = get_logger(__name__)
+
+METERS_PER_DEGREE_LAT = 110_540.0
+METERS_PER_DEGREE_LNG = 111_320.0
+
+
+def _segment_cells(ax: float, ay: float, bx: float, by: float, cell_size: float):
+    """
+    Celdas de la grilla que atraviesa el segmento (recorrido tipo DDA)
+
+    El número de celdas es proporcional al largo del segmento, no al área de
+    su bounding box.
+    """
+    cx, cy = math.floor(ax / cell_size), math.floor(ay / cell_size)
+    end_x, end_y = math.floor(bx / cell_size), math.floor(by / cell_size)
+    dx, dy = bx - ax, by - ay
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+
+    # Fracción del segmento hasta el próximo borde de celda en cada eje
+    if dx != 0.0:
+        t_max_x = ((cx + (step_x > 0)) * cell_size - ax) / dx
+        t_delta_x = cell_size / abs(dx)
+    else:
+        t_max_x = t_delta_x = math.inf
+    if dy != 0.0:
+        t_max_y = ((cy + (step_y > 0)) * cell_size - ay) / dy
+        t_delta_y = cell_size / abs(dy)
+    else:
+        t_max_y = t_delta_y = math.inf
+
+    yield cx, cy
+    for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+        if t_max_x < t_max_y:
+            cx += step_x
+            t_max_x += t_delta_x
+        else:
+            cy += step_y
+            t_max_y += t_delta_y
+        yield cx, cy
+
+
+class RouteSegmentIndex:
+    """Índice de grilla de los segmentos de una ruta"""
+
+    __slots__ = ("route_id", "name", "cell_size", "_kx", "_segments", "_cells")
+
+    def __init__(self, route_id: str, name: str, coordinates: List[List[float]], cell_size: float):
+        """
+        Args:
+            route_id: ID de la ruta
+            name: Nombre de la ruta (para las alertas)
+            coordinates: Polilínea en formato [[lng, lat], ...]
+            cell_size: Tamaño de celda y radio de búsqueda, en metros
+        """
+        self.route_id = route_id
+        self.name = name
+        self.cell_size = cell_size
+
+        lat0 = sum(point[1] for point in coordinates) / len(coordinates) if coordinates else 0.0
+        self._kx = METERS_PER_DEGREE_LNG * math.cos(math.radians(lat0))
+
+        points = [self._project(point[1], point[0]) for point in coordinates]
+        if len(points) == 1:
+            points = points * 2
+
+        # Segmentos proyectados: (ax, ay, bx, by)
+        self._segments: List[Tuple[float, float, float, float]] = [
+            (a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:])
+        ]
+
+        # Diccionario: {(celda_x, celda_y): [índices de segmentos]}
+        # Cada segmento se registra en las celdas que atraviesa y sus vecinas:
+        # un punto a menos de `cell_size` del segmento cae en alguna de ellas
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        for index, (ax, ay, bx, by) in enumerate(self._segments):
+            cells = set()
+            for cx, cy in _segment_cells(ax, ay, bx, by, cell_size):
+                for nx in (cx - 1, cx, cx + 1):
+                    for ny in (cy - 1, cy, cy + 1):
+                        cells.add((nx, ny))
+            for cell in cells:
+                self._cells.setdefault(cell, []).append(index)
+
+
+    def _project(self, lat: float, lng: float) -> Tuple[float, float]:
+        return lng * self._kx, lat * METERS_PER_DEGREE_LAT
+
+
+    def distance(self, lat: float, lng: float) -> float:
+        """
+        Distancia en metros del punto a la polilínea
+
+        Devuelve `math.inf` si no hay ningún segmento dentro del radio de búsqueda.
+        """
+        x, y = self._project(lat, lng)
+        candidates = self._cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)))
+        if not candidates:
+            return math.inf
+
+        best = math.inf
+        for index in candidates:
+            ax, ay, bx, by = self._segments[index]
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            if length_sq == 0.0:
+                t = 0.0
+            else:
+                t = max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length_sq))
+            px, py = ax + t * dx - x, ay + t * dy - y
+            best = min(best, px * px + py * py)
+
+        return math.sqrt(best)
+
+
+class _UserDeviationState:
+    """Estado de histéresis y cooldown de un recolector"""
+
+    __slots__ = ("route_id", "outside_count", "deviated", "last_alert_at")
+
+    def __init__(self, route_id: str):
+        self.route_id = route_id
+        self.outside_count = 0
+        self.deviated = False
+        self.last_alert_at = -math.inf
+
+
+class DeviationEngine:
+    """
+    Motor de detección de desvíos
+
+    Las rutas se indexan al crear la asignación (o al conectarse el tracker si
+    todavía no estaban en memoria) y cada fix se evalúa con `check()`.
+    """
+
+    def __init__(self, enter_meters: float, exit_meters: float, confirm_fixes: int, cooldown_seconds: float):
+        self.enter_meters = enter_meters
+        self.exit_meters = min(exit_meters, enter_meters)
+        self.confirm_fixes = max(1, confirm_fixes)
+        self.cooldown_seconds = cooldown_seconds
+
+        # Diccionario: {route_id: RouteSegmentIndex}
+        self._routes: Dict[str, RouteSegmentIndex] = {}
+        # Diccionario: {user_id: _UserDeviationState}
+        self._states: Dict[str, _UserDeviationState] = {}
+        # Tareas de alertas en curso (para que no las recolecte el GC)
+        self._alert_tasks: Set[asyncio.Task] = set()
+
+        self.alerts_fired = 0
+
+
+    def index_route(self, route_id: str, name: str, coordinates: List[List[float]]) -> Optional[RouteSegmentIndex]:
+        """Precalcular el índice de segmentos de una ruta"""
+        if not coordinates:
+            self._routes.pop(route_id, None)
+            return None
+
+        index = RouteSegmentIndex(route_id, name, coordinates, cell_size=self.enter_meters)
+        self._routes[route_id] = index
+        return index
+
+
+    async def ensure_route(self, db, route_id: str) -> Optional[RouteSegmentIndex]:
+        """Indexar la ruta desde la BD si todavía no está en memoria"""
+        index = self._routes.get(route_id)
+        if index is not None:
+            return index
+
+        route = await db["routes"].find_one({"_id": ObjectId(route_id)}, {"name": 1, "coordinates": 1})
+        if not route:
+            return None
+
+        return self.index_route(route_id, route.get("name", "Ruta Desconocida"), route.get("coordinates", []))
+
+
+    def reset_user(self, user_id: str):
+        """Olvidar el estado de un usuario (ej: nueva asignación)"""
+        self._states.pop(user_id, None)
+
+
+    def check(self, user_id: str, route_id: str, lat: float, lng: float) -> Optional[float]:
+        """
+        Evaluar un fix contra la ruta asignada
+
+        Returns:
+            Optional[float]: Distancia a la ruta en metros si hay que disparar
+            una alerta, None en caso contrario
+        """
+        index = self._routes.get(route_id)
+        if index is None:
+            return None
+
+        state = self._states.get(user_id)
+        if state is None or state.route_id != route_id:
+            state = self._states[user_id] = _UserDeviationState(route_id)
+
+        distance = index.distance(lat, lng)
+
+        if state.deviated:
+            if distance < self.exit_meters:
+                state.deviated = False
+                state.outside_count = 0
+            return None
+
+        if distance <= self.enter_meters:
+            state.outside_count = 0
+            return None
+
+        state.outside_count += 1
+        if state.outside_count < self.confirm_fixes:
+            return None
+
+        # En cooldown no se marca como desviado: el próximo fix fuera de la
+        # ruta vuelve a evaluar el cooldown y alerta apenas termine
+        now = time.monotonic()
+        if now - state.last_alert_at < self.cooldown_seconds:
+            return None
+
+        state.deviated = True
+        state.last_alert_at = now
+        return distance
+
+
+    def trigger_alert(self, db, user_id: str, user_name: str, route_id: str, distance: float):
+        """Registrar la alerta en segundo plano, sin frenar el loop del tracker"""
+        index = self._routes.get(route_id)
+        route_name = index.name if index is not None else "Ruta Desconocida"
+
+        async def _record():
+            try:
+                await record_deviation_alert(db, user_name, route_name, user_id=user_id, route_id=route_id)
+                self.alerts_fired += 1
+                logger.warning("Desvío detectado", extra={
+                    "user_id": user_id,
+                    "user_name": user_name,
+                    "route_id": route_id,
+                    "route_name": route_name,
+                    "distance_m": round(distance),
+                })
+            except Exception as e:
+                logger.error("Error registrando alerta de desvío", extra={"user_id": user_id, "error": str(e)})
+
+        task = asyncio.create_task(_record())
+        self._alert_tasks.add(task)
+        task.add_done_callback(self._alert_tasks.discard)
+
+
+    def get_stats(self) -> dict:
+        """Obtener estado del motor"""
+        return {
+            "indexed_routes": len(self._routes),
+            "tracked_users": len(self._states),
+            "deviated_users": sum(1 for state in self._states.values() if state.deviated),
+            "alerts_fired": self.alerts_fired,
+        }
+
+
+# Instancia global del motor
+deviation_engine = DeviationEngine(
+    enter_meters=settings.DEVIATION_ENTER_METERS,
+    exit_meters=settings.DEVIATION_EXIT_METERS,
+    confirm_fixes=settings.DEVIATION_CONFIRM_FIXES,
+    cooldown_seconds=settings.DEVIATION_ALERT_COOLDOWN_SECONDS
+)
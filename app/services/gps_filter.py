@@ -0,0 +1,113 @@
+"""
+Filtro cinemático de ubicaciones GPS por recolector
+
+Con el camión detenido el GPS del teléfono "baila" unos metros alrededor de
+la posición real, y de vez en cuando aparece un salto de cientos de metros
+(rebote en edificios, fix de red celular). Antes de este filtro cada uno de
+esos fixes se enviaba a los admins, se guardaba en el historial y se
+evaluaba contra la ruta.
+
+Cada fix se compara con el último aceptado del mismo recolector:
+- Movimiento menor a `min_move_meters`: jitter, se descarta. Igual se acepta
+  uno cada `keepalive_seconds` para que `last_update` no quede viejo.
+- Velocidad implícita mayor a `max_speed_mps`: salto imposible, se descarta.
+  Si llegan `max_rejects` saltos seguidos se acepta el último (el recolector
+  realmente se movió, el fix viejo era el erróneo, o volvió la señal tras un
+  túnel).
+
+El estado por recolector es un objeto con `__slots__` (último fix aceptado,
+hora y saltos seguidos) y cada fix cuesta O(1).
+"""
+
+import math
+import time
+from typing import Dict, Optional
+
+
+METERS_PER_DEGREE_LAT = 110_540.0
+METERS_PER_DEGREE_LNG = 111_320.0
+
+# Intervalo mínimo para calcular la velocidad: dos fixes casi simultáneos
+# no deben parecer un salto imposible
+MIN_INTERVAL_SECONDS = 1.0
+
+
+class _TrackerFilterState:
+    """Último fix aceptado de un recolector"""
+
+    __slots__ = ("lat", "lng", "accepted_at", "rejects")
+
+    def __init__(self, lat: float, lng: float, accepted_at: float):
+        self.lat = lat
+        self.lng = lng
+        self.accepted_at = accepted_at
+        self.rejects = 0
+
+
+class GpsFilter:
+    """Descarta jitter y saltos imposibles antes del broadcast y la BD"""
+
+    def __init__(self, min_move_meters: float, max_speed_mps: float, keepalive_seconds: float, max_rejects: int):
+        self.min_move_meters = min_move_meters
+        self.max_speed_mps = max_speed_mps
+        self.keepalive_seconds = keepalive_seconds
+        self.max_rejects = max(1, max_rejects)
+
+        # Diccionario: {user_id: _TrackerFilterState}
+        self._states: Dict[str, _TrackerFilterState] = {}
+
+        self.stats = {
+            "accepted": 0,
+            "jitter": 0,
+            "speed": 0,
+        }
+
+    def accept(self, user_id: str, lat: float, lng: float, now: Optional[float] = None) -> bool:
+        """
+        Evaluar un fix
+
+        Returns:
+            bool: True si el fix se debe procesar (broadcast, historial,
+            persistencia, desvíos); False si se descarta
+        """
+        now = time.monotonic() if now is None else now
+        state = self._states.get(user_id)
+        if state is None:
+            self._states[user_id] = _TrackerFilterState(lat, lng, now)
+            self.stats["accepted"] += 1
+            return True
+
+        dx = (lng - state.lng) * METERS_PER_DEGREE_LNG * math.cos(math.radians(lat))
+        dy = (lat - state.lat) * METERS_PER_DEGREE_LAT
+        distance = math.hypot(dx, dy)
+        elapsed = now - state.accepted_at
+
+        if distance < self.min_move_meters and elapsed < self.keepalive_seconds:
+            self.stats["jitter"] += 1
+            return False
+
+        if (
+            self.max_speed_mps > 0
+            and distance > self.max_speed_mps * max(elapsed, MIN_INTERVAL_SECONDS)
+            and state.rejects + 1 < self.max_rejects
+        ):
+            state.rejects += 1
+            self.stats["speed"] += 1
+            return False
+
+        state.lat = lat
+        state.lng = lng
+        state.accepted_at = now
+        state.rejects = 0
+        self.stats["accepted"] += 1
+        return True
+
+    def reset_user(self, user_id: str):
+        """Olvidar el estado de un recolector (ej: se desconectó)"""
+        self._states.pop(user_id, None)
+
+    def get_stats(self) -> dict:
+        return {
+            "trackers": len(self._states),
+            **self.stats,
+        }
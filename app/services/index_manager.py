@@ -0,0 +1,193 @@
+"""
+Índices de MongoDB declarados en un solo lugar
+
+`ensure_indexes` se ejecuta al iniciar la aplicación y crea los índices que
+necesitan las consultas frecuentes. `create_indexes` es idempotente: si el
+índice ya existe con la misma definición no hace nada.
+
+`explain_hot_queries` corre `explain()` sobre esas mismas consultas y marca
+las que terminan en un recorrido completo de la colección (COLLSCAN).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.agents.analysis_cache import COLLECTION_NAME as ANALYSIS_CACHE_COLLECTION
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.alert_counts import COLLECTION_NAME as ALERT_COUNTS_COLLECTION, INDEX_KEYS as ALERT_COUNTS_INDEX_KEYS
+from app.services.location_history import COLLECTION_NAME as HISTORY_COLLECTION
+
+
+logger = get_logger(__name__)
+
+Keys = List[Tuple[str, int]]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Índice declarado para una colección"""
+    collection: str
+    keys: Keys
+    options: Dict = field(default_factory=dict)
+
+    def to_model(self) -> IndexModel:
+        return IndexModel(self.keys, **self.options)
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    """Consulta frecuente a diagnosticar con explain()"""
+    name: str
+    collection: str
+    filter: Dict
+    sort: Optional[Keys] = None
+
+
+INDEXES: List[IndexSpec] = [
+    # Asignación activa de un recolector (caché y /assignments/user/{id})
+    IndexSpec("assignment", [("user_id", 1)]),
+
+    # Listados y exportaciones de alertas: más recientes primero, desempate por _id
+    IndexSpec("alertas", [("date", -1), ("_id", -1)]),
+    IndexSpec("alertas", [("user_id", 1), ("date", -1), ("_id", -1)]),
+    IndexSpec("alertas", [("route_id", 1), ("date", -1), ("_id", -1)]),
+
+    # Conteo de alertas por ruta/usuario/día
+    *(IndexSpec(ALERT_COUNTS_COLLECTION, keys) for keys in ALERT_COUNTS_INDEX_KEYS),
+
+    # Rutas completadas por fecha, recolector y ruta
+    IndexSpec("rutas_completadas", [("timestamp", -1), ("_id", -1)]),
+    IndexSpec("rutas_completadas", [("nombre", 1), ("timestamp", -1)]),
+    IndexSpec("rutas_completadas", [("ruta", 1), ("timestamp", -1)]),
+
+    # Recorrido de un usuario en un rango de tiempo
+    IndexSpec(HISTORY_COLLECTION, [("meta.user_id", 1), ("ts", 1)]),
+
+    # Expiración de la caché persistente de análisis
+    IndexSpec(
+        ANALYSIS_CACHE_COLLECTION,
+        [("created_at", 1)],
+        {"expireAfterSeconds": settings.AGENT_CACHE_PERSISTENT_TTL_DAYS * 24 * 3600}
+    ),
+]
+
+
+def _hot_queries() -> List[HotQuery]:
+    """Consultas frecuentes con valores de ejemplo"""
+    since = datetime.now() - timedelta(days=1)
+    return [
+        HotQuery("assignment_by_user", "assignment", {"user_id": "000000000000000000000000"}),
+        HotQuery("alerts_list", "alertas", {}, [("date", -1), ("_id", -1)]),
+        HotQuery("alerts_by_user", "alertas", {"user_id": "000000000000000000000000"}, [("date", -1), ("_id", -1)]),
+        HotQuery("alerts_by_route", "alertas", {"route_id": "000000000000000000000000"}, [("date", -1), ("_id", -1)]),
+        HotQuery("alerts_export", "alertas", {"date": {"$gte": since}}, [("date", 1)]),
+        HotQuery("alert_counts", ALERT_COUNTS_COLLECTION, {"scope": "route", "day": {"$gte": since.date().isoformat()}}, [("day", 1)]),
+        HotQuery("rutas_completadas_list", "rutas_completadas", {}, [("timestamp", -1), ("_id", -1)]),
+        HotQuery("rutas_completadas_export", "rutas_completadas", {"timestamp": {"$gte": since}}, [("timestamp", 1)]),
+        HotQuery(
+            "location_history_track",
+            HISTORY_COLLECTION,
+            {"meta.user_id": "000000000000000000000000", "ts": {"$gte": since}},
+            [("ts", 1)]
+        ),
+    ]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Crear todos los índices declarados en INDEXES
+
+    Un error en una colección (por ejemplo, un índice existente con otras
+    opciones) se informa y no impide crear los índices de las demás.
+
+    Returns:
+        {colección: [nombres de índices]}
+    """
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in INDEXES:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    created = {}
+    for collection, specs in by_collection.items():
+        try:
+            created[collection] = await db[collection].create_indexes([spec.to_model() for spec in specs])
+        except OperationFailure as e:
+            logger.warning("No se pudieron crear los índices", extra={"collection": collection, "error": str(e)})
+
+    logger.info("Índices verificados", extra={
+        "indexes": sum(len(names) for names in created.values()),
+        "collections": len(created),
+    })
+    return created
+
+
+def _plan_stages(plan) -> List[str]:
+    """Etapas de un plan de ejecución (recorriendo inputStage/inputStages/queryPlan)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key in ("inputStage", "queryPlan"):
+                stages.extend(_plan_stages(value))
+            elif key == "inputStages":
+                for child in value:
+                    stages.extend(_plan_stages(child))
+    return stages
+
+
+def _index_names(plan) -> List[str]:
+    """Índices usados por un plan de ejecución"""
+    names = []
+    if isinstance(plan, dict):
+        if "indexName" in plan:
+            names.append(plan["indexName"])
+        for value in plan.values():
+            if isinstance(value, (dict, list)):
+                names.extend(_index_names(value))
+    elif isinstance(plan, list):
+        for child in plan:
+            names.extend(_index_names(child))
+    return names
+
+
+async def explain_hot_queries(db) -> dict:
+    """
+    Ejecutar explain() sobre las consultas frecuentes
+
+    Returns:
+        Plan ganador de cada consulta y cuáles hacen COLLSCAN
+    """
+    results = []
+    for query in _hot_queries():
+        cursor = db[query.collection].find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+
+        try:
+            explanation = await cursor.limit(100).explain()
+        except OperationFailure as e:
+            results.append({"name": query.name, "collection": query.collection, "error": str(e)})
+            continue
+
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        results.append({
+            "name": query.name,
+            "collection": query.collection,
+            "stages": stages,
+            "indexes": sorted(set(_index_names(winning_plan))),
+            "collscan": "COLLSCAN" in stages,
+        })
+
+    collscans = [result["name"] for result in results if result.get("collscan")]
+    return {
+        "queries": results,
+        "collscans": collscans,
+        "ok": not collscans,
+    }
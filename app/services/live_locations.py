@@ -0,0 +1,152 @@
+"""
+Tabla compacta de ubicaciones en vivo
+
+Las ubicaciones de los recolectores conectados a este proceso se guardan en
+arreglos paralelos indexados por un índice de usuario (lat/lng en `array`
+de doubles, el resto en listas), en lugar de un dict por usuario que se
+reemplaza en cada fix. Los índices de los usuarios que se desconectan se
+reutilizan.
+
+Cada cambio incrementa `version`. La foto `active_users` serializada se
+guarda junto con la versión con la que se armó: mientras no cambie todos los
+admins que se conectan reciben el mismo frame, así una ráfaga de
+reconexiones tras un deploy cuesta una sola serialización. Cualquier cambio
+(incluida una desconexión) invalida la foto, para que un admin nuevo nunca
+reciba a un recolector que ya se fue.
+"""
+
+from array import array
+from typing import Dict, List, Optional
+
+from app.services.serialization import encode_message
+
+
+class LiveLocationTable:
+    """Última ubicación de cada recolector conectado a este proceso"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._free: List[int] = []
+
+        # Arreglos paralelos (posición = índice de usuario)
+        self.user_ids: List[Optional[str]] = []
+        self.names: List[Optional[str]] = []
+        self.route_ids: List[Optional[str]] = []
+        self.last_updates: List[Optional[str]] = []
+        self.lats = array("d")
+        self.lngs = array("d")
+
+        self.version = 0
+
+        # Cachés: filas (por versión exacta) y frame `active_users`
+        self._rows_version = -1
+        self._rows: List[dict] = []
+        self._frame_version = -1
+        self._frame: Optional[str] = None
+
+        self.stats = {
+            "snapshot_builds": 0,
+            "snapshot_hits": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._index
+
+    def set(self, user_id: str, name: str, lat: float, lng: float, route_id: Optional[str], last_update: str) -> int:
+        """
+        Guardar la ubicación de un usuario
+
+        Returns:
+            Índice del usuario en la tabla
+        """
+        index = self._index.get(user_id)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                self.user_ids[index] = user_id
+            else:
+                index = len(self.user_ids)
+                self.user_ids.append(user_id)
+                self.names.append(None)
+                self.route_ids.append(None)
+                self.last_updates.append(None)
+                self.lats.append(0.0)
+                self.lngs.append(0.0)
+            self._index[user_id] = index
+
+        self.names[index] = name
+        self.route_ids[index] = route_id
+        self.last_updates[index] = last_update
+        self.lats[index] = lat
+        self.lngs[index] = lng
+        self.version += 1
+        return index
+
+    def remove(self, user_id: str) -> bool:
+        """Quitar a un usuario; su índice queda libre para el próximo"""
+        index = self._index.pop(user_id, None)
+        if index is None:
+            return False
+
+        self.user_ids[index] = None
+        self.names[index] = None
+        self.route_ids[index] = None
+        self.last_updates[index] = None
+        self._free.append(index)
+        self.version += 1
+        return True
+
+    def _row(self, index: int) -> dict:
+        return {
+            "user_id": self.user_ids[index],
+            "name": self.names[index],
+            "lat": self.lats[index],
+            "lng": self.lngs[index],
+            "route_id": self.route_ids[index],
+            "last_update": self.last_updates[index],
+        }
+
+    def get(self, user_id: str) -> Optional[dict]:
+        index = self._index.get(user_id)
+        return self._row(index) if index is not None else None
+
+    def rows(self) -> List[dict]:
+        """Usuarios activos como lista de dicts (se arma una vez por versión; no modificar)"""
+        if self._rows_version != self.version:
+            self._rows = [self._row(index) for index in self._index.values()]
+            self._rows_version = self.version
+        return self._rows
+
+    def as_mapping(self) -> Dict[str, dict]:
+        """{user_id: {name, lat, lng, route_id, last_update}}"""
+        return {
+            row["user_id"]: {key: value for key, value in row.items() if key != "user_id"}
+            for row in self.rows()
+        }
+
+    def snapshot_frame(self) -> str:
+        """Mensaje `active_users` serializado (se arma una vez por versión)"""
+        if self._frame is not None and self._frame_version == self.version:
+            self.stats["snapshot_hits"] += 1
+            return self._frame
+
+        users = self.rows()
+        self._frame = encode_message({
+            "type": "active_users",
+            "users": users,
+            "count": len(users)
+        })
+        self._frame_version = self.version
+        self.stats["snapshot_builds"] += 1
+        return self._frame
+
+    def get_stats(self) -> dict:
+        return {
+            "users": len(self._index),
+            "capacity": len(self.user_ids),
+            "version": self.version,
+            **self.stats,
+        }
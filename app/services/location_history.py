@@ -0,0 +1,136 @@
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from app.config.logging_config import get_logger
+from app.config.settings import settings
+from app.services.batching import BackgroundBatcher
+
+
+logger = get_logger(__name__)
+
+COLLECTION_NAME = "location_history"
+DUPLICATE_KEY_ERROR = 11000
+
+
+class LocationHistoryService(BackgroundBatcher):
+    """
+    Historial de ubicaciones de los recolectores (replay de viajes y auditoría)
+
+    Cada fix aceptado por `ConnectionManager.update_tracker_location` se
+    agrega a un buffer y se inserta en lote (`insert_many`) en una colección
+    time-series de MongoDB:
+
+    {
+        "ts": datetime,
+        "meta": {"user_id": "...", "route_id": "..."},
+        "lat": -17.779723,
+        "lng": -63.192147
+    }
+
+    Si MongoDB no responde, el buffer se conserva hasta `max_buffer`
+    elementos; a partir de ahí se descartan los fixes más viejos. Si el lote
+    falla en parte, solo se reintentan los fixes que fallaron.
+    """
+
+    name = "Historial de ubicaciones"
+
+    def __init__(self, flush_interval: float, max_batch: int, max_buffer: int):
+        super().__init__(flush_interval, max_batch)
+        self.max_buffer = max_buffer
+
+        self._pending: Deque[dict] = deque(maxlen=max_buffer)
+        self._collection = None
+
+
+    def record(self, user_id: str, lat: float, lng: float, route_id: Optional[str] = None, ts: Optional[datetime] = None):
+        """Agregar un fix al buffer (sin esperar a la BD)"""
+        self._pending.append({
+            "ts": ts or datetime.now(),
+            "meta": {"user_id": user_id, "route_id": route_id},
+            "lat": lat,
+            "lng": lng
+        })
+        self._notify_size(len(self._pending))
+
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+
+    def _attach(self, db):
+        self._collection = db[COLLECTION_NAME]
+
+
+    def _take_batch(self) -> List[dict]:
+        batch = list(self._pending)
+        self._pending.clear()
+        return batch
+
+
+    async def _write(self, batch: List[dict]) -> int:
+        try:
+            await self._collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Los fixes que no figuran en writeErrors ya se guardaron. Un
+            # _id duplicado es un reintento de un fix que ya se había guardado
+            # (insert_many asigna el _id al documento antes de enviarlo)
+            errors = e.details.get("writeErrors", [])
+            failed = [batch[error["index"]] for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+            if failed:
+                self.errors += 1
+                logger.warning("Fixes del historial sin guardar; se reintentan", extra={
+                    "failed": len(failed),
+                    "batch": len(batch)
+                })
+                self._restore(failed)
+            return len(batch) - len(errors)
+        return len(batch)
+
+
+    def _restore(self, batch: List[dict]):
+        # Volver a poner el lote delante de los fixes que llegaron después,
+        # descartando los más viejos si se supera max_buffer
+        combined = batch + list(self._pending)
+        self._pending = deque(combined[-self.max_buffer:], maxlen=self.max_buffer)
+
+
+async def ensure_history_collection(db):
+    """
+    Crear la colección time-series del historial si no existe
+
+    Si el servidor no soporta colecciones time-series (MongoDB < 5.0) se usa
+    una colección normal. El índice por usuario y fecha se declara en
+    `app.services.index_manager`.
+    """
+    options = {
+        "timeseries": {
+            "timeField": "ts",
+            "metaField": "meta",
+            "granularity": "seconds"
+        }
+    }
+    if settings.LOCATION_HISTORY_TTL_DAYS > 0:
+        options["expireAfterSeconds"] = settings.LOCATION_HISTORY_TTL_DAYS * 24 * 3600
+
+    try:
+        await db.create_collection(COLLECTION_NAME, **options)
+        logger.info("Colección time-series creada", extra={"collection": COLLECTION_NAME})
+    except CollectionInvalid:
+        # Ya existe
+        pass
+    except OperationFailure as e:
+        logger.warning(
+            "No se pudo crear la colección time-series; se usa colección normal",
+            extra={"collection": COLLECTION_NAME, "error": str(e)}
+        )
+
+
+# Instancia global del servicio
+location_history = LocationHistoryService(
+    flush_interval=settings.LOCATION_HISTORY_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.LOCATION_HISTORY_FLUSH_MAX_BATCH,
+    max_buffer=settings.LOCATION_HISTORY_MAX_BUFFER
+)
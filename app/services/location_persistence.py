@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.config.settings import settings
+from app.services.batching import BackgroundBatcher
+
+
+class LocationPersistenceService(BackgroundBatcher):
+    """
+    Persistencia en segundo plano de `last_location` de los recolectores
+
+    El loop del tracker solo guarda la última ubicación de cada usuario en un
+    buffer en memoria. Una tarea de fondo vacía el buffer con un único
+    `bulk_write` cada `flush_interval` segundos, o antes si se acumulan
+    `max_batch` usuarios pendientes. Al apagar la app se hace un último flush.
+    """
+
+    name = "Persistencia de ubicaciones"
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        super().__init__(flush_interval, max_batch)
+
+        # Diccionario: {user_id: {lat, lng, updated_at}} (solo la última ubicación)
+        self._pending: Dict[str, dict] = {}
+        self._collection = None
+
+
+    def record(self, user_id: str, lat: float, lng: float, updated_at: Optional[datetime] = None):
+        """Guardar la última ubicación de un usuario (sin esperar a la BD)"""
+        self._pending[user_id] = {
+            "lat": lat,
+            "lng": lng,
+            "updated_at": updated_at or datetime.now()
+        }
+        self._notify_size(len(self._pending))
+
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+
+    def _attach(self, db):
+        self._collection = db["users"]
+
+
+    def _take_batch(self) -> Dict[str, dict]:
+        batch, self._pending = self._pending, {}
+        return batch
+
+
+    async def _write(self, batch: Dict[str, dict]) -> int:
+        operations = [
+            UpdateOne({"_id": ObjectId(user_id)}, {"$set": {"last_location": location}})
+            for user_id, location in batch.items()
+        ]
+        await self._collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+
+    def _restore(self, batch: Dict[str, dict]):
+        # Sin pisar ubicaciones más nuevas que llegaron durante el flush
+        for user_id, location in batch.items():
+            self._pending.setdefault(user_id, location)
+
+
+# Instancia global del servicio
+location_persistence = LocationPersistenceService(
+    flush_interval=settings.LOCATION_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.LOCATION_FLUSH_MAX_BATCH
+)
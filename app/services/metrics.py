@@ -0,0 +1,337 @@
+"""
+Métricas en formato de texto de Prometheus
+
+Registro mínimo (sin dependencias) de contadores e histogramas, pensado para
+quedar activo en el camino caliente (~1k mensajes/s por proceso):
+
+- Cada combinación de labels es un hijo que se crea una vez; los puntos
+  calientes guardan el hijo en una variable de módulo y solo incrementan
+  un número.
+- Los histogramas tienen buckets fijos (búsqueda binaria + incremento).
+- Los valores que ya existen en otros servicios (conexiones, colas, cachés)
+  no se duplican: se leen al momento del scrape con `register_collector`.
+
+`DbCommandMonitor` mide la latencia de MongoDB por colección con un
+CommandListener de pymongo.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from app.config.logging_config import get_logger
+
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets en segundos (de 100 µs a 10 s)
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets para llamadas lentas (modelo de IA)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricFamily:
+    """Métrica calculada al momento del scrape (para `register_collector`)"""
+
+    def __init__(self, name: str, metric_type: str, documentation: str, samples: Iterable[Sample] = ()):
+        self.name = name
+        self.type = metric_type
+        self.documentation = documentation
+        self.samples: List[Sample] = list(samples)
+
+    def add(self, value: float, **labels):
+        self.samples.append((labels, value))
+        return self
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.samples:
+            lines.append(f"{self.name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # Un contador por bucket (no acumulado) + el de +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric(ABC):
+    """Base de contadores e histogramas con labels"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def labels(self, *values: str):
+        """Hijo para una combinación de labels (guardarlo si se usa en un punto caliente)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera los labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _render_children(self) -> List[str]:
+        ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        return lines + self._render_children()
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Incrementar (métrica sin labels)"""
+        self.labels().inc(amount)
+
+    def _render_children(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Registrar un valor (métrica sin labels)"""
+        self.labels().observe(value)
+
+    def _render_children(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Métricas registradas y collectors que se evalúan en cada scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Registrar una función que devuelve métricas calculadas al momento del scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                for family in collector():
+                    lines.extend(family.render())
+            except Exception as e:
+                logger.error("Error en collector de métricas", extra={"error": str(e)})
+        return "\n".join(lines) + "\n"
+
+
+# Registro global
+registry = MetricsRegistry()
+
+
+# WebSockets
+ws_messages = registry.counter(
+    "innova_ws_messages_total",
+    "Mensajes WebSocket por endpoint y dirección",
+    ("endpoint", "direction")
+)
+WS_TRACKER_IN = ws_messages.labels("tracker", "in")
+WS_TRACKER_OUT = ws_messages.labels("tracker", "out")
+WS_ADMIN_IN = ws_messages.labels("admin", "in")
+WS_ADMIN_OUT = ws_messages.labels("admin", "out")
+WS_ALERTS_OUT = ws_messages.labels("alerts", "out")
+
+tracker_rejected = registry.counter(
+    "innova_tracker_rejected_total",
+    "Mensajes de trackers descartados por motivo",
+    ("reason",)
+)
+TRACKER_REJECTED_INVALID = tracker_rejected.labels("invalid")
+TRACKER_REJECTED_RATE_LIMITED = tracker_rejected.labels("rate_limited")
+
+broadcast_fanout = registry.histogram(
+    "innova_broadcast_fanout_seconds",
+    "Tiempo de encolar un evento para los admins de este proceso",
+    ("kind",)
+)
+FANOUT_LOCATION = broadcast_fanout.labels("location")
+FANOUT_EVENT = broadcast_fanout.labels("event")
+FANOUT_BATCH = broadcast_fanout.labels("batch")
+
+# MongoDB
+db_operation = registry.histogram(
+    "innova_db_operation_seconds",
+    "Latencia de los comandos de MongoDB por colección",
+    ("collection", "command")
+)
+db_errors = registry.counter(
+    "innova_db_errors_total",
+    "Comandos de MongoDB fallidos por colección",
+    ("collection", "command")
+)
+
+# Agente de IA
+agent_call = registry.histogram(
+    "innova_agent_call_seconds",
+    "Duración de cada intento de llamada al modelo",
+    ("outcome",),
+    buckets=SLOW_BUCKETS
+)
+agent_errors = registry.counter(
+    "innova_agent_errors_total",
+    "Errores del agente (timeout, error del modelo, análisis fallido tras reintentos)",
+    ("kind",)
+)
+agent_analysis = registry.histogram(
+    "innova_agent_analysis_seconds",
+    "Duración total de un análisis según quién respondió",
+    ("source",),
+    buckets=SLOW_BUCKETS
+)
+
+
+class DbCommandMonitor(monitoring.CommandListener):
+    """
+    Latencia de MongoDB por colección y comando
+
+    El evento de fin no trae el comando, así que la colección se guarda por
+    `request_id` al empezar. Pymongo llama a los listeners desde sus hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[int, str] = {}
+
+    @staticmethod
+    def _collection(event) -> str:
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        # getMore/killCursors: la colección va en "collection"
+        return str(event.command.get("collection", "-"))
+
+    def started(self, event):
+        collection = self._collection(event)
+        with self._lock:
+            self._collections[event.request_id] = collection
+
+    def _finish(self, event) -> Optional[str]:
+        with self._lock:
+            return self._collections.pop(event.request_id, None)
+
+    def succeeded(self, event):
+        collection = self._finish(event) or "-"
+        child = db_operation.labels(collection, event.command_name)
+        with self._lock:
+            child.observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        collection = self._finish(event) or "-"
+        child = db_operation.labels(collection, event.command_name)
+        errors = db_errors.labels(collection, event.command_name)
+        with self._lock:
+            child.observe(event.duration_micros / 1_000_000)
+            errors.inc()
+
+
+# Instancia global del listener
+db_command_monitor = DbCommandMonitor()
@@ -0,0 +1,147 @@
+"""
+Métricas del pool de conexiones de MongoDB
+
+`PoolMonitor` se registra como listener del cliente (CMAP) y cuenta, por
+servidor, las conexiones abiertas, en uso y las operaciones esperando una
+conexión libre. Con eso se dimensiona MONGO_MAX_POOL_SIZE para la carga de
+trackers: si `waiting` o `checkout_wait_ms.max` crecen, el pool es chico.
+
+Pymongo llama a los listeners desde los hilos del driver, por eso el estado
+se protege con un lock.
+"""
+
+import threading
+from typing import Dict
+
+from pymongo import monitoring
+
+
+class _PoolStats:
+    """Contadores de un pool (un servidor)"""
+
+    __slots__ = (
+        "open", "in_use", "waiting", "max_in_use", "max_waiting",
+        "created", "closed", "checkouts", "checkout_failures", "cleared",
+        "wait_total", "wait_max", "wait_count",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self) -> dict:
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_in_use": self.max_in_use,
+            "max_waiting": self.max_waiting,
+            "created": self.created,
+            "closed": self.closed,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "cleared": self.cleared,
+            "checkout_wait_ms": {
+                "avg": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                "max": round(self.wait_max * 1000.0, 3),
+            },
+        }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Listener CMAP con el estado de los pools por servidor"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _PoolStats] = {}
+
+    def _stats(self, address) -> _PoolStats:
+        key = f"{address[0]}:{address[1]}"
+        stats = self._pools.get(key)
+        if stats is None:
+            stats = self._pools[key] = _PoolStats()
+        return stats
+
+    def _record_wait(self, stats: _PoolStats, duration: float):
+        stats.wait_total += duration
+        stats.wait_count += 1
+        if duration > stats.wait_max:
+            stats.wait_max = duration
+
+    def pool_created(self, event):
+        with self._lock:
+            self._stats(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._stats(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.created += 1
+            stats.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.closed += 1
+            stats.open = max(0, stats.open - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.waiting += 1
+            stats.max_waiting = max(stats.max_waiting, stats.waiting)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.waiting = max(0, stats.waiting - 1)
+            stats.checkout_failures += 1
+            self._record_wait(stats, event.duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.waiting = max(0, stats.waiting - 1)
+            stats.in_use += 1
+            stats.max_in_use = max(stats.max_in_use, stats.in_use)
+            stats.checkouts += 1
+            self._record_wait(stats, event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.in_use = max(0, stats.in_use - 1)
+
+    def get_stats(self, max_pool_size: int) -> dict:
+        """
+        Estado de los pools
+
+        Args:
+            max_pool_size: Tamaño máximo configurado (para calcular la utilización)
+        """
+        with self._lock:
+            pools = {address: stats.as_dict() for address, stats in self._pools.items()}
+
+        for pool in pools.values():
+            pool["utilization"] = round(pool["in_use"] / max_pool_size, 3) if max_pool_size else 0.0
+
+        return {
+            "max_pool_size": max_pool_size,
+            "pools": pools,
+        }
+
+
+# Instancia global del listener
+pool_monitor = PoolMonitor()
@@ -0,0 +1,226 @@
+"""
+Paginación por cursor (keyset) para los endpoints de listado
+
+En vez de `find().to_list(length=None)`, cada página lee como máximo
+`limit + 1` documentos ordenados por (`sort_field`, `_id`). El cursor de la
+página siguiente codifica el último valor visto, así que pedir la página N
+cuesta lo mismo que pedir la primera y la memoria no crece con la colección.
+
+Parámetros comunes (query string):
+- `limit`:  documentos por página
+- `cursor`: token devuelto en el header `X-Next-Cursor` de la página anterior
+- `fields`: proyección, ej: `fields=name,rol`
+- `since`:  solo documentos desde esa fecha
+
+La respuesta es `{"items": [...], "next_cursor": "..."}` (`Page[Model]`); el
+cursor también va en el header `X-Next-Cursor`.
+"""
+
+import base64
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Generic, Iterable, List, Optional, Type, TypeVar
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, create_model
+
+from app.config.settings import settings
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+class PageParams:
+    """Parámetros de paginación (usar con `Depends()`)"""
+
+    def __init__(
+        self,
+        limit: int = Query(settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT, description="Documentos por página"),
+        cursor: Optional[str] = Query(None, description=f"Cursor de la página siguiente (header {NEXT_CURSOR_HEADER})"),
+        fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (ej: name,rol)"),
+        since: Optional[datetime] = Query(None, description="Solo documentos desde esta fecha")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+        self.since = since
+
+
+class Page(BaseModel, Generic[T]):
+    """Una página de resultados (usar `Page[Model]` como response_model)"""
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description=f"Cursor de la página siguiente (también en {NEXT_CURSOR_HEADER})")
+
+
+def encode_cursor(value: Any, last_id: ObjectId) -> str:
+    """Codificar la posición (valor de orden, _id) del último documento"""
+    if isinstance(value, datetime):
+        payload = {"t": "d", "v": value.isoformat(), "id": str(last_id)}
+    elif isinstance(value, ObjectId):
+        payload = {"t": "o", "v": str(value), "id": str(last_id)}
+    else:
+        payload = {"t": "r", "v": value, "id": str(last_id)}
+
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Decodificar un cursor; responde 400 si es inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload["t"] == "d":
+            value = datetime.fromisoformat(value)
+        elif payload["t"] == "o":
+            value = ObjectId(value)
+        return value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def _keyset_condition(sort_field: str, direction: int, value: Any, last_id: ObjectId) -> dict:
+    """Filtro para los documentos que van después de (value, last_id)"""
+    op = "$gt" if direction > 0 else "$lt"
+
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+
+    if value is None:
+        # Los documentos sin el campo van primero en orden ascendente y al final en descendente
+        condition = [{sort_field: None, "_id": {op: last_id}}]
+        if direction > 0:
+            condition.append({sort_field: {"$ne": None}})
+        return {"$or": condition}
+
+    return {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}}
+    ]}
+
+
+def build_projection(fields: Optional[str], allowed_fields: Iterable[str]) -> dict:
+    """
+    Proyección a partir del parámetro `fields`
+
+    Sin `fields` se devuelven todos los campos permitidos. Un campo fuera de
+    `allowed_fields` responde 400.
+    """
+    allowed = set(allowed_fields)
+
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - allowed - {"_id"}
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campos desconocidos: {', '.join(sorted(unknown))}. Permitidos: {', '.join(sorted(allowed))}"
+            )
+    else:
+        requested = allowed
+
+    projection = {field: 1 for field in requested}
+    projection["_id"] = 1
+    return projection
+
+
+async def paginate(
+    collection,
+    params: PageParams,
+    allowed_fields: Iterable[str],
+    query: Optional[dict] = None,
+    sort_field: str = "_id",
+    direction: int = 1,
+    since_field: Optional[str] = None
+) -> Page:
+    """
+    Leer una página de una colección
+
+    Args:
+        collection: Colección de Motor
+        params: Parámetros de paginación del request
+        allowed_fields: Campos que se pueden devolver (forma del response)
+        query: Filtro base
+        sort_field: Campo de orden (se desempata por `_id`)
+        direction: 1 ascendente, -1 descendente
+        since_field: Campo fecha para `since` (None = fecha de creación del `_id`)
+    """
+    conditions = [query] if query else []
+
+    if params.since is not None:
+        if since_field:
+            conditions.append({since_field: {"$gte": params.since}})
+        else:
+            conditions.append({"_id": {"$gte": ObjectId.from_datetime(params.since)}})
+
+    if params.cursor:
+        value, last_id = decode_cursor(params.cursor)
+        conditions.append(_keyset_condition(sort_field, direction, value, last_id))
+
+    if not conditions:
+        mongo_filter = {}
+    elif len(conditions) == 1:
+        mongo_filter = conditions[0]
+    else:
+        mongo_filter = {"$and": conditions}
+
+    projection = build_projection(params.fields, allowed_fields)
+    drop_sort_field = sort_field not in projection
+    projection[sort_field] = 1
+
+    sort = [(sort_field, direction)]
+    if sort_field != "_id":
+        sort.append(("_id", direction))
+
+    cursor = collection.find(mongo_filter, projection).sort(sort).limit(params.limit + 1)
+    documents = await cursor.to_list(length=params.limit + 1)
+
+    next_cursor = None
+    if len(documents) > params.limit:
+        documents = documents[:params.limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    for document in documents:
+        document["_id"] = str(document["_id"])
+        if drop_sort_field:
+            document.pop(sort_field, None)
+
+    return Page(items=documents, next_cursor=next_cursor)
+
+
+@lru_cache(maxsize=None)
+def _partial_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """Variante de `model` con todos los campos opcionales (páginas con `fields`)"""
+    fields = {
+        name: (Optional[info.annotation], Field(None, alias=info.alias))
+        for name, info in model.model_fields.items()
+    }
+    return create_model(f"{model.__name__}Partial", __base__=model, **fields)
+
+
+def page_response(page: Page, model: Type[BaseModel], params: PageParams) -> JSONResponse:
+    """
+    Respuesta `Page[model]` con el cursor también en `X-Next-Cursor`
+
+    Los documentos se validan con `model` (tipos coercionados, campos no
+    declarados fuera), igual que haría el response_model de la ruta. Con
+    `fields` se valida con una variante de campos opcionales y solo se
+    devuelven los campos pedidos.
+    """
+    partial = bool(params.fields)
+    item_model = _partial_model(model) if partial else model
+    validated = Page[item_model](items=page.items, next_cursor=page.next_cursor)
+
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+    return JSONResponse(
+        content=validated.model_dump(mode="json", by_alias=True, exclude_unset=partial),
+        headers=headers
+    )
@@ -0,0 +1,41 @@
+import asyncio
+import base64
+
+from app.agents.image_preprocessing import make_thumbnail
+from app.config.settings import settings
+from app.services.blob_store import BlobStore
+
+
+PHOTO_FIELDS_EXCLUDED = {"foto_base64": 0}
+
+# Campos que devuelven los listados de rutas completadas (nunca `foto_base64`)
+RUTA_COMPLETADA_FIELDS = (
+    "nombre",
+    "ruta",
+    "foto_ref",
+    "foto_content_type",
+    "foto_bytes",
+    "foto_thumbnail_base64",
+    "volumen_porcentual",
+    "timestamp",
+    "updated_at",
+)
+
+
+async def store_photo(store: BlobStore, image_data: bytes) -> dict:
+    """
+    Guardar una foto en el blob store y devolver los campos para el documento
+    
+    El documento guarda solo la referencia (clave por contenido) y una
+    miniatura pequeña; la imagen completa se sirve desde
+    `GET /api/agent/fotos/{foto_ref}`.
+    """
+    info = await store.put(image_data)
+    thumbnail = await asyncio.to_thread(make_thumbnail, image_data, settings.PHOTO_THUMBNAIL_MAX_EDGE)
+    
+    return {
+        "foto_ref": info.key,
+        "foto_content_type": info.content_type,
+        "foto_bytes": info.size,
+        "foto_thumbnail_base64": base64.b64encode(thumbnail).decode("utf-8")
+    }
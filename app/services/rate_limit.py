@@ -0,0 +1,58 @@
+"""
+Límite de mensajes por conexión (token bucket)
+
+Cada conexión de tracker tiene un bucket propio: se recarga a `rate` tokens
+por segundo hasta `capacity` (la ráfaga permitida) y cada mensaje consume
+uno. Sin tokens el mensaje se descarta sin parsearlo, así un teléfono con
+un bug que manda cientos de fixes por segundo no llega a la validación, al
+broadcast ni a la BD.
+
+Los mensajes que se descartan son los más nuevos: mientras dura el límite el
+servidor se queda con el último fix que entró (más viejo que los
+descartados). El tracker recibe un `rate_limited` al empezar cada ráfaga de
+descartes y su próximo fix aceptado vuelve a actualizar la posición.
+"""
+
+import time
+from typing import Optional
+
+from app.config.settings import settings
+
+
+class TokenBucket:
+    """Token bucket de una conexión (estado compacto, O(1) por mensaje)"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "allowed", "dropped", "streak")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.allowed = 0
+        self.dropped = 0
+        # Descartes seguidos (0 = la conexión no está limitada ahora)
+        self.streak = 0
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Consumir un token; False si el mensaje excede el límite"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.allowed += 1
+            self.streak = 0
+            return True
+
+        self.dropped += 1
+        self.streak += 1
+        return False
+
+
+def tracker_rate_limiter() -> Optional[TokenBucket]:
+    """Bucket para una conexión de tracker según la configuración (None = sin límite)"""
+    if settings.TRACKER_MAX_FIXES_PER_SECOND <= 0:
+        return None
+    return TokenBucket(settings.TRACKER_MAX_FIXES_PER_SECOND, settings.TRACKER_BURST)
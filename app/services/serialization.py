@@ -0,0 +1,71 @@
+"""
+Serialización de mensajes WebSocket
+
+Los broadcasts se codifican UNA vez a texto JSON y ese mismo frame se envía a
+todos los sockets. El encoder es intercambiable: se usa orjson si está
+instalado y, si no, el módulo json estándar con el mismo formato compacto que
+usa Starlette en send_json.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Callable
+
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _default(obj: Any):
+    """Tipos que no son JSON nativos (ObjectId, fechas)"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+def _json_dumps(message: Any) -> str:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def _orjson_dumps(message: Any) -> str:
+    return orjson.dumps(message, default=_default).decode("utf-8")
+
+
+ENCODERS = {"json": _json_dumps}
+if orjson is not None:
+    ENCODERS["orjson"] = _orjson_dumps
+
+_encoder: Callable[[Any], str] = ENCODERS.get("orjson", _json_dumps)
+
+
+def configure_encoder(name: str = "auto"):
+    """
+    Elegir el encoder JSON
+
+    Args:
+        name: "auto" (orjson si está disponible), "orjson" o "json"
+    """
+    global _encoder
+
+    if name == "auto":
+        name = "orjson" if "orjson" in ENCODERS else "json"
+
+    if name not in ENCODERS:
+        raise ValueError(f"Encoder JSON no disponible: {name}")
+
+    _encoder = ENCODERS[name]
+
+
+def register_encoder(name: str, encoder: Callable[[Any], str]):
+    """Registrar un encoder adicional (debe devolver texto JSON)"""
+    ENCODERS[name] = encoder
+
+
+def encode_message(message: Any) -> str:
+    """Codificar un mensaje a un frame de texto JSON"""
+    return _encoder(message)
@@ -0,0 +1,138 @@
+"""
+Respuestas en streaming desde cursores de Motor
+
+Los documentos se leen del cursor de a uno (Motor los trae por lotes) y se
+escriben a la respuesta en bloques, sin construir la lista completa en memoria.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional, Sequence
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+from app.services.serialization import encode_message
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+async def stream_ndjson(
+    cursor,
+    transform: Optional[Callable[[dict], dict]] = None,
+    chunk_size: int = 500
+) -> AsyncIterator[str]:
+    """
+    Convertir un cursor en líneas NDJSON (un documento JSON por línea)
+
+    Args:
+        cursor: Cursor de Motor
+        transform: Función opcional para adaptar cada documento
+        chunk_size: Documentos por bloque escrito a la respuesta
+    """
+    lines = []
+    async for document in cursor:
+        if transform is not None:
+            document = transform(document)
+        lines.append(encode_message(document))
+
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _csv_value(value):
+    """Valor de una celda CSV"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+async def stream_csv(
+    cursor,
+    columns: Sequence[str],
+    transform: Optional[Callable[[dict], dict]] = None,
+    chunk_size: int = 500
+) -> AsyncIterator[str]:
+    """
+    Convertir un cursor en filas CSV (con encabezado)
+
+    Args:
+        cursor: Cursor de Motor
+        columns: Columnas (claves de cada documento) en orden
+        transform: Función opcional para adaptar cada documento
+        chunk_size: Filas por bloque escrito a la respuesta
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+
+    async for document in cursor:
+        if transform is not None:
+            document = transform(document)
+        writer.writerow([_csv_value(document.get(column)) for column in columns])
+        rows += 1
+
+        if rows >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(
+    cursor,
+    export_format: str,
+    columns: Sequence[str],
+    filename: str,
+    batch_size: int = 500,
+    transform: Optional[Callable[[dict], dict]] = None
+) -> StreamingResponse:
+    """
+    Exportar un cursor como NDJSON o CSV en streaming
+
+    El cursor pide a MongoDB lotes de `batch_size` documentos y cada lote se
+    escribe a la respuesta antes de leer el siguiente, así que en memoria hay
+    como máximo un lote.
+
+    Args:
+        cursor: Cursor de Motor (sin iterar)
+        export_format: "ndjson" o "csv"
+        columns: Columnas del CSV (en NDJSON se exportan los documentos tal cual)
+        filename: Nombre del archivo sin extensión
+        batch_size: Documentos por lote de MongoDB y por bloque de la respuesta
+        transform: Función opcional para adaptar cada documento
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación no soportado: {export_format}")
+
+    cursor = cursor.batch_size(batch_size)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+
+    if export_format == "csv":
+        return StreamingResponse(
+            stream_csv(cursor, columns, transform=transform, chunk_size=batch_size),
+            media_type=CSV_MEDIA_TYPE,
+            headers=headers
+        )
+
+    return StreamingResponse(
+        stream_ndjson(cursor, transform=transform, chunk_size=batch_size),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers
+    )
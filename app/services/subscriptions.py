@@ -0,0 +1,232 @@
+"""
+Suscripciones de admins por zona, ruta o usuario
+
+Un admin sin suscripción recibe todo (comportamiento original). Con una
+suscripción recibe solo las ubicaciones que cumplen AL MENOS uno de sus
+filtros:
+
+- bbox:      [min_lng, min_lat, max_lng, max_lat] (mismo orden que GeoJSON)
+- route_ids: rutas asignadas
+- user_ids:  recolectores específicos
+
+`SubscriptionIndex` evita recorrer todos los admins en cada ubicación: hay un
+índice por usuario, otro por ruta y una grilla de celdas para las zonas.
+Cada ubicación consulta solo su celda, su ruta y su usuario.
+"""
+
+import math
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+BBox = Tuple[float, float, float, float]
+
+
+class SubscriptionError(ValueError):
+    """Mensaje de suscripción inválido"""
+
+
+class AdminSubscription:
+    """Filtros de un admin"""
+
+    __slots__ = ("bbox", "route_ids", "user_ids")
+
+    def __init__(
+        self,
+        bbox: Optional[BBox] = None,
+        route_ids: Optional[Iterable[str]] = None,
+        user_ids: Optional[Iterable[str]] = None
+    ):
+        self.bbox = bbox
+        self.route_ids = frozenset(route_ids or ())
+        self.user_ids = frozenset(user_ids or ())
+
+    @classmethod
+    def from_message(cls, message: dict) -> "AdminSubscription":
+        """Crear una suscripción desde un mensaje `subscribe` del admin"""
+        bbox = message.get("bbox")
+        if bbox is not None:
+            try:
+                min_lng, min_lat, max_lng, max_lat = (float(value) for value in bbox)
+            except (TypeError, ValueError):
+                raise SubscriptionError("`bbox` debe ser [min_lng, min_lat, max_lng, max_lat]")
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+                raise SubscriptionError("`bbox` fuera de rango o con mínimos mayores que máximos")
+            bbox = (min_lng, min_lat, max_lng, max_lat)
+
+        route_ids = message.get("route_ids") or ()
+        user_ids = message.get("user_ids") or ()
+        if not isinstance(route_ids, (list, tuple)) or not isinstance(user_ids, (list, tuple)):
+            raise SubscriptionError("`route_ids` y `user_ids` deben ser listas")
+
+        subscription = cls(bbox, (str(value) for value in route_ids), (str(value) for value in user_ids))
+        if subscription.is_empty():
+            raise SubscriptionError("La suscripción necesita `bbox`, `route_ids` o `user_ids`")
+        return subscription
+
+    def is_empty(self) -> bool:
+        return self.bbox is None and not self.route_ids and not self.user_ids
+
+    def contains_point(self, lat: float, lng: float) -> bool:
+        if self.bbox is None:
+            return False
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+    def matches(self, user_id: Optional[str], route_id: Optional[str], lat: Optional[float], lng: Optional[float]) -> bool:
+        """Si una ubicación cumple alguno de los filtros"""
+        if user_id is not None and user_id in self.user_ids:
+            return True
+        if route_id is not None and route_id in self.route_ids:
+            return True
+        return lat is not None and lng is not None and self.contains_point(lat, lng)
+
+    def as_dict(self) -> dict:
+        return {
+            "bbox": list(self.bbox) if self.bbox is not None else None,
+            "route_ids": sorted(self.route_ids),
+            "user_ids": sorted(self.user_ids),
+        }
+
+
+class SubscriptionIndex:
+    """
+    Índice de suscripciones para decidir qué admins reciben cada evento
+
+    Las claves (`subscriber`) son los canales de los admins. Además del índice
+    se recuerda qué usuarios vio cada admin filtrado: cuando uno de esos
+    usuarios sale de sus filtros (o se desconecta) el admin recibe ese último
+    evento, así no le queda un marcador congelado en el mapa.
+    """
+
+    def __init__(self, cell_degrees: float = 0.01, max_cells: int = 40000):
+        self.cell_degrees = cell_degrees
+        self.max_cells = max_cells
+
+        self._subscriptions: Dict[Hashable, AdminSubscription] = {}
+        self._cells: Dict[Hashable, Set[Tuple[int, int]]] = {}
+        self._by_user: Dict[str, Set[Hashable]] = {}
+        self._by_route: Dict[str, Set[Hashable]] = {}
+        self._by_cell: Dict[Tuple[int, int], Set[Hashable]] = {}
+        # {user_id: admins filtrados que ya recibieron a ese usuario}
+        self._seen: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def _bbox_cells(self, bbox: BBox) -> Set[Tuple[int, int]]:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        min_row, min_col = self._cell(min_lat, min_lng)
+        max_row, max_col = self._cell(max_lat, max_lng)
+
+        count = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if count > self.max_cells:
+            raise SubscriptionError("`bbox` demasiado grande; suscribirse sin filtros para ver toda la ciudad")
+
+        return {
+            (row, col)
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+        }
+
+    def get(self, subscriber: Hashable) -> Optional[AdminSubscription]:
+        return self._subscriptions.get(subscriber)
+
+    def subscribe(self, subscriber: Hashable, subscription: AdminSubscription):
+        """Reemplazar la suscripción de un admin"""
+        cells = self._bbox_cells(subscription.bbox) if subscription.bbox is not None else set()
+
+        self.remove(subscriber)
+        self._subscriptions[subscriber] = subscription
+        self._cells[subscriber] = cells
+
+        for user_id in subscription.user_ids:
+            self._by_user.setdefault(user_id, set()).add(subscriber)
+        for route_id in subscription.route_ids:
+            self._by_route.setdefault(route_id, set()).add(subscriber)
+        for cell in cells:
+            self._by_cell.setdefault(cell, set()).add(subscriber)
+
+    def remove(self, subscriber: Hashable):
+        """Quitar la suscripción de un admin (vuelve a recibir todo)"""
+        subscription = self._subscriptions.pop(subscriber, None)
+        if subscription is None:
+            return
+
+        for user_id in subscription.user_ids:
+            self._discard(self._by_user, user_id, subscriber)
+        for route_id in subscription.route_ids:
+            self._discard(self._by_route, route_id, subscriber)
+        for cell in self._cells.pop(subscriber, ()):
+            self._discard(self._by_cell, cell, subscriber)
+        for user_id in list(self._seen):
+            self._discard(self._seen, user_id, subscriber)
+
+    @staticmethod
+    def _discard(index: dict, key, subscriber: Hashable):
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+    def match_location(self, user_id: Optional[str], route_id: Optional[str], lat: Optional[float], lng: Optional[float]) -> Set[Hashable]:
+        """
+        Admins filtrados que deben recibir una ubicación
+
+        Incluye una última vez a los admins que veían al usuario y ya no
+        cumple sus filtros (el marcador sale de su zona).
+        """
+        matched: Set[Hashable] = set()
+
+        if user_id is not None:
+            matched.update(self._by_user.get(user_id, ()))
+        if route_id is not None:
+            matched.update(self._by_route.get(route_id, ()))
+        if lat is not None and lng is not None:
+            for subscriber in self._by_cell.get(self._cell(lat, lng), ()):
+                if subscriber not in matched and self._subscriptions[subscriber].contains_point(lat, lng):
+                    matched.add(subscriber)
+
+        if user_id is None:
+            return matched
+
+        previously_seen = self._seen.get(user_id)
+        if matched:
+            self._seen[user_id] = set(matched)
+        else:
+            self._seen.pop(user_id, None)
+        if previously_seen:
+            matched |= previously_seen
+        return matched
+
+    def mark_seen(self, subscriber: Hashable, user_ids: Iterable[str]):
+        """Registrar usuarios que un admin filtrado ya conoce (ej: por la foto inicial)"""
+        if subscriber not in self._subscriptions:
+            return
+        for user_id in user_ids:
+            self._seen.setdefault(user_id, set()).add(subscriber)
+
+    def match_user_event(self, user_id: Optional[str], forget: bool = False) -> Set[Hashable]:
+        """
+        Admins filtrados que deben recibir un evento de un usuario (conexión/desconexión)
+
+        Lo reciben los que siguen a ese usuario explícitamente o ya recibieron
+        alguna ubicación suya. Con `forget` el usuario deja de contarse como visto.
+        """
+        if user_id is None:
+            return set()
+
+        matched = set(self._by_user.get(user_id, ()))
+        matched |= self._seen.pop(user_id, set()) if forget else self._seen.get(user_id, set())
+        return matched
+
+    def get_stats(self) -> dict:
+        return {
+            "subscribed_admins": len(self._subscriptions),
+            "indexed_users": len(self._by_user),
+            "indexed_routes": len(self._by_route),
+            "indexed_cells": len(self._by_cell),
+        }
@@ -0,0 +1,27 @@
+"""
+Normalización de fechas de los filtros por rango
+
+Las fechas se guardan sin zona horaria (`datetime` naive): el historial de
+ubicaciones en hora local del servidor y las alertas/rutas completadas en
+hora de Bolivia. Un cliente puede mandar `?start=2025-11-15T00:00:00Z`; esa
+fecha con zona se convierte a la misma convención antes de compararla con
+otra o de usarla en una consulta.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+# Hora de Bolivia (UTC-4, sin horario de verano)
+BOLIVIA_TZ = timezone(timedelta(hours=-4))
+
+
+def to_naive(value: Optional[datetime], tz: Optional[timezone] = None) -> Optional[datetime]:
+    """
+    Convertir una fecha con zona a naive en `tz` (None = hora local del servidor)
+
+    Las fechas naive se devuelven sin cambios.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(tz).replace(tzinfo=None)
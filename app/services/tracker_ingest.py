@@ -0,0 +1,68 @@
+"""
+Validación de los mensajes que envían los trackers
+
+Los frames de texto se validan directamente con un `TypeAdapter` compilado
+de `LocationUpdate` (`validate_json` parsea y valida en un solo paso, sin
+pasar por `json.loads` ni armar un dict intermedio). Los frames binarios se
+decodifican con binary_protocol y pasan por la misma validación, así los
+rangos de coordenadas se controlan igual en las dos codificaciones.
+"""
+
+from typing import Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.schemas.tracking import LocationUpdate
+from app.services.binary_protocol import decode_tracker_frame
+
+
+_location_adapter = TypeAdapter(LocationUpdate)
+
+
+class InvalidTrackerMessage(ValueError):
+    """Mensaje del tracker que no se puede procesar (el texto va al cliente)"""
+
+
+def _invalid(error: ValidationError) -> InvalidTrackerMessage:
+    errors = error.errors(include_url=False)
+    if any(item["type"] == "json_invalid" for item in errors):
+        return InvalidTrackerMessage("Formato JSON inválido")
+
+    fields = sorted({str(item["loc"][0]) for item in errors if item["loc"]})
+    if not fields:
+        return InvalidTrackerMessage("Ubicación inválida: se esperaba un objeto JSON")
+    return InvalidTrackerMessage(f"Ubicación inválida: {', '.join(fields)} ausente o fuera de rango")
+
+
+def parse_text_frame(text: str) -> Optional[LocationUpdate]:
+    """
+    Validar un frame de texto del tracker
+
+    Returns:
+        La ubicación, o None si es un mensaje de otro tipo o sin `type` (se ignora)
+
+    Raises:
+        InvalidTrackerMessage: JSON inválido o ubicación con campos faltantes o fuera de rango
+    """
+    try:
+        return _location_adapter.validate_json(text)
+    except ValidationError as e:
+        # Otro `type` (o ninguno): no es una ubicación
+        if any(item["loc"] == ("type",) for item in e.errors(include_url=False)):
+            return None
+        raise _invalid(e) from None
+
+
+def parse_binary_frame(data: bytes) -> LocationUpdate:
+    """
+    Decodificar y validar un frame binario del tracker
+
+    Raises:
+        InvalidTrackerMessage: Frame desconocido o coordenadas fuera de rango
+    """
+    try:
+        return _location_adapter.validate_python(decode_tracker_frame(data))
+    except ValidationError as e:
+        raise _invalid(e) from None
+    except ValueError as e:
+        raise InvalidTrackerMessage(str(e)) from None
@@ -0,0 +1,168 @@
+"""
+Verifica que el análisis de imágenes no congela el event loop
+
+Usa un modelo stub que tarda `--latency` segundos (time.sleep, igual que el
+SDK síncrono de Gemini) y, mientras hay análisis en curso, un tracker simulado
+envía ubicaciones cada 50 ms que se difunden a un admin simulado.
+
+- sync:  la ruta anterior (analyze_image dentro del handler async)
+- async: analyze_image_async (pool de hilos acotado)
+
+Sale con código 1 si, en modo async, el loop se atrasa más de un tick, el
+tracker se frena o el admin no recibe todas las ubicaciones enviadas.
+
+Uso:
+    python benchmarks/agent_event_loop.py --latency 1.0 --analyses 4
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "innova_bench")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+# Sin caché: todas las llamadas deben llegar al modelo stub
+os.environ.setdefault("AGENT_CACHE_ENABLED", "false")
+# Sin filtro GPS: cada ubicación simulada debe llegar al admin
+os.environ.setdefault("GPS_FILTER_ENABLED", "false")
+
+from PIL import Image  # noqa: E402
+
+from app.agents.trash_vision_agent import TrashBinAgent  # noqa: E402
+from app.services.connection_manager import manager  # noqa: E402
+
+
+TICK_SECONDS = 0.05
+
+
+class StubModel:
+    """Modelo que bloquea el hilo como el SDK real"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, parts, request_options=None):
+        time.sleep(self.latency)
+        return SimpleNamespace(text="75%")
+
+
+class FakeAdminSocket:
+    """WebSocket de admin que solo cuenta los `location_update` recibidos"""
+
+    def __init__(self):
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame: str):
+        if json.loads(frame).get("type") == "location_update":
+            self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+
+def sample_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (120, 90, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def tracker(stop: asyncio.Event, lags: list) -> int:
+    """
+    Enviar una ubicación cada TICK_SECONDS y medir el retraso del loop
+
+    Returns:
+        Cantidad de ubicaciones enviadas
+    """
+    sent = 0
+    lat, lng = -17.779723, -63.192147
+    expected = time.perf_counter() + TICK_SECONDS
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+        lags.append(time.perf_counter() - expected)
+        expected += TICK_SECONDS
+        lat += 0.00001
+        await manager.update_tracker_location("bench-user", "Bench", lat, lng, None)
+        sent += 1
+    return sent
+
+
+async def run(mode: str, latency: float, analyses: int) -> dict:
+    agent = TrashBinAgent(model=StubModel(latency))
+    image = sample_image()
+
+    admin = FakeAdminSocket()
+    await manager.connect_admin(admin)
+
+    stop = asyncio.Event()
+    lags: list = []
+    tracker_task = asyncio.create_task(tracker(stop, lags))
+    await asyncio.sleep(TICK_SECONDS)
+
+    start = time.perf_counter()
+    if mode == "sync":
+        async def analyze():
+            return agent.analyze_image(image)
+    else:
+        async def analyze():
+            return await agent.analyze_image_async(image)
+    await asyncio.gather(*(analyze() for _ in range(analyses)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    sent = await tracker_task
+    await asyncio.sleep(TICK_SECONDS)
+    manager.disconnect_admin(admin)
+
+    return {
+        "mode": mode,
+        "elapsed": elapsed,
+        "frames": admin.received,
+        "expected_frames": sent,
+        "max_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=1.0, help="Latencia del modelo stub (s)")
+    parser.add_argument("--analyses", type=int, default=4, help="Análisis simultáneos")
+    args = parser.parse_args()
+
+    results = [await run(mode, args.latency, args.analyses) for mode in ("sync", "async")]
+    for result in results:
+        print(
+            f"{result['mode']:<6} análisis: {result['elapsed']:.2f}s | "
+            f"frames a admin: {result['frames']}/{result['expected_frames']} | "
+            f"retraso máx. del loop: {result['max_lag_ms']:.0f} ms"
+        )
+
+    # Con la ruta async el loop no debe atrasarse más que la duración de un tick,
+    # cada ubicación enviada debe llegar al admin y el tracker no debe haberse
+    # frenado (al menos un fix por tick mientras duraron los análisis)
+    async_result = results[1]
+    failures = []
+    if async_result["max_lag_ms"] > TICK_SECONDS * 1000:
+        failures.append(f"el event loop se atrasó {async_result['max_lag_ms']:.0f} ms")
+    if async_result["frames"] != async_result["expected_frames"]:
+        failures.append(f"el admin recibió {async_result['frames']} de {async_result['expected_frames']} frames")
+    if async_result["expected_frames"] < int(async_result["elapsed"] / TICK_SECONDS):
+        failures.append(f"el tracker envió solo {async_result['expected_frames']} ubicaciones")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ El tráfico WebSocket siguió fluyendo durante los análisis")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
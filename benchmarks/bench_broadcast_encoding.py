@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: costo de CPU por actualización de ubicación en el broadcast
+
+Compara la ruta anterior (send_json por cada admin: un json.dumps por
+destinatario y datetime.now() en cada llamada) contra la actual (un solo
+timestamp y un solo encode compartido por todos los admins).
+
+Uso:
+    python benchmarks/bench_broadcast_encoding.py --admins 40 --updates 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.serialization import ENCODERS  # noqa: E402
+
+
+def build_message(user_id: str, timestamp: str) -> dict:
+    return {
+        "type": "location_update",
+        "user_id": user_id,
+        "name": "Agustin Apaza",
+        "lat": -17.779723,
+        "lng": -63.192147,
+        "route_id": "6918c12092cd6492dbd79510",
+        "timestamp": timestamp
+    }
+
+
+def per_recipient(admins: int):
+    """Ruta anterior: se codifica el mismo dict una vez por admin"""
+    location = {"last_update": datetime.now().isoformat()}
+    message = build_message("6918c21792cd6492dbd79515", datetime.now().isoformat())
+    for _ in range(admins):
+        json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    return location
+
+
+def encode_once(admins: int, encoder):
+    """Ruta actual: un timestamp, un encode y el mismo frame para todos"""
+    timestamp = datetime.now().isoformat()
+    location = {"last_update": timestamp}
+    frame = encoder(build_message("6918c21792cd6492dbd79515", timestamp))
+    frames = [frame] * admins
+    return location, frames
+
+
+def measure(label: str, fn, updates: int):
+    start = time.process_time()
+    for _ in range(updates):
+        fn()
+    elapsed = time.process_time() - start
+    print(f"{label:<28} {elapsed / updates * 1e6:9.2f} µs/actualización")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--admins", type=int, default=40)
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"Admins: {args.admins} | Actualizaciones: {args.updates}")
+    baseline = measure("antes (send_json x admin)", lambda: per_recipient(args.admins), args.updates)
+
+    for name, encoder in ENCODERS.items():
+        elapsed = measure(f"ahora (encode once, {name})", lambda: encode_once(args.admins, encoder), args.updates)
+        print(f"{'':<28} {baseline / elapsed:9.1f}x más rápido")
+
+
+if __name__ == "__main__":
+    main()
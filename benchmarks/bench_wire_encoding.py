@@ -0,0 +1,201 @@
+"""
+Benchmark: bytes en la red y CPU del servidor por mensaje según la codificación
+
+Compara JSON y la codificación binaria (app/services/binary_protocol.py), con
+y sin compresión permessage-deflate, para:
+
+- ingesta:  `location_update` del tracker (el servidor descomprime y decodifica)
+- broadcast: `location_update` a un admin (el servidor codifica y comprime)
+- lote:      `location_batch` del tick con --batch-users usuarios
+
+La compresión se emula como la hace permessage-deflate: un compresor por
+conexión que conserva el contexto entre mensajes (context takeover) y
+Z_SYNC_FLUSH sin los 4 bytes finales. Los bytes incluyen el encabezado del
+frame WebSocket (con máscara en los frames del cliente).
+
+Uso:
+    python benchmarks/bench_wire_encoding.py --messages 20000 --batch-users 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.binary_protocol import (  # noqa: E402
+    decode_tracker_frame,
+    encode_batch,
+    encode_location,
+    encode_tracker_location,
+)
+from app.services.serialization import encode_message  # noqa: E402
+
+DEFLATE_TAIL = b"\x00\x00\xff\xff"
+USER_ID = "6918c21792cd6492dbd79515"
+ROUTE_ID = "6918c12092cd6492dbd79510"
+
+
+def frame_overhead(payload_size: int, masked: bool) -> int:
+    """Encabezado de un frame WebSocket"""
+    header = 2 if payload_size < 126 else 4 if payload_size < 65536 else 10
+    return header + (4 if masked else 0)
+
+
+def track(count: int, seed: int = 7):
+    """Ubicaciones de un recolector avanzando por la ciudad (~10 m por fix)"""
+    rng = random.Random(seed)
+    lat, lng = -17.779723, -63.192147
+    points = []
+    for _ in range(count):
+        lat += rng.uniform(-0.0001, 0.0001)
+        lng += rng.uniform(-0.0001, 0.0001)
+        points.append((lat, lng))
+    return points
+
+
+class Deflate:
+    """Compresor/descompresor de una conexión (permessage-deflate)"""
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self.decompressor = zlib.decompressobj(-15)
+
+    def compress(self, payload: bytes) -> bytes:
+        data = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-4] if data.endswith(DEFLATE_TAIL) else data
+
+    def decompress(self, payload: bytes) -> bytes:
+        return self.decompressor.decompress(payload + DEFLATE_TAIL)
+
+
+# Ingesta: frames que envía el tracker y trabajo del servidor al recibirlos
+
+def ingest_frames(points, binary: bool):
+    if binary:
+        return [encode_tracker_location(lat, lng) for lat, lng in points]
+    return [
+        json.dumps({"type": "location_update", "lat": lat, "lng": lng}).encode()
+        for lat, lng in points
+    ]
+
+
+def run_ingest(points, binary: bool, deflate: bool):
+    frames = ingest_frames(points, binary)
+    if deflate:
+        client = Deflate()
+        frames = [client.compress(frame) for frame in frames]
+
+    wire = sum(len(frame) + frame_overhead(len(frame), masked=True) for frame in frames)
+    server = Deflate()
+
+    start = time.process_time()
+    for frame in frames:
+        if deflate:
+            frame = server.decompress(frame)
+        if binary:
+            decode_tracker_frame(frame)
+        else:
+            json.loads(frame)
+    return wire, time.process_time() - start
+
+
+# Broadcast: trabajo del servidor para enviar cada ubicación a un admin
+
+def run_broadcast(points, binary: bool, deflate: bool):
+    connection = Deflate()
+    wire = 0
+
+    start = time.process_time()
+    for lat, lng in points:
+        now = datetime.now()
+        if binary:
+            frame = encode_location(USER_ID, lat, lng, now.timestamp())
+        else:
+            frame = encode_message({
+                "type": "location_update",
+                "user_id": USER_ID,
+                "name": "Agustin Apaza",
+                "lat": lat,
+                "lng": lng,
+                "route_id": ROUTE_ID,
+                "timestamp": now.isoformat()
+            }).encode()
+        if deflate:
+            frame = connection.compress(frame)
+        wire += len(frame) + frame_overhead(len(frame), masked=False)
+    return wire, time.process_time() - start
+
+
+def run_batch(points, users: int, binary: bool, deflate: bool):
+    connection = Deflate()
+    user_ids = [f"{index:024x}" for index in range(users)]
+    wire = 0
+
+    start = time.process_time()
+    for tick in range(0, len(points) - users + 1, users):
+        rows = [
+            [user_id, round(lat, 6), round(lng, 6)]
+            for user_id, (lat, lng) in zip(user_ids, points[tick:tick + users])
+        ]
+        now = datetime.now()
+        if binary:
+            frame = encode_batch(rows, now.timestamp())
+        else:
+            frame = encode_message({
+                "type": "location_batch",
+                "timestamp": now.isoformat(),
+                "fields": ["user_id", "lat", "lng"],
+                "users": rows
+            }).encode()
+        if deflate:
+            frame = connection.compress(frame)
+        wire += len(frame) + frame_overhead(len(frame), masked=False)
+    return wire, time.process_time() - start
+
+
+MODES = [
+    ("json", False, False),
+    ("json + deflate", False, True),
+    ("binary", True, False),
+    ("binary + deflate", True, True),
+]
+
+
+def report(title: str, unit: str, count: int, run):
+    print(f"\n{title}")
+    print(f"{'modo':<18} {'bytes/' + unit:>14} {'µs/' + unit:>10} {'vs json':>9}")
+    baseline = None
+    for label, binary, deflate in MODES:
+        wire, elapsed = run(binary, deflate)
+        per_message = wire / count
+        baseline = baseline or per_message
+        print(f"{label:<18} {per_message:14.1f} {elapsed / count * 1e6:10.2f} {per_message / baseline:8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch-users", type=int, default=200)
+    args = parser.parse_args()
+
+    points = track(args.messages)
+    ticks = args.messages // args.batch_users
+
+    print(f"Mensajes: {args.messages} | Usuarios por lote: {args.batch_users}")
+    report("Ingesta (tracker -> servidor)", "msg", args.messages,
+           lambda binary, deflate: run_ingest(points, binary, deflate))
+    report("Broadcast location_update (servidor -> admin)", "msg", args.messages,
+           lambda binary, deflate: run_broadcast(points, binary, deflate))
+    if ticks:
+        report(f"Broadcast location_batch ({args.batch_users} usuarios)", "lote", ticks,
+               lambda binary, deflate: run_batch(points, args.batch_users, binary, deflate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+Prueba de carga del pipeline de tracking en tiempo real
+
+Simula N recolectores que envían fixes a una tasa dada recorriendo las
+polilíneas de las rutas de la BD y M admins conectados a /ws/admin/{admin_id}.
+Informa:
+
+- ingesta: fixes enviados/confirmados por segundo y latencia del ack
+- broadcast: latencia extremo a extremo (envío del tracker -> recepción en
+  el admin) en percentiles, y cuántas ubicaciones llegaron a los admins
+- servidor: CPU y memoria del proceso (requiere `psutil`)
+
+Necesita la app corriendo con un Mongo local (ej: `docker run -p 27017:27017 mongo:7`).
+Los usuarios, asignaciones y (si la BD no tiene rutas) las rutas de la prueba
+se crean al empezar y se borran al terminar.
+
+Uso:
+    # App ya levantada (pasar su PID para medir CPU/memoria)
+    python benchmarks/load_tracking.py --trackers 200 --admins 20 --rate 1 --duration 60 --server-pid 1234
+
+    # Levantar la app en un subproceso con la misma configuración (.env / variables)
+    python benchmarks/load_tracking.py --spawn --trackers 200 --admins 20
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+from bson import ObjectId
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.binary_protocol import (  # noqa: E402
+    ENCODING_BINARY,
+    ENCODINGS,
+    decode_admin_frame,
+    encode_tracker_location,
+)
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil es opcional
+    psutil = None
+
+EARTH_RADIUS_METERS = 6371000.0
+LOAD_TEST_FIELD = "load_test_run"
+
+
+# Recorrido sobre una polilínea
+
+class RoutePath:
+    """Avanza ida y vuelta sobre una polilínea [[lng, lat], ...]"""
+
+    def __init__(self, coordinates: List[List[float]], start_offset: float = 0.0):
+        self.points = [(lat, lng) for lng, lat in coordinates]
+        self.cumulative = [0.0]
+        for (lat1, lng1), (lat2, lng2) in zip(self.points, self.points[1:]):
+            self.cumulative.append(self.cumulative[-1] + _distance_meters(lat1, lng1, lat2, lng2))
+        self.length = self.cumulative[-1]
+        self.position = start_offset % (2 * self.length) if self.length else 0.0
+
+    def advance(self, meters: float) -> Tuple[float, float]:
+        if not self.length:
+            return self.points[0]
+
+        self.position = (self.position + meters) % (2 * self.length)
+        distance = self.position if self.position <= self.length else 2 * self.length - self.position
+
+        for index in range(1, len(self.cumulative)):
+            if self.cumulative[index] >= distance:
+                segment = self.cumulative[index] - self.cumulative[index - 1]
+                ratio = (distance - self.cumulative[index - 1]) / segment if segment else 0.0
+                (lat1, lng1), (lat2, lng2) = self.points[index - 1], self.points[index]
+                return lat1 + (lat2 - lat1) * ratio, lng1 + (lng2 - lng1) * ratio
+        return self.points[-1]
+
+
+def _distance_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * EARTH_RADIUS_METERS
+
+
+def synthetic_routes(count: int, seed: int = 7) -> List[dict]:
+    """Rutas de ~2 km alrededor del centro de Santa Cruz (si la BD no tiene rutas)"""
+    rng = random.Random(seed)
+    routes = []
+    for index in range(count):
+        lat, lng = -17.7833 + rng.uniform(-0.03, 0.03), -63.1821 + rng.uniform(-0.03, 0.03)
+        coordinates = [[lng, lat]]
+        for _ in range(20):
+            lat += rng.uniform(-0.001, 0.001)
+            lng += rng.uniform(-0.001, 0.001)
+            coordinates.append([lng, lat])
+        routes.append({"name": f"Ruta carga {index + 1}", "coordinates": coordinates})
+    return routes
+
+
+# Datos de la prueba
+
+@dataclass
+class Fixtures:
+    run_id: str
+    trackers: List[Tuple[str, List[List[float]]]]
+    admins: List[str]
+    created_routes: List[ObjectId] = field(default_factory=list)
+
+
+def seed(db, trackers: int, admins: int, max_routes: int) -> Fixtures:
+    """Crear recolectores con ruta asignada y admins de prueba"""
+    run_id = ObjectId().binary.hex()
+
+    routes = list(db["routes"].find({"coordinates.1": {"$exists": True}}, {"coordinates": 1}).limit(max_routes))
+    created_routes = []
+    if not routes:
+        documents = [{**route, LOAD_TEST_FIELD: run_id} for route in synthetic_routes(max_routes)]
+        created_routes = db["routes"].insert_many(documents).inserted_ids
+        routes = [{"_id": _id, "coordinates": doc["coordinates"]} for _id, doc in zip(created_routes, documents)]
+
+    tracker_docs = [
+        {"name": f"Recolector carga {index + 1}", "phone": "0", "rol": "Recolector", LOAD_TEST_FIELD: run_id}
+        for index in range(trackers)
+    ]
+    admin_docs = [
+        {"name": f"Admin carga {index + 1}", "phone": "0", "rol": "Admin", LOAD_TEST_FIELD: run_id}
+        for index in range(admins)
+    ]
+    tracker_ids = db["users"].insert_many(tracker_docs).inserted_ids if tracker_docs else []
+    admin_ids = db["users"].insert_many(admin_docs).inserted_ids if admin_docs else []
+
+    assignments = []
+    fixtures = Fixtures(run_id, [], [str(_id) for _id in admin_ids], list(created_routes))
+    for index, user_id in enumerate(tracker_ids):
+        route = routes[index % len(routes)]
+        assignments.append({
+            "user_id": str(user_id),
+            "route_id": str(route["_id"]),
+            "status": "active",
+            LOAD_TEST_FIELD: run_id,
+        })
+        fixtures.trackers.append((str(user_id), route["coordinates"]))
+    if assignments:
+        db["assignment"].insert_many(assignments)
+
+    return fixtures
+
+
+def cleanup(db, fixtures: Fixtures):
+    """Borrar lo que creó la prueba"""
+    user_ids = [user_id for user_id, _ in fixtures.trackers] + fixtures.admins
+    db["users"].delete_many({LOAD_TEST_FIELD: fixtures.run_id})
+    db["assignment"].delete_many({LOAD_TEST_FIELD: fixtures.run_id})
+    db["routes"].delete_many({LOAD_TEST_FIELD: fixtures.run_id})
+    db["alertas"].delete_many({"user_id": {"$in": user_ids}})
+    try:
+        db["location_history"].delete_many({"meta.user_id": {"$in": user_ids}})
+    except Exception as e:
+        print(f"⚠️ No se pudo limpiar location_history: {e}")
+
+
+# Medición
+
+@dataclass
+class LoadStats:
+    sent: int = 0
+    acked: int = 0
+    rejected: int = 0
+    errors: int = 0
+    admin_messages: int = 0
+    admin_locations: int = 0
+    ack_latencies: List[float] = field(default_factory=list)
+    broadcast_latencies: List[float] = field(default_factory=list)
+    # {(user_id, lat, lng): perf_counter del envío}
+    sent_at: Dict[Tuple[str, float, float], float] = field(default_factory=dict)
+    server_samples: List[Tuple[float, float]] = field(default_factory=list)
+
+
+def _key(user_id: str, lat: float, lng: float) -> Tuple[str, float, float]:
+    return (user_id, round(lat, 6), round(lng, 6))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_tracker(ws_url: str, user_id: str, coordinates, args, stats: LoadStats, stop_at: float):
+    """Un recolector: envía un fix cada 1/rate segundos y mide el ack"""
+    loop = asyncio.get_running_loop()
+    path = RoutePath(coordinates, start_offset=random.uniform(0, 5000))
+    interval = 1.0 / args.rate
+    binary = args.encoding == ENCODING_BINARY
+    pending_acks: List[float] = []
+
+    async with websockets.connect(
+        f"{ws_url}/ws/tracker/{user_id}",
+        compression=None if args.no_compression else "deflate",
+        max_queue=None
+    ) as websocket:
+        await websocket.recv()  # "connected"
+
+        async def receive_acks():
+            async for message in websocket:
+                # `error` / `rate_limited`: el servidor rechazó el fix
+                if isinstance(message, str) and json.loads(message).get("type") != "location_received":
+                    stats.rejected += 1
+                    continue
+                if pending_acks:
+                    stats.ack_latencies.append(time.perf_counter() - pending_acks.pop(0))
+                stats.acked += 1
+
+        receiver = asyncio.create_task(receive_acks())
+        next_send = loop.time() + random.uniform(0, interval)
+        try:
+            while loop.time() < stop_at:
+                await asyncio.sleep(max(0.0, next_send - loop.time()))
+                next_send += interval
+
+                lat, lng = path.advance(args.speed * interval)
+                lat, lng = round(lat, 6), round(lng, 6)
+                now = time.perf_counter()
+                stats.sent_at[_key(user_id, lat, lng)] = now
+                pending_acks.append(now)
+
+                if binary:
+                    await websocket.send(encode_tracker_location(lat, lng))
+                else:
+                    await websocket.send(json.dumps({"type": "location_update", "lat": lat, "lng": lng}))
+                stats.sent += 1
+
+            # Esperar los últimos acks
+            await asyncio.sleep(min(1.0, interval))
+        finally:
+            receiver.cancel()
+
+
+def _record_location(stats: LoadStats, user_id: str, lat: float, lng: float, received: float):
+    sent = stats.sent_at.get(_key(user_id, lat, lng))
+    stats.admin_locations += 1
+    if sent is not None:
+        stats.broadcast_latencies.append(received - sent)
+
+
+async def run_admin(ws_url: str, admin_id: str, args, stats: LoadStats, stop_at: float):
+    """Un admin: recibe ubicaciones y mide la latencia extremo a extremo"""
+    url = f"{ws_url}/ws/admin/{admin_id}?encoding={args.encoding}"
+    async with websockets.connect(
+        url, compression=None if args.no_compression else "deflate", max_queue=None
+    ) as websocket:
+        while True:
+            timeout = stop_at + 2.0 - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                frame = await asyncio.wait_for(websocket.recv(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+            received = time.perf_counter()
+            stats.admin_messages += 1
+            message = decode_admin_frame(frame) if isinstance(frame, bytes) else json.loads(frame)
+
+            if message.get("type") == "location_update":
+                _record_location(stats, message["user_id"], message["lat"], message["lng"], received)
+            elif message.get("type") == "location_batch":
+                for user_id, lat, lng in message["users"]:
+                    _record_location(stats, user_id, lat, lng, received)
+
+
+async def sample_server(pid: Optional[int], stats: LoadStats, stop_at: float):
+    """Muestrear CPU (%) y memoria RSS (MB) del servidor cada segundo"""
+    if pid is None or psutil is None:
+        return
+    process = psutil.Process(pid)
+    process.cpu_percent()
+    loop = asyncio.get_running_loop()
+    while loop.time() < stop_at:
+        await asyncio.sleep(1.0)
+        stats.server_samples.append((process.cpu_percent(), process.memory_info().rss / 1024 / 1024))
+
+
+async def run_load(args, fixtures: Fixtures, server_pid: Optional[int]) -> LoadStats:
+    ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+    stats = LoadStats()
+    loop = asyncio.get_running_loop()
+
+    # Los admins se conectan primero para recibir toda la carga
+    stop_at = loop.time() + args.warmup + args.duration
+    admins = [asyncio.create_task(run_admin(ws_url, admin_id, args, stats, stop_at)) for admin_id in fixtures.admins]
+    await asyncio.sleep(args.warmup)
+
+    sampler = asyncio.create_task(sample_server(server_pid, stats, stop_at))
+    trackers = []
+    for user_id, coordinates in fixtures.trackers:
+        trackers.append(asyncio.create_task(run_tracker(ws_url, user_id, coordinates, args, stats, stop_at)))
+        # Escalonar las conexiones para no medir solo el handshake
+        await asyncio.sleep(args.connect_interval)
+
+    results = await asyncio.gather(*trackers, *admins, sampler, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            stats.errors += 1
+            print(f"⚠️ {type(result).__name__}: {result}")
+    return stats
+
+
+def report(args, stats: LoadStats):
+    def ms(values, fraction):
+        return percentile(values, fraction) * 1000
+
+    print(f"\nTrackers: {args.trackers} | Admins: {args.admins} | Tasa: {args.rate}/s | "
+          f"Duración: {args.duration}s | Codificación: {args.encoding} | "
+          f"Compresión: {'no' if args.no_compression else 'deflate'}")
+
+    print("\nIngesta")
+    print(f"  fixes enviados      {stats.sent:>10}  ({stats.sent / args.duration:,.1f}/s)")
+    print(f"  fixes confirmados   {stats.acked:>10}  ({stats.acked / args.duration:,.1f}/s)")
+    if stats.rejected:
+        print(f"  rechazos            {stats.rejected:>10}  (subir TRACKER_MAX_FIXES_PER_SECOND en el servidor si --rate lo supera)")
+    print(f"  ack (ms)            p50 {ms(stats.ack_latencies, .5):7.2f}  p95 {ms(stats.ack_latencies, .95):7.2f}  "
+          f"p99 {ms(stats.ack_latencies, .99):7.2f}  max {ms(stats.ack_latencies, 1):7.2f}")
+
+    expected = stats.sent * args.admins
+    latencies = stats.broadcast_latencies
+    print("\nBroadcast")
+    print(f"  mensajes a admins   {stats.admin_messages:>10}")
+    print(f"  ubicaciones         {stats.admin_locations:>10}  "
+          f"({stats.admin_locations / expected:.0%} de {expected}; el resto lo descartó el filtro GPS, se combinó, se omitió en el tick o se descartó)" if expected else "")
+    print(f"  extremo a extremo   p50 {ms(latencies, .5):7.2f}  p95 {ms(latencies, .95):7.2f}  "
+          f"p99 {ms(latencies, .99):7.2f}  max {ms(latencies, 1):7.2f} ms")
+
+    print("\nServidor")
+    if stats.server_samples:
+        cpu = [sample[0] for sample in stats.server_samples]
+        rss = [sample[1] for sample in stats.server_samples]
+        print(f"  CPU (%)             prom {sum(cpu) / len(cpu):7.1f}  max {max(cpu):7.1f}")
+        print(f"  memoria RSS (MB)    prom {sum(rss) / len(rss):7.1f}  max {max(rss):7.1f}")
+    elif psutil is None:
+        print("  (instalar `psutil` para medir CPU y memoria)")
+    else:
+        print("  (pasar --server-pid o --spawn para medir CPU y memoria)")
+
+    if stats.errors:
+        print(f"\n⚠️ {stats.errors} conexiones terminaron con error")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    """Levantar la app con uvicorn y esperar a que responda /health"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--ws", "websockets"],
+        cwd=ROOT
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("La app terminó antes de responder")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("La app no respondió /health en 30 segundos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL de la app (ignorada con --spawn)")
+    parser.add_argument("--trackers", type=int, default=100)
+    parser.add_argument("--admins", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0, help="fixes por segundo por tracker")
+    parser.add_argument("--speed", type=float, default=8.0, help="velocidad de los recolectores (m/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--warmup", type=float, default=1.0, help="segundos entre admins y trackers")
+    parser.add_argument("--connect-interval", type=float, default=0.005, help="segundos entre conexiones de trackers")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="json")
+    parser.add_argument("--no-compression", action="store_true", help="sin permessage-deflate")
+    parser.add_argument("--routes", type=int, default=20, help="máximo de rutas a recorrer")
+    parser.add_argument("--mongodb-url", default=os.environ.get("MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default=os.environ.get("DATABASE_NAME", "innova"))
+    parser.add_argument("--server-pid", type=int, help="PID de la app para medir CPU/memoria")
+    parser.add_argument("--spawn", action="store_true", help="levantar la app en un subproceso")
+    parser.add_argument("--keep-data", action="store_true", help="no borrar los datos de la prueba")
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+    db = MongoClient(args.mongodb_url)[args.database]
+
+    fixtures = seed(db, args.trackers, args.admins, args.routes)
+    print(f"✅ Datos de prueba creados (run {fixtures.run_id})")
+
+    server = None
+    server_pid = args.server_pid
+    try:
+        if args.spawn:
+            port = _free_port()
+            server = spawn_server(port)
+            args.url = f"http://127.0.0.1:{port}"
+            server_pid = server.pid
+
+        stats = asyncio.run(run_load(args, fixtures, server_pid))
+        report(args, stats)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if not args.keep_data:
+            cleanup(db, fixtures)
+
+
+if __name__ == "__main__":
+    main()
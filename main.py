@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config.logging_config import setup_logging, stop_logging
 from app.config.database import connect_to_mongo, close_mongo_connection, get_database
-from app.routers import users, routes, websocket_simple, assignments, tracking, agent, alerts
+from app.routers import users, routes, websocket_simple, assignments, tracking, agent, alerts, history, metrics
+
+# Logging estructurado (cola + hilo escritor) antes de cualquier log de la app
+setup_logging()
 
 app = FastAPI(
     title="Innova Backend API",
@@ -23,16 +27,57 @@ app.add_middleware(
 # Eventos de inicio y cierre
 @app.on_event("startup")
 async def startup_db_client():
+    from app.config.settings import settings
+    from app.services.serialization import configure_encoder
+    configure_encoder(settings.JSON_ENCODER)
+    
     await connect_to_mongo()
     # Guardar referencia a la BD en app.state para usar en WebSockets
     from app.config.database import db
-    from app.config.settings import settings
     app.state.db = db.client[settings.DATABASE_NAME]
+    
+    # Persistencia de ubicaciones e historial en segundo plano
+    from app.services.location_persistence import location_persistence
+    from app.services.location_history import location_history, ensure_history_collection
+    location_persistence.start(app.state.db)
+    await ensure_history_collection(app.state.db)
+    location_history.start(app.state.db)
+    
+    # Backplane entre workers/instancias (memoria o Redis)
+    from app.services.backplane import create_backplane
+    from app.services.connection_manager import manager
+    await manager.start_backplane(create_backplane())
+    
+    # Índices de las consultas frecuentes (idempotente)
+    from app.services.index_manager import ensure_indexes
+    await ensure_indexes(app.state.db)
+    
+    # Almacenamiento de fotos (GridFS o directorio local)
+    from app.services.blob_store import init_blob_store
+    init_blob_store(app.state.db)
+    
+    # Nivel persistente de la caché de análisis de imágenes
+    from app.agents.analysis_cache import analysis_cache
+    if settings.AGENT_CACHE_PERSISTENT:
+        analysis_cache.attach(app.state.db)
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Flush final de ubicaciones pendientes antes de cerrar la conexión
+    from app.services.location_persistence import location_persistence
+    from app.services.location_history import location_history
+    await location_persistence.stop()
+    await location_history.stop()
+    
+    from app.services.connection_manager import manager
+    await manager.stop_broadcast_tick()
+    await manager.stop_backplane()
+    
     await close_mongo_connection()
+    
+    # Escribir los logs pendientes
+    stop_logging()
 
 
 # Incluir routers
@@ -41,6 +86,8 @@ app.include_router(routes.router, prefix="/api")
 app.include_router(assignments.router, prefix="/api")
 app.include_router(alerts.router, prefix="/api")  # Alertas de desviación
 app.include_router(agent.router, prefix="/api")  # Agente de IA
+app.include_router(history.router, prefix="/api")  # Historial de ubicaciones
+app.include_router(metrics.router)  # Métricas internas
 app.include_router(tracking.router)  # WebSocket de tracking
 app.include_router(websocket_simple.router)  # WebSocket de ejemplo
 
@@ -54,6 +101,7 @@ async def root():
         "endpoints": {
             "users": "/api/users",
             "routes": "/api/routes",
+            "history": "/api/history/{user_id}",
             "websocket_simple": "/ws/simple/{client_name}",
             "docs": "/docs",
             "redoc": "/redoc"
@@ -69,5 +117,13 @@ async def health_check():
 if __name__ == "__main__":
     import uvicorn
     import os
+    from app.config.settings import settings
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        reload=True,
+        ws="websockets",
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE
+    )